@@ -22,6 +22,9 @@ class DisplayConstrainedResults:
         self.show_production_curves()
         st.markdown("---")
         self.show_detailed_results_by_well()
+        self.show_header_results()
+        self.show_sensitivity()
+        self.show_uncertainty()
 
     def show_summary_metrics(self):
         inject_global_css()
@@ -35,6 +38,15 @@ class DisplayConstrainedResults:
     def show_detailed_results_by_well(self):
         self._show_well_results_table()
 
+    def show_uncertainty(self):
+        self._show_uncertainty()
+
+    def show_header_results(self):
+        self._show_header_results()
+
+    def show_sensitivity(self):
+        self._show_sensitivity()
+
     '''
     Method to display the summary metrics of the optimization.
     This method is responsible for displaying the summary metrics of the optimization, including total production, total QGL used, and the configured QGL limit.
@@ -67,6 +79,28 @@ class DisplayConstrainedResults:
         </div>
         """
         st.markdown(html, unsafe_allow_html=True)
+        self._show_solver_status()
+
+    def _show_solver_status(self):
+        solver = self.optimization_results.get('solver')
+        if not solver:
+            return
+        text = f"Solver: {solver.get('name', 'N/A')} · Status: {solver['status']}"
+        if solver.get('best_bound') is not None:
+            text += f" · Best bound: {solver['best_bound']:.2f} bbl"
+        if solver.get('gap') is not None:
+            text += f" · Gap: {solver['gap'] * 100:.3f}%"
+        if solver.get('shadow_price') is not None:
+            text += f" · Gas shadow price: {solver['shadow_price']:.4f} bbl/Mscf"
+        presolve = self.optimization_results.get('presolve')
+        if presolve and presolve.get('mode') != "off":
+            text += (f" · Presolve: {presolve['kept_variables']:,} of "
+                     f"{presolve['original_variables']:,} variables kept")
+        refinement = self.optimization_results.get('refinement')
+        if refinement and refinement.get('max_effective_spacing') is not None:
+            text += (f" · Refined in {refinement['rounds']} rounds to "
+                     f"{refinement['max_effective_spacing']:.1f} Mscf resolution")
+        st.caption(text)
 
 
 
@@ -115,3 +149,111 @@ class DisplayConstrainedResults:
             st.write("Data received:", self.well_results)
 
 
+
+    '''
+    Method to display the curve uncertainty analysis.
+    It shows the distribution of total production over the sampled fields and the
+    percentiles of each well's injection, when the run included the Monte Carlo analysis.
+    '''
+    def _show_uncertainty(self):
+        uncertainty = self.optimization_results.get('uncertainty')
+        if not uncertainty:
+            return
+        st.markdown("---")
+        st.markdown("#### Curve uncertainty")
+        if not uncertainty.get('feasible_samples'):
+            st.warning("No sampled field admits an allocation within the QGL limit")
+            return
+        text = (f"{uncertainty['feasible_samples']:,} of {uncertainty['samples']:,} sampled fields allocated "
+                f"in {uncertainty['elapsed_seconds']:.1f} s")
+        if uncertainty.get('max_gap') is not None:
+            text += f" · Largest gap to the dual bound: {uncertainty['max_gap'] * 100:.2f}%"
+        st.caption(text)
+
+        self.plotter = Plotter(self.optimization_results)
+        st.plotly_chart(self.plotter.create_uncertainty_histogram(), use_container_width=True)
+
+        labels = [f"P{p}" for p in uncertainty['percentiles']]
+        names = [getattr(result, 'well_name', f"Well {i + 1}") for i, result in enumerate(self.well_results or [])]
+        rows = []
+        for i, (mean, percentiles) in enumerate(zip(uncertainty['well_qgl_mean'], uncertainty['well_qgl_percentiles'])):
+            row = {"Well identifier": names[i] if i < len(names) else f"Well {i + 1}", "Mean (mscfd)": mean}
+            row.update({f"{label} (mscfd)": value for label, value in zip(labels, percentiles)})
+            rows.append(row)
+        df = pd.DataFrame(rows)
+        st.dataframe(df.style.format({column: "{:.0f}" for column in df.columns[1:]}), hide_index=True)
+
+    '''
+    Method to display the value of gas at the optimum.
+    It shows the gas shadow price, the production change for more and less total gas and the
+    marginal rate of each well, all derived from the solved allocation without another run.
+    '''
+    def _show_sensitivity(self):
+        sensitivity = self.optimization_results.get('sensitivity')
+        if not sensitivity:
+            return
+        st.markdown("---")
+        st.markdown("#### Gas sensitivity")
+        delta = sensitivity['delta_qgl']
+        down = sensitivity['production_change_down']
+        down_text = f"{down:+.2f} <span class=\"metric-unit\">bbl</span>" if down is not None \
+            else "<span class=\"metric-unit\">Infeasible</span>"
+        html = f"""
+        <div class="metric-cards-two-cols">
+            <div class="metric-cards-vertical">
+                <div class="metric-card">
+                    <div class="metric-title">Gas shadow price</div>
+                    <div class="metric-value">{sensitivity['shadow_price']:.4f} <span class="metric-unit">bbl/Mscf</span></div>
+                    <div class="status-tag">{sensitivity['shadow_value']:.2f} USD/Mscf of oil</div>
+                </div>
+            </div>
+            <div class="metric-cards-vertical">
+                <div class="metric-card">
+                    <div class="metric-title">+{delta:.0f} Mscf of gas</div>
+                    <div class="metric-value">{sensitivity['production_change_up']:+.2f} <span class="metric-unit">bbl</span></div>
+                </div>
+                <div class="metric-card">
+                    <div class="metric-title">-{delta:.0f} Mscf of gas</div>
+                    <div class="metric-value">{down_text}</div>
+                </div>
+            </div>
+        </div>
+        """
+        st.markdown(html, unsafe_allow_html=True)
+        if sensitivity['method'] == "frontier":
+            resolution = sensitivity.get('lattice_resolution')
+            st.caption("Read off the allocation index: accurate to its gas lattice"
+                       + (f" of {resolution:.2f} Mscf" if resolution else ""))
+        else:
+            st.caption("Estimated on the concave envelope of each well's curve; a new run re-solves the changed limits")
+
+        names = [getattr(result, 'well_name', f"Well {i + 1}") for i, result in enumerate(self.well_results or [])]
+        df = pd.DataFrame([{
+            "Well identifier": names[i] if i < len(names) else f"Well {i + 1}",
+            "Marginal rate (bbl/Mscf)": rate
+        } for i, rate in enumerate(sensitivity['well_marginal_rates'])])
+        st.dataframe(df.style.format({"Marginal rate (bbl/Mscf)": "{:.4f}"}), hide_index=True)
+
+    '''
+    Method to display the gas and production of each compressor header,
+    when the run allocated the gas by header.
+    '''
+    def _show_header_results(self):
+        headers = self.optimization_results.get('headers')
+        if not headers:
+            return
+        df = pd.DataFrame([{
+            "Header": name,
+            "Wells": header['wells'],
+            "Capacity (Mscf)": header['limit'],
+            "Gas lift used (mscfd)": header['total_qgl'],
+            "Oil rate (bopd)": header['total_production']
+        } for name, header in headers.items()])
+        st.dataframe(
+            df.style.format({
+                "Capacity (Mscf)": "{:.0f}",
+                "Gas lift used (mscfd)": "{:.0f}",
+                "Oil rate (bopd)": "{:.0f}"
+            }, na_rep="—"),
+            hide_index=True,
+        )
@@ -0,0 +1,64 @@
+import streamlit as st
+import pandas as pd
+from app.components.utils.plotter import Plotter
+
+
+class DisplayHorizonResults:
+    def __init__(self, horizon_results: dict, list_info: list):
+        self.plotter = None
+        self.horizon_results = horizon_results
+        self.list_info = list_info
+
+    def show(self):
+        self.show_summary_metrics()
+        st.divider()
+        self.show_horizon_chart()
+        st.divider()
+        self.show_period_table()
+
+    def show_summary_metrics(self):
+        results = self.horizon_results
+        infeasible = sum(status == "Infeasible" for status in results['solver_status'])
+        html = f"""
+        <div class="metric-cards-vertical">
+            <div class="metric-card">
+                <div class="metric-title">Horizon Production</div>
+                <div class="metric-value">{sum(results['total_production']):.2f} <span class="metric-unit">bbl over {len(results['qgl_limit'])} periods</span></div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-title">Solve time</div>
+                <div class="metric-value">{sum(results['solve_seconds']):.2f} <span class="metric-unit">s</span></div>
+            </div>
+        </div>
+        """
+        st.markdown(html, unsafe_allow_html=True)
+        if infeasible:
+            st.warning(f"{infeasible} period(s) could not get under the available gas within the change limits; "
+                       "those wells were held as low as the limits allow")
+
+    def show_horizon_chart(self):
+        self.plotter = Plotter(self.horizon_results)
+        fig = self.plotter.create_horizon_chart(self.list_info[1:] if self.list_info else None)
+        st.plotly_chart(fig, use_container_width=True)
+
+    def show_period_table(self):
+        results = self.horizon_results
+        df = pd.DataFrame({
+            "Period": range(1, len(results['qgl_limit']) + 1),
+            "Available QGL (Mscf)": results['qgl_limit'],
+            "QGL used (mscfd)": results['total_qgl'],
+            "Oil rate (bopd)": results['total_production'],
+            "Status": results['solver_status'],
+            "Model rebuilt": results['rebuilt'],
+            "Solve time (s)": results['solve_seconds'],
+        })
+        st.dataframe(
+            df.style.format({
+                "Available QGL (Mscf)": "{:.0f}",
+                "QGL used (mscfd)": "{:.0f}",
+                "Oil rate (bopd)": "{:.0f}",
+                "Solve time (s)": "{:.2f}"
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
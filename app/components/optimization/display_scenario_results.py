@@ -0,0 +1,65 @@
+import streamlit as st
+import pandas as pd
+from app.components.utils.plotter import Plotter
+
+SCENARIO_METRICS = {
+    "Net revenue (USD)": "net_revenue",
+    "Total production (bbl)": "total_production",
+    "Total QGL used (Mscf)": "total_qgl",
+}
+
+
+class DisplayScenarioResults:
+    def __init__(self, scenario_results: dict):
+        self.plotter = None
+        self.scenario_results = scenario_results
+
+    def show(self):
+        self.show_summary_metrics()
+        st.divider()
+        self.show_heatmap()
+        st.divider()
+        self.show_scenario_table()
+
+    def show_summary_metrics(self):
+        instrumentation = self.scenario_results.get("instrumentation", {})
+        html = f"""
+        <div class="metric-cards-vertical">
+            <div class="metric-card">
+                <div class="metric-title">Scenarios solved</div>
+                <div class="metric-value">{instrumentation.get('scenarios', 0)} <span class="metric-unit">in {instrumentation.get('price_cases', 0)} price cases</span></div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-title">Elapsed time</div>
+                <div class="metric-value">{instrumentation.get('elapsed_seconds', 0.0):.2f} <span class="metric-unit">s</span></div>
+            </div>
+        </div>
+        """
+        st.markdown(html, unsafe_allow_html=True)
+
+    def show_heatmap(self):
+        '''
+        Heatmap of one metric over oil price and gas limit, for the gas cost chosen in the selector.
+        '''
+        table: pd.DataFrame = self.scenario_results["table"]
+        col1, col2 = st.columns(2)
+        with col1:
+            metric_label = st.selectbox("Metric", options=list(SCENARIO_METRICS), index=0, key="scenario_metric")
+        with col2:
+            p_qgl = st.selectbox("Gas cost (USD/Mscf)", options=sorted(table["p_qgl"].unique()), index=0,
+                                 key="scenario_p_qgl")
+        self.plotter = Plotter(self.scenario_results)
+        fig = self.plotter.create_scenario_heatmap(SCENARIO_METRICS[metric_label], p_qgl, metric_label)
+        st.plotly_chart(fig, use_container_width=True)
+
+    def show_scenario_table(self):
+        table: pd.DataFrame = self.scenario_results["table"]
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download scenarios (CSV)",
+            data=table.to_csv(index=False).encode("utf-8"),
+            file_name="optimization_scenarios.csv",
+            mime="text/csv",
+            key="scenario_export_csv",
+            use_container_width=True,
+        )
@@ -5,16 +5,43 @@ from backend.services.optimization_global_pipeline_service import OptimizationGl
 from backend.services.optimization_constrained_pipeline_service import OptimizationConstrainedPipelineService
 from app.components.optimization.display_global_results import DisplayGlobalResults
 from app.components.optimization.display_constrained_results import DisplayConstrainedResults
+from app.components.optimization.display_scenario_results import DisplayScenarioResults
+from app.components.optimization.display_horizon_results import DisplayHorizonResults
 from backend.services.fitting_service import FittingService
+from backend.services.cache_service import FittingCache, LRUCache, OptimizationResultCache
+from backend.services.solver_backend_service import SolverOptions
+from backend.services.refinement_service import RefinementOptions
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.rolling_horizon_service import RollingHorizonAllocator
+from backend.services.allocation_index_service import AllocationIndexStore
+from backend.services.scenario_service import ScenarioEngine
+from backend.services.uncertainty_service import MonteCarloOptions
 from backend.services.well_optimization_service import WellOptimizationService
 from backend.repositories.field_optimization_repository import FieldOptimizationRepository
 from backend.repositories.well_optimization_repository import WellOptimizationRepository
 from app.utils.state_keys import StateKeys
+from app.utils.config import get_project_root
 
 class OptimizationExecutionComponent:
+    # Shared by both tabs and kept across Streamlit reruns
+    fitting_cache = FittingCache(cache_dir=get_project_root() / ".cache" / "fitted_curves")
+    result_cache = OptimizationResultCache()
+    model_cache = LRUCache(max_entries=4)
+    marginal_cache = LRUCache(max_entries=16)
+    allocation_index = AllocationIndexStore(cache_dir=get_project_root() / ".cache" / "allocation_index")
+
     def __init__(self, db: SnowflakeDB):
         self.db = db
 
+    def _fit(self, loaded_data, settings, key_suffix):
+        """Fitted curves of the loaded wells with one tab's grid and fitting settings, through the shared cache"""
+        q_gl_list, q_fluid_list, wct_list, _ = loaded_data
+        fitting = settings.get(f'fitting_{key_suffix}', {})
+        fitting_service = FittingService(q_gl_list, q_fluid_list, wct_list,
+                                         fitting_method=fitting.get('fitting_method', "auto"),
+                                         grid_mode=settings.get(f'grid_mode_{key_suffix}', "common"))
+        return self.fitting_cache.get_or_fit(fitting_service, parallel=fitting.get('parallel', False))
+
     def run_global_optimization(self, loaded_data, global_settings, message_outside=False):
         q_gl_list, q_fluid_list, wct_list, list_info = loaded_data
 
@@ -26,8 +53,7 @@ class OptimizationExecutionComponent:
         if st.button("Execute Global Optimization", type="primary", use_container_width=True):
             with st.spinner("Processing data..."):
                 try:
-                    fitting_service = FittingService(q_gl_list, q_fluid_list, wct_list)
-                    fit = fitting_service.perform_fitting_group()
+                    fit = self._fit(loaded_data, global_settings, "global")
 
                     field_optimization_repository = FieldOptimizationRepository(self.db)
                     field_optimization_service = FieldOptimizationService(field_optimization_repository)
@@ -40,7 +66,14 @@ class OptimizationExecutionComponent:
                         p_qoil=global_settings['p_qoil_global'],
                         p_qgl=global_settings['p_qgl_global'],
                         max_iterations=40,
-                        max_qgl=20000)
+                        solver=global_settings.get('solver_global', "milp"),
+                        mode=global_settings.get('mode_global', "sweep"),
+                        result_cache=self.result_cache,
+                        solver_options=SolverOptions(**global_settings.get('solver_options_global', {})),
+                        presolve=global_settings.get('presolve_global', "exact"),
+                        refinement=RefinementOptions() if global_settings.get('refine_global') else None,
+                        marginal_cache=self.marginal_cache,
+                        workers=global_settings.get('workers_global', 1))
                     optimization_results = pipeline.run()
 
                     st.session_state[StateKeys.SESSION_KEY_GLOBAL] = optimization_results
@@ -76,8 +109,7 @@ class OptimizationExecutionComponent:
         if st.button("Execute Constrained Optimization", type="primary", use_container_width=True):
             with st.spinner("Processing data..."):
                 try:
-                    fitting_service = FittingService(q_gl_list, q_fluid_list, wct_list)
-                    fit = fitting_service.perform_fitting_group()
+                    fit = self._fit(loaded_data, constrained_settings, "constrained")
 
                     pipeline = OptimizationConstrainedPipelineService(
                         q_gl_common_range=fit['q_gl_common_range'],
@@ -88,7 +120,24 @@ class OptimizationExecutionComponent:
                         qgl_min=constrained_settings['qgl_min_constrained'],
                         p_qoil=constrained_settings['p_qoil_constrained'],
                         p_qgl=constrained_settings['p_qgl_constrained'],
-                        db=self.db
+                        db=self.db,
+                        solver=constrained_settings.get('solver_constrained', "milp"),
+                        result_cache=self.result_cache,
+                        solver_options=SolverOptions(**constrained_settings.get('solver_options_constrained', {})),
+                        model_cache=self.model_cache,
+                        presolve=constrained_settings.get('presolve_constrained', "exact"),
+                        refinement=RefinementOptions() if constrained_settings.get('refine_constrained') else None,
+                        marginal_cache=self.marginal_cache,
+                        curve_params=dict(params_list=fit.get("params_list"), wct_list=wct_list,
+                                          covariance_list=fit.get("covariance_list"),
+                                          params_bounds=fit.get("params_bounds"),
+                                          model_name=fit.get("model_name", "namdar")),
+                        uncertainty=MonteCarloOptions(**constrained_settings['uncertainty_constrained'])
+                        if constrained_settings.get('uncertainty_constrained') else None,
+                        well_headers=constrained_settings.get('well_headers_constrained'),
+                        header_limits=constrained_settings.get('header_limits_constrained'),
+                        allocation_index=self.allocation_index if constrained_settings.get('use_index_constrained') else None,
+                        sensitivity_delta=constrained_settings.get('sensitivity_delta_constrained', 500.0)
                     )
                     optimization_results = pipeline.run()
 
@@ -97,7 +146,12 @@ class OptimizationExecutionComponent:
 
                     well_optimization_repository = WellOptimizationRepository(self.db)
                     well_optimization_service = WellOptimizationService(well_optimization_repository)
-                    well_results = well_optimization_service.get_latest_well_optimizations()
+                    # A run served from the result cache is not saved again: load the rows it refers to
+                    if optimization_results.get("optimization_id") is not None:
+                        well_results = well_optimization_service.get_well_optimizations_by_optimization(
+                            optimization_results["optimization_id"])
+                    else:
+                        well_results = well_optimization_service.get_latest_well_optimizations()
                     st.session_state[StateKeys.SESSION_KEY_WELL] = well_results
 
                     just_calculated = True
@@ -119,6 +173,101 @@ class OptimizationExecutionComponent:
                 display_constrained_results.show()
 
 
+    def run_scenarios(self, loaded_data, scenario_settings, message_outside=False):
+        q_gl_list, q_fluid_list, wct_list, list_info = loaded_data
+
+        if not q_gl_list:
+            st.warning("No valid data loaded to execute the scenarios.")
+            return
+        if not (scenario_settings['p_qoil_scenarios'] and scenario_settings['p_qgl_scenarios']
+                and scenario_settings['qgl_limit_scenarios']):
+            st.warning("Enter at least one oil price, gas cost and QGL limit.")
+            return
+
+        just_calculated = False
+        if st.button("Execute Scenarios", type="primary", use_container_width=True):
+            with st.spinner("Solving scenarios..."):
+                try:
+                    # One fit for every scenario: only prices and gas limits vary between them
+                    fit = self._fit(loaded_data, scenario_settings, "scenarios")
+
+                    engine = ScenarioEngine(
+                        q_gl_common_range=fit["q_gl_common_range"],
+                        q_oil_rates_list=fit["q_oil_rates_list"],
+                        qgl_min=scenario_settings['qgl_min_scenarios'],
+                        solver=scenario_settings.get('solver_scenarios', "dp"),
+                        solver_options=SolverOptions(**scenario_settings.get('solver_options_scenarios', {})),
+                        presolve=scenario_settings.get('presolve_scenarios', "exact"),
+                        marginal_cache=self.marginal_cache,
+                        workers=scenario_settings.get('workers_scenarios', 1))
+                    table = engine.run(scenario_settings['p_qoil_scenarios'],
+                                       scenario_settings['p_qgl_scenarios'],
+                                       scenario_settings['qgl_limit_scenarios'])
+                    scenario_results = {"table": table, "instrumentation": engine.instrumentation}
+
+                    st.session_state[StateKeys.SESSION_KEY_SCENARIOS] = scenario_results
+                    st.session_state[StateKeys.SESSION_KEY_LAST_OPTIMIZATION_TAB] = "scenarios"
+                    just_calculated = True
+                    if not message_outside:
+                        self.optimization_completed_message(flag="scenarios")
+                        DisplayScenarioResults(scenario_results).show()
+
+                except Exception as e:
+                    st.error(f"❌ Error during scenario optimization: {str(e)}")
+                    st.exception(e)
+
+        if not just_calculated and StateKeys.SESSION_KEY_SCENARIOS in st.session_state:
+            if not message_outside:
+                self.optimization_completed_message(flag="scenarios")
+                DisplayScenarioResults(st.session_state[StateKeys.SESSION_KEY_SCENARIOS]).show()
+
+    def run_rolling_horizon(self, loaded_data, horizon_settings, message_outside=False):
+        q_gl_list, q_fluid_list, wct_list, list_info = loaded_data
+
+        if not q_gl_list:
+            st.warning("No valid data loaded to execute the rolling horizon.")
+            return
+        if not horizon_settings['qgl_limit_horizon']:
+            st.warning("Enter the available QGL of at least one period.")
+            return
+
+        just_calculated = False
+        if st.button("Execute Rolling Horizon", type="primary", use_container_width=True):
+            with st.spinner("Allocating periods..."):
+                try:
+                    # Curves and MRP caps are fixed over the horizon: fit and cap once, then step the gas limit
+                    fit = self._fit(loaded_data, horizon_settings, "horizon")
+                    analysis = calculate_marginal_analysis(
+                        fit["q_gl_common_range"], fit["q_oil_rates_list"],
+                        horizon_settings['p_qoil_horizon'], horizon_settings['p_qgl_horizon'], self.marginal_cache)
+
+                    allocator = RollingHorizonAllocator(
+                        q_gl=fit["q_gl_common_range"],
+                        q_fluid_wells=fit["q_oil_rates_list"],
+                        qgl_min=horizon_settings['qgl_min_horizon'],
+                        p_qgl_list=analysis.p_qgl_optim_list,
+                        solver=horizon_settings.get('solver_horizon', "dp"),
+                        solver_options=SolverOptions(**horizon_settings.get('solver_options_horizon', {})),
+                        presolve=horizon_settings.get('presolve_horizon', "exact"),
+                        max_change=horizon_settings.get('max_change_horizon'))
+                    horizon_results = allocator.run(horizon_settings['qgl_limit_horizon'])
+
+                    st.session_state[StateKeys.SESSION_KEY_HORIZON] = horizon_results
+                    st.session_state[StateKeys.SESSION_KEY_LAST_OPTIMIZATION_TAB] = "horizon"
+                    just_calculated = True
+                    if not message_outside:
+                        self.optimization_completed_message(flag="horizon")
+                        DisplayHorizonResults(horizon_results, list_info).show()
+
+                except Exception as e:
+                    st.error(f"❌ Error during rolling horizon optimization: {str(e)}")
+                    st.exception(e)
+
+        if not just_calculated and StateKeys.SESSION_KEY_HORIZON in st.session_state:
+            if not message_outside:
+                self.optimization_completed_message(flag="horizon")
+                DisplayHorizonResults(st.session_state[StateKeys.SESSION_KEY_HORIZON], list_info).show()
+
     def optimization_completed_message(self, flag):
         if flag == "constrained":
             st.markdown(f"""
@@ -139,4 +288,24 @@ class OptimizationExecutionComponent:
                     <div class="banner-path">Total qgl has stabilized. The results are ready for analysis.</div>
                 </div>
             </div>
-        """, unsafe_allow_html=True)
\ No newline at end of file
+        """, unsafe_allow_html=True)
+        elif flag == "scenarios":
+            st.markdown(f"""
+                <div class="save-banner-ok">
+                    <span style="font-size:24px;">🚀</span>
+                    <div>
+                        <strong>Scenarios completed!</strong>
+                    <div class="banner-path">Every combination of prices and QGL limits is ready for analysis.</div>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        elif flag == "horizon":
+            st.markdown(f"""
+                <div class="save-banner-ok">
+                    <span style="font-size:24px;">🚀</span>
+                    <div>
+                        <strong>Rolling horizon completed!</strong>
+                    <div class="banner-path">Every period of the forecast is allocated and ready for analysis.</div>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
@@ -140,9 +140,8 @@ def _build_well_curves_figure(constrained_results: dict, well_results: list):
         optimal_prod = getattr(well_result, "optimal_production", None)
         if optimal_qgl is not None and len(fluid) > 0 and len(qgl) > 0:
             try:
-                i_opt = list(qgl).index(optimal_qgl)
-                opt_fluid = fluid[i_opt] if i_opt < len(fluid) else 0
-            except (ValueError, IndexError):
+                opt_fluid = float(np.interp(optimal_qgl, qgl, fluid))
+            except (ValueError, TypeError):
                 opt_fluid = 0
             ax.axvline(x=optimal_qgl, color="#c53030", linestyle="--", linewidth=1.0)
             ax.plot(optimal_qgl, optimal_prod, "+", color="#c53030", markersize=10, markeredgewidth=2.5)
@@ -150,9 +149,8 @@ def _build_well_curves_figure(constrained_results: dict, well_results: list):
         mrp_qgl = p_qgl_list[idx] if idx < len(p_qgl_list) else None
         if mrp_qgl is not None and len(fluid) > 0 and len(qgl) > 0:
             try:
-                i_mrp = list(q_gl_common).index(mrp_qgl)
-                mrp_fluid = fluid[i_mrp] if i_mrp < len(fluid) else 0
-            except (ValueError, IndexError, TypeError):
+                mrp_fluid = float(np.interp(mrp_qgl, qgl, fluid))
+            except (ValueError, TypeError):
                 mrp_fluid = 0
             mrp_oil = p_qoil_list[idx] if idx < len(p_qoil_list) else 0
             ax.axvline(x=mrp_qgl, color="#4a5568", linestyle="--", linewidth=1.0)
@@ -1,8 +1,44 @@
+import os
+import pandas as pd
 import streamlit as st
 from backend.entities.database import SnowflakeDB
 from app.components.optimization.display_constrained_results import DisplayConstrainedResults
 from app.components.optimization.display_global_results import DisplayGlobalResults
 
+SOLVER_OPTIONS = {
+    "MILP (CBC)": "milp",
+    "MILP (HiGHS, sparse)": "highs",
+    "MILP (CBC, SOS2 piecewise-linear)": "sos2",
+    "Dynamic programming (gas lattice, approximate)": "dp",
+    "Greedy heuristic (fast, reports gap)": "greedy",
+}
+
+# The continuous allocator returns one allocation, so it is offered for the constrained run only
+CONSTRAINED_SOLVER_OPTIONS = dict(SOLVER_OPTIONS, **{
+    "Continuous (Lagrangian, concave curves)": "lagrangian",
+})
+
+GLOBAL_MODE_OPTIONS = {
+    "Sampled sweep": "sweep",
+    "DP frontier (single pass)": "frontier",
+}
+
+PRESOLVE_OPTIONS = {
+    "Exact (caps, minimum, dominated points)": "exact",
+    "Concave envelope (smaller, may lose optimality)": "envelope",
+    "Off": "off",
+}
+
+FITTING_METHOD_OPTIONS = {
+    "Linear least squares (fast)": "auto",
+    "Nonlinear (curve_fit)": "curve_fit",
+}
+
+GRID_MODE_OPTIONS = {
+    "Shared grid (whole field range)": "common",
+    "Per-well grid (tested range only)": "per_well",
+}
+
 
 class OptimizationSettingsComponent:
     def __init__(self):
@@ -13,6 +49,19 @@ class OptimizationSettingsComponent:
         self.qgl_min_constrained = 300
         self.p_qoil_constrained = 70.0
         self.p_qgl_constrained = 300.0
+        self.solver_global = "milp"
+        self.mode_global = "sweep"
+        self.solver_constrained = "milp"
+        self.presolve_global = "exact"
+        self.presolve_constrained = "exact"
+        self.grid_mode_global = "common"
+        self.grid_mode_constrained = "common"
+        self.refine_global = False
+        self.refine_constrained = False
+        self.uncertainty_constrained = None
+        self.header_limits_constrained = None
+        self.use_index_constrained = False
+        self.sensitivity_delta_constrained = 500.0
 
     
     def choose_global_settings(self, use_expander=True, render_button=None):
@@ -54,10 +103,53 @@ class OptimizationSettingsComponent:
                     key="qgl_min_global"
                 )
 
+            with row2_col2:
+                solver_label = st.selectbox(
+                    "Solver",
+                    options=list(SOLVER_OPTIONS),
+                    index=0,
+                    key="solver_global"
+                )
+                self.solver_global = SOLVER_OPTIONS[solver_label]
+
+            row3_col1, row3_col2 = st.columns(2)
+            with row3_col1:
+                mode_label = st.selectbox(
+                    "Curve computation",
+                    options=list(GLOBAL_MODE_OPTIONS),
+                    index=0,
+                    key="mode_global"
+                )
+                self.mode_global = GLOBAL_MODE_OPTIONS[mode_label]
+            with row3_col2:
+                self.presolve_global = self._choose_presolve("global")
+            self.grid_mode_global = self._choose_grid_mode("global")
+            self.fitting_global = self._choose_fitting("global")
+            self.refine_global = self._choose_refinement("global")
+            self.workers_global = st.number_input(
+                "Parallel workers",
+                min_value=1,
+                max_value=max(os.cpu_count() or 1, 1),
+                value=1,
+                step=1,
+                key="workers_global",
+                help="Processes solving sweep points at the same time; raise it for the sampled "
+                     "sweep with CBC, HiGHS or SOS2 (DP and greedy points are too quick to gain from it)"
+            )
+            solver_options = self._choose_solver_options("global")
+
             settings = dict(
                 p_qoil_global=self.p_qoil_global,
                 p_qgl_global=self.p_qgl_global,
-                qgl_min_global=self.qgl_min_global
+                qgl_min_global=self.qgl_min_global,
+                solver_global=self.solver_global,
+                mode_global=self.mode_global,
+                solver_options_global=solver_options,
+                presolve_global=self.presolve_global,
+                grid_mode_global=self.grid_mode_global,
+                fitting_global=self.fitting_global,
+                refine_global=self.refine_global,
+                workers_global=int(self.workers_global)
             )
             if render_button:
                 render_button(settings)
@@ -68,10 +160,11 @@ class OptimizationSettingsComponent:
                 return _content()
         return _content()
 
-    def choose_constrained_settings(self, use_expander=True, render_button=None):
+    def choose_constrained_settings(self, use_expander=True, render_button=None, well_headers=None):
         '''
         If use_expander=False, only the inputs are rendered (no expander wrapper).
         If render_button is a callable(settings_dict), it is called at the end so the button renders inside the same expander.
+        If well_headers (the compressor header of each loaded well) is given, a capacity per header can be set.
         '''
         def _content():
             row1_col1, row1_col2 = st.columns(2)
@@ -118,11 +211,56 @@ class OptimizationSettingsComponent:
                     key="p_qgl"
                 )
 
+            row3_col1, row3_col2 = st.columns(2)
+            with row3_col1:
+                solver_label = st.selectbox(
+                    "Solver",
+                    options=list(CONSTRAINED_SOLVER_OPTIONS),
+                    index=0,
+                    key="solver_constrained"
+                )
+                self.solver_constrained = CONSTRAINED_SOLVER_OPTIONS[solver_label]
+            with row3_col2:
+                self.presolve_constrained = self._choose_presolve("constrained")
+            self.grid_mode_constrained = self._choose_grid_mode("constrained")
+            self.fitting_constrained = self._choose_fitting("constrained")
+            self.refine_constrained = self._choose_refinement("constrained")
+            self.use_index_constrained = st.checkbox(
+                "Allocation index",
+                value=False,
+                key="use_index_constrained",
+                help="Answers the QGL limit from this field's precomputed frontier at these prices "
+                     "(gas lattice approximation, reports its gap); built on the first run and kept on disk"
+            )
+            self.sensitivity_delta_constrained = st.number_input(
+                "Sensitivity step (Mscf)",
+                min_value=1.0,
+                max_value=None,
+                value=500.0,
+                step=100.0,
+                key="sensitivity_delta_constrained",
+                help="Production change reported for this much more and less total gas"
+            )
+            self.uncertainty_constrained = self._choose_uncertainty("constrained")
+            self.header_limits_constrained = self._choose_header_limits(well_headers, "constrained")
+            solver_options = self._choose_solver_options("constrained")
+
             settings = dict(
                 qgl_limit_constrained=self.qgl_limit_constrained,
                 qgl_min_constrained=self.qgl_min_constrained,
                 p_qoil_constrained=self.p_qoil_constrained,
-                p_qgl_constrained=self.p_qgl_constrained
+                p_qgl_constrained=self.p_qgl_constrained,
+                solver_constrained=self.solver_constrained,
+                solver_options_constrained=solver_options,
+                presolve_constrained=self.presolve_constrained,
+                grid_mode_constrained=self.grid_mode_constrained,
+                fitting_constrained=self.fitting_constrained,
+                refine_constrained=self.refine_constrained,
+                use_index_constrained=self.use_index_constrained,
+                sensitivity_delta_constrained=self.sensitivity_delta_constrained,
+                uncertainty_constrained=self.uncertainty_constrained,
+                well_headers_constrained=well_headers if self.header_limits_constrained else None,
+                header_limits_constrained=self.header_limits_constrained
             )
             if render_button:
                 render_button(settings)
@@ -132,3 +270,364 @@ class OptimizationSettingsComponent:
             with st.expander("Configuration of Optimization", expanded=True):
                 return _content()
         return _content()
+
+    def choose_scenario_settings(self, use_expander=True, render_button=None):
+        '''
+        Vectors of oil prices, gas costs and gas limits; every combination is one scenario.
+        If render_button is a callable(settings_dict), it is called at the end so the button renders inside the same expander.
+        '''
+        def _content():
+            self.p_qoil_scenarios = self._choose_values(
+                "Oil prices (USD/bbl)", "50, 70, 100", key="p_qoil_scenarios")
+            self.p_qgl_scenarios = self._choose_values(
+                "Gas costs (USD/Mscf)", "1, 5, 10", key="p_qgl_scenarios")
+            self.qgl_limit_scenarios = self._choose_values(
+                "Total QGL limits (Mscf)", "500, 1000, 2000, 4000", key="qgl_limit_scenarios")
+
+            row1_col1, row1_col2 = st.columns(2)
+            with row1_col1:
+                self.qgl_min_scenarios = st.number_input(
+                    "Minimum QGL limit (Mscf)",
+                    min_value=0.1,
+                    max_value=None,
+                    value=1.0,
+                    step=1.0,
+                    key="qgl_min_scenarios"
+                )
+            with row1_col2:
+                solver_label = st.selectbox(
+                    "Solver",
+                    options=list(SOLVER_OPTIONS),
+                    index=list(SOLVER_OPTIONS.values()).index("dp"),
+                    key="solver_scenarios",
+                    help="Dynamic programming answers every gas limit of a price case from one pass, "
+                         "on a gas lattice (approximate, reports Feasible where its bound leaves a gap)"
+                )
+                self.solver_scenarios = SOLVER_OPTIONS[solver_label]
+
+            row2_col1, row2_col2 = st.columns(2)
+            with row2_col1:
+                self.presolve_scenarios = self._choose_presolve("scenarios")
+            with row2_col2:
+                self.workers_scenarios = st.number_input(
+                    "Parallel workers",
+                    min_value=1,
+                    max_value=max(os.cpu_count() or 1, 1),
+                    value=1,
+                    step=1,
+                    key="workers_scenarios",
+                    help="Processes solving price cases at the same time"
+                )
+            self.grid_mode_scenarios = self._choose_grid_mode("scenarios")
+            self.fitting_scenarios = self._choose_fitting("scenarios")
+            solver_options = self._choose_solver_options("scenarios")
+
+            settings = dict(
+                p_qoil_scenarios=self.p_qoil_scenarios,
+                p_qgl_scenarios=self.p_qgl_scenarios,
+                qgl_limit_scenarios=self.qgl_limit_scenarios,
+                qgl_min_scenarios=self.qgl_min_scenarios,
+                solver_scenarios=self.solver_scenarios,
+                solver_options_scenarios=solver_options,
+                presolve_scenarios=self.presolve_scenarios,
+                grid_mode_scenarios=self.grid_mode_scenarios,
+                fitting_scenarios=self.fitting_scenarios,
+                workers_scenarios=int(self.workers_scenarios)
+            )
+            if render_button:
+                render_button(settings)
+            return settings
+
+        if use_expander:
+            with st.expander("Scenario Configuration", expanded=True):
+                return _content()
+        return _content()
+
+    def choose_horizon_settings(self, use_expander=True, render_button=None):
+        '''
+        Forecast of available gas per period, allocated one period after the other.
+        If render_button is a callable(settings_dict), it is called at the end so the button renders inside the same expander.
+        '''
+        def _content():
+            self.qgl_limit_horizon = self._choose_values(
+                "Available QGL per period (Mscf)", "1000, 1200, 900, 900, 1500, 800",
+                key="qgl_limit_horizon", keep_order=True)
+
+            row1_col1, row1_col2 = st.columns(2)
+            with row1_col1:
+                self.p_qoil_horizon = st.number_input(
+                    "Oil price (USD/bbl)",
+                    min_value=0.1,
+                    max_value=None,
+                    value=100.0,
+                    step=1.0,
+                    key="p_qoil_horizon"
+                )
+            with row1_col2:
+                self.p_qgl_horizon = st.number_input(
+                    "Gas price (USD/Mscf)",
+                    min_value=0.1,
+                    max_value=None,
+                    value=1.0,
+                    step=1.0,
+                    key="p_qgl_horizon"
+                )
+
+            row2_col1, row2_col2 = st.columns(2)
+            with row2_col1:
+                self.qgl_min_horizon = st.number_input(
+                    "Minimum QGL limit (Mscf)",
+                    min_value=0.1,
+                    max_value=None,
+                    value=1.0,
+                    step=1.0,
+                    key="qgl_min_horizon"
+                )
+            with row2_col2:
+                self.max_change_horizon = st.number_input(
+                    "Max change per well between periods (Mscf)",
+                    min_value=0.0,
+                    max_value=None,
+                    value=0.0,
+                    step=10.0,
+                    key="max_change_horizon",
+                    help="0 lets every well move freely from one period to the next"
+                )
+
+            row3_col1, row3_col2 = st.columns(2)
+            with row3_col1:
+                solver_label = st.selectbox(
+                    "Solver",
+                    options=list(SOLVER_OPTIONS),
+                    index=list(SOLVER_OPTIONS.values()).index("dp"),
+                    key="solver_horizon",
+                    help="Every period is re-solved from the previous period's allocation"
+                )
+                self.solver_horizon = SOLVER_OPTIONS[solver_label]
+            with row3_col2:
+                self.presolve_horizon = self._choose_presolve("horizon")
+            self.grid_mode_horizon = self._choose_grid_mode("horizon")
+            self.fitting_horizon = self._choose_fitting("horizon")
+            solver_options = self._choose_solver_options("horizon")
+
+            settings = dict(
+                qgl_limit_horizon=self.qgl_limit_horizon,
+                p_qoil_horizon=self.p_qoil_horizon,
+                p_qgl_horizon=self.p_qgl_horizon,
+                qgl_min_horizon=self.qgl_min_horizon,
+                max_change_horizon=self.max_change_horizon or None,
+                solver_horizon=self.solver_horizon,
+                solver_options_horizon=solver_options,
+                presolve_horizon=self.presolve_horizon,
+                grid_mode_horizon=self.grid_mode_horizon,
+                fitting_horizon=self.fitting_horizon
+            )
+            if render_button:
+                render_button(settings)
+            return settings
+
+        if use_expander:
+            with st.expander("Rolling Horizon Configuration", expanded=True):
+                return _content()
+        return _content()
+
+    def _choose_values(self, label: str, default: str, key: str, keep_order: bool = False) -> list:
+        '''
+        Comma-separated list of positive numbers, returned sorted and without repeats,
+        or as entered when keep_order is set (e.g. a forecast, one value per period).
+        '''
+        text = st.text_input(label, value=default, key=key, help="Comma-separated values")
+        try:
+            values = [float(value) for value in text.replace(";", ",").split(",") if value.strip()]
+        except ValueError:
+            st.warning(f"{label}: enter numbers separated by commas")
+            return []
+        if not keep_order:
+            values = sorted(set(values))
+        return [value for value in values if value > 0]
+
+    def _choose_presolve(self, key_suffix: str) -> str:
+        '''
+        Candidate-point pruning applied before the model is built.
+        '''
+        presolve_label = st.selectbox(
+            "Presolve",
+            options=list(PRESOLVE_OPTIONS),
+            index=0,
+            key=f"presolve_{key_suffix}",
+            help="Removes grid points that cannot be optimal before solving"
+        )
+        return PRESOLVE_OPTIONS[presolve_label]
+
+    def _choose_grid_mode(self, key_suffix: str) -> str:
+        '''
+        Injection grid the curves are evaluated and optimized on.
+        '''
+        grid_label = st.selectbox(
+            "Injection grid",
+            options=list(GRID_MODE_OPTIONS),
+            index=0,
+            key=f"grid_mode_{key_suffix}",
+            help="A per-well grid stops at each well's largest tested rate, so no extrapolated point can be chosen"
+        )
+        return GRID_MODE_OPTIONS[grid_label]
+
+    def _choose_fitting(self, key_suffix: str) -> dict:
+        '''
+        Curve fitting method, and whether wells are fitted in parallel. Parallel fitting is
+        off by default: only the nonlinear fit is slow enough to gain from worker processes.
+        '''
+        col1, col2 = st.columns(2)
+        with col1:
+            method_label = st.selectbox(
+                "Curve fitting",
+                options=list(FITTING_METHOD_OPTIONS),
+                index=0,
+                key=f"fitting_method_{key_suffix}",
+                help="The linear fit solves the same models in milliseconds per well"
+            )
+        with col2:
+            parallel = st.checkbox(
+                "Parallel fitting",
+                value=False,
+                key=f"parallel_fitting_{key_suffix}",
+                help="Fits wells in worker processes; used with the nonlinear fit, several wells and CPUs only"
+            )
+        return dict(fitting_method=FITTING_METHOD_OPTIONS[method_label], parallel=parallel)
+
+    def _choose_refinement(self, key_suffix: str) -> bool:
+        '''
+        Coarse-to-fine solve: a ~50 point grid first, then finer bands around each well's choice.
+        '''
+        return st.checkbox(
+            "Coarse-to-fine refinement",
+            value=False,
+            key=f"refine_{key_suffix}",
+            help="Solves on a coarse grid, then re-solves on finer bands until the objective stops changing"
+        )
+
+    def _choose_uncertainty(self, key_suffix: str) -> dict:
+        '''
+        Monte Carlo over curves sampled from the fit covariance. Returns the sampling
+        options, or None when the analysis is off.
+        '''
+        enabled = st.checkbox(
+            "Curve uncertainty (Monte Carlo)",
+            value=False,
+            key=f"uncertainty_{key_suffix}",
+            help="Re-allocates the gas limit on curves sampled from each fit's parameter covariance"
+        )
+        if not enabled:
+            return None
+        col1, col2 = st.columns(2)
+        with col1:
+            samples = st.number_input(
+                "Samples",
+                min_value=100,
+                max_value=100000,
+                value=1000,
+                step=100,
+                key=f"uncertainty_samples_{key_suffix}"
+            )
+        with col2:
+            workers = st.number_input(
+                "Parallel workers",
+                min_value=1,
+                max_value=max(os.cpu_count() or 1, 1),
+                value=1,
+                step=1,
+                key=f"uncertainty_workers_{key_suffix}",
+                help="Processes solving batches of samples at the same time"
+            )
+        return dict(samples=int(samples), workers=int(workers))
+
+    def _choose_header_limits(self, well_headers, key_suffix: str) -> dict:
+        '''
+        Gas capacity of each compressor header named in the loaded data. Returns the
+        capacities by header, or None when the data has no headers or the limits are off.
+        '''
+        if not well_headers:
+            return None
+        enabled = st.checkbox(
+            "Compressor header limits",
+            value=False,
+            key=f"header_limits_{key_suffix}",
+            help="Allocates each header's gas separately, within its own capacity and the total QGL limit"
+        )
+        if not enabled:
+            return None
+        headers = sorted(set(well_headers))
+        edited = st.data_editor(
+            pd.DataFrame({
+                "Header": headers,
+                "Wells": [well_headers.count(header) for header in headers],
+                "Capacity (Mscf)": [float(self.qgl_limit_constrained)] * len(headers)
+            }),
+            disabled=["Header", "Wells"],
+            hide_index=True,
+            use_container_width=True,
+            key=f"header_capacities_{key_suffix}"
+        )
+        return {row["Header"]: float(row["Capacity (Mscf)"]) for _, row in edited.iterrows()
+                if pd.notna(row["Capacity (Mscf)"])}
+
+    def _choose_solver_options(self, key_suffix: str) -> dict:
+        '''
+        Time limit, MIP gap and threads for the solver, plus the breakpoints of the
+        SOS2 model. Zero keeps the solver default.
+        '''
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            time_limit = st.number_input(
+                "Time limit (s)",
+                min_value=0.0,
+                value=0.0,
+                step=1.0,
+                key=f"time_limit_{key_suffix}",
+                help="0 = no limit"
+            )
+        with col2:
+            mip_gap = st.number_input(
+                "MIP gap (%)",
+                min_value=0.0,
+                max_value=100.0,
+                value=0.0,
+                step=0.01,
+                key=f"mip_gap_{key_suffix}",
+                help="0 = solver default"
+            )
+        with col3:
+            threads = st.number_input(
+                "Threads",
+                min_value=0,
+                value=0,
+                step=1,
+                key=f"threads_{key_suffix}",
+                help="0 = solver default (not configurable for HiGHS)"
+            )
+        col4, col5 = st.columns(2)
+        with col4:
+            breakpoints = st.number_input(
+                "Breakpoints per well",
+                min_value=0,
+                value=0,
+                step=1,
+                key=f"breakpoints_{key_suffix}",
+                help="SOS2 solver only. 0 = default (24)"
+            )
+        with col5:
+            breakpoint_tolerance = st.number_input(
+                "Breakpoint tolerance (bbl)",
+                min_value=0.0,
+                value=0.0,
+                step=0.1,
+                key=f"breakpoint_tolerance_{key_suffix}",
+                help="SOS2 solver only. Stop adding breakpoints once the curve error is below this. 0 = use all breakpoints"
+            )
+        return dict(
+            time_limit=time_limit or None,
+            mip_gap=(mip_gap / 100) or None,
+            threads=int(threads) or None,
+            breakpoints=int(breakpoints) or None,
+            breakpoint_tolerance=breakpoint_tolerance or None
+        )
@@ -1,3 +1,4 @@
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
@@ -85,6 +86,156 @@ class Plotter:
         )
         return fig
 
+    '''
+    Method to create a scenario heatmap.
+    It pivots the scenario table of one gas cost into oil price (rows) by gas limit (columns)
+    and colours each cell with the chosen metric; infeasible scenarios stay blank.
+    '''
+    def create_scenario_heatmap(self, metric, p_qgl, metric_label=None):
+        table = self.optimization_results["table"]
+        pivot = table[table["p_qgl"] == p_qgl].pivot(index="p_qoil", columns="qgl_limit", values=metric)
+        metric_label = metric_label or metric
+
+        fig = go.Figure(
+            go.Heatmap(
+                x=[f"{limit:g}" for limit in pivot.columns],
+                y=[f"{price:g}" for price in pivot.index],
+                z=pivot.values,
+                colorscale="Viridis",
+                colorbar=dict(title=dict(text=metric_label, font=dict(color=self.text_color)),
+                              tickfont=dict(color=self.text_color)),
+                hovertemplate="Oil price: %{y} USD/bbl<br>QGL limit: %{x} Mscf<br>"
+                              + metric_label + ": %{z:,.1f}<extra></extra>",
+            )
+        )
+        fig.update_layout(
+            xaxis=dict(
+                title_text="Total Gas Injection Limit (qgl_limit)",
+                type="category",
+                tickfont=dict(color=self.text_color),
+                title_font=dict(color=self.text_color)
+            ),
+            yaxis=dict(
+                title_text="Oil price (USD/bbl)",
+                type="category",
+                tickfont=dict(color=self.text_color),
+                title_font=dict(color=self.text_color)
+            ),
+            height=500,
+            plot_bgcolor=self.bg_color,
+            paper_bgcolor=self.bg_color,
+            font=dict(color=self.text_color),
+            margin=dict(l=50, r=50, b=80, t=40, pad=4)
+        )
+        return fig
+
+
+    '''
+    Method to create a histogram of the total production over the sampled fields of the
+    curve uncertainty analysis, with a dashed line at each reported percentile.
+    '''
+    def create_uncertainty_histogram(self):
+        uncertainty = self.optimization_results["uncertainty"]
+        fig = go.Figure()
+        fig.add_trace(
+            go.Histogram(
+                x=uncertainty["total_production"],
+                nbinsx=50,
+                name="Sampled fields",
+                marker=dict(color=self.line_color, line=dict(width=0)),
+                opacity=0.8
+            )
+        )
+        for percentile, value in zip(uncertainty["percentiles"], uncertainty["total_production_percentiles"]):
+            fig.add_vline(
+                x=value,
+                line=dict(color=self.last_value_line_color, width=2, dash='dash'),
+                annotation_text=f"P{percentile}: {value:.0f} bbl",
+                annotation_position="top",
+                annotation_font=dict(color=self.last_value_line_color)
+            )
+        fig.update_layout(
+            xaxis=dict(
+                title_text="Total Oil Production (bbl)",
+                gridcolor=self.grid_color,
+                linecolor=self.grid_color,
+                tickfont=dict(color=self.text_color),
+                title_font=dict(color=self.text_color)
+            ),
+            yaxis=dict(
+                title_text="Sampled fields",
+                gridcolor=self.grid_color,
+                linecolor=self.grid_color,
+                tickfont=dict(color=self.text_color),
+                title_font=dict(color=self.text_color)
+            ),
+            height=400,
+            plot_bgcolor=self.bg_color,
+            paper_bgcolor=self.bg_color,
+            font=dict(color=self.text_color),
+            showlegend=False,
+            margin=dict(l=50, r=50, b=60, t=60, pad=4)
+        )
+        return fig
+
+
+    '''
+    Method to create a rolling-horizon chart.
+    It stacks each well's gas injection per period, with the available gas of each period as a
+    dashed step line, and plots the total oil production of each period on a second axis.
+    '''
+    def create_horizon_chart(self, well_names=None):
+        results = self.optimization_results
+        periods = list(range(1, len(results["qgl_limit"]) + 1))
+        well_qgl = np.asarray(results["well_gas_injection_rates"], dtype=float)
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        for well in range(well_qgl.shape[1]):
+            name = well_names[well] if well_names and well < len(well_names) else f"Well {well + 1}"
+            fig.add_trace(
+                go.Bar(x=periods, y=well_qgl[:, well], name=name,
+                       hovertemplate=name + "<br>Period %{x}<br>QGL: %{y:.0f} mscfd<extra></extra>"),
+                secondary_y=False
+            )
+        fig.add_trace(
+            go.Scatter(x=periods, y=results["qgl_limit"], mode="lines", name="Available QGL",
+                       line=dict(color=self.last_value_line_color, width=2, dash="dash", shape="hvh")),
+            secondary_y=False
+        )
+        fig.add_trace(
+            go.Scatter(x=periods, y=results["total_production"], mode="lines+markers", name="Total Production",
+                       line=dict(width=3, color=self.line_color), marker=dict(color=self.marker_color, size=7)),
+            secondary_y=True
+        )
+        fig.update_layout(
+            barmode="stack",
+            xaxis=dict(
+                title_text="Period",
+                dtick=1,
+                gridcolor=self.grid_color,
+                linecolor=self.grid_color,
+                tickfont=dict(color=self.text_color),
+                title_font=dict(color=self.text_color)
+            ),
+            height=550,
+            plot_bgcolor=self.bg_color,
+            paper_bgcolor=self.bg_color,
+            font=dict(color=self.text_color),
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1,
+                font=dict(color=self.text_color)
+            ),
+            margin=dict(l=50, r=50, b=80, t=80, pad=4)
+        )
+        fig.update_yaxes(title_text="Gas injection (mscfd)", gridcolor=self.grid_color,
+                         tickfont=dict(color=self.text_color), secondary_y=False)
+        fig.update_yaxes(title_text="Total Oil Production (bbl)", showgrid=False,
+                         tickfont=dict(color=self.text_color), secondary_y=True)
+        return fig
+
 
     '''
     Method to create a well curves chart.
@@ -121,12 +272,11 @@ class Plotter:
 
             optimal_qgl = well_result.optimal_gas_injection
             optimal_prod = well_result.optimal_production
-            optimal_index = list(well_data["q_gl_common_range"]).index(optimal_qgl)
-            optimal_fluid = list(well_data["q_fluid_predicted"])[optimal_index]
+            # Interpolated, so continuous allocations that fall between grid points work too
+            optimal_fluid = float(np.interp(optimal_qgl, well_data["q_gl_common_range"], well_data["q_fluid_predicted"]))
 
             MRP_qgl = self.optimization_results["p_qgl_optim_list"][idx]
-            MRP_qgl_index = list(self.optimization_results["q_gl_common_range"]).index(MRP_qgl)
-            MRP_fluid = list(well_data["q_fluid_predicted"])[MRP_qgl_index]
+            MRP_fluid = float(np.interp(MRP_qgl, well_data["q_gl_common_range"], well_data["q_fluid_predicted"]))
 
 
             fig_prod.add_trace(
@@ -6,6 +6,8 @@ from app.components.optimization.optimization_history import OptimizationHistory
 from app.components.optimization.optimization_execution import OptimizationExecutionComponent
 from app.components.optimization.display_constrained_results import DisplayConstrainedResults
 from app.components.optimization.display_global_results import DisplayGlobalResults
+from app.components.optimization.display_scenario_results import DisplayScenarioResults
+from app.components.optimization.display_horizon_results import DisplayHorizonResults
 from app.components.optimization.optimization_report_generator import OptimizationReportGenerator
 from backend.entities.database import SnowflakeDB
 from backend.services.data_loader_service import DataLoader
@@ -16,6 +18,7 @@ class OptimizationPage:
         self.db = SnowflakeDB()
         self.file_upload = FileUploadComponent()
         self.loaded_data = None
+        self.well_headers = None
         self.optimization_settings = OptimizationSettingsComponent()
         self.optimization_execution = OptimizationExecutionComponent(self.db)
         self.optimization_history = OptimizationHistoryComponent(self.db)
@@ -34,7 +37,9 @@ class OptimizationPage:
         temp_path = st.session_state.get(StateKeys.SESSION_KEY_TEMP_PATH)
         is_data_ready = temp_path is not None and Path(temp_path).exists()
         if is_data_ready and self.loaded_data is None:
-            self.loaded_data = DataLoader(temp_path).load_data()
+            loader = DataLoader(temp_path)
+            self.loaded_data = loader.load_data()
+            self.well_headers = loader.load_well_headers()
 
         with col2:
             st.subheader("Optimizer")
@@ -44,7 +49,7 @@ class OptimizationPage:
         self._show_results_of_optimization()
 
     def _show_results_of_optimization(self):
-        """Section 'Results of Optimization'. Order always: 1 Constrained, 2 Global. The one run last is expanded by default."""
+        """Section 'Results of Optimization'. Order always: 1 Constrained, 2 Global, 3 Scenarios, 4 Rolling horizon. The one run last is expanded by default."""
         head_col, btn_col = st.columns([4, 1])
         with head_col:
             st.subheader("Results of Optimization")
@@ -53,12 +58,18 @@ class OptimizationPage:
 
         last_tab = st.session_state.get(StateKeys.SESSION_KEY_LAST_OPTIMIZATION_TAB, "constrained")
 
-        with st.expander("Constrained optimization results", expanded=(last_tab != "global")):
+        with st.expander("Constrained optimization results", expanded=(last_tab == "constrained")):
             self._render_constrained_results()
 
         with st.expander("Global optimization results", expanded=(last_tab == "global")):
             self._render_global_results()
 
+        with st.expander("Scenario results", expanded=(last_tab == "scenarios")):
+            self._render_scenario_results()
+
+        with st.expander("Rolling horizon results", expanded=(last_tab == "horizon")):
+            self._render_horizon_results()
+
     def _show_export_pdf_button(self):
         """Show 'Export to PDF' button when there is at least one result to export."""
         has_constrained = (
@@ -103,8 +114,11 @@ class OptimizationPage:
                 display.show_summary_metrics()
                 st.markdown("---")
                 display.show_detailed_results_by_well()
+                display.show_header_results()
             with c2:
                 display.show_production_curves()
+            display.show_sensitivity()
+            display.show_uncertainty()
         else:
             self._show_no_optimization_message("constrained")
 
@@ -125,6 +139,21 @@ class OptimizationPage:
         else:
             self._show_no_optimization_message("global")
 
+    def _render_scenario_results(self):
+        if StateKeys.SESSION_KEY_SCENARIOS in st.session_state:
+            DisplayScenarioResults(st.session_state[StateKeys.SESSION_KEY_SCENARIOS]).show()
+        else:
+            self._show_no_optimization_message("scenarios")
+
+    def _render_horizon_results(self):
+        if StateKeys.SESSION_KEY_HORIZON in st.session_state:
+            list_info = ["Unknown Field"]
+            if self.loaded_data is not None:
+                _, _, _, list_info = self.loaded_data
+            DisplayHorizonResults(st.session_state[StateKeys.SESSION_KEY_HORIZON], list_info).show()
+        else:
+            self._show_no_optimization_message("horizon")
+
     def _show_no_optimization_message(self, optimization_type: str):
         """Message when no optimization has been run yet."""
         st.info(
@@ -136,9 +165,11 @@ class OptimizationPage:
         This method is called by the app to show the tabs.
         It is called once when the user navigates to the optimization page.
         """
-        tab1, tab2, tab3 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
             "Constrained Optimization",
             "Global Optimization",
+            "Scenarios",
+            "Rolling Horizon",
             "Optimization History"
         ])
         with tab1:
@@ -146,6 +177,7 @@ class OptimizationPage:
                 with st.expander("Configuration of Optimization", expanded=True):
                     constrained_settings = self.optimization_settings.choose_constrained_settings(
                         use_expander=False,
+                        well_headers=self.well_headers,
                         render_button=lambda s: self.optimization_execution.run_constrained_optimization(
                             self.loaded_data, s, message_outside=True
                         ),
@@ -170,6 +202,34 @@ class OptimizationPage:
                 self._show_warning()
 
         with tab3:
+            if is_data_ready:
+                with st.expander("Scenario Configuration", expanded=True):
+                    self.optimization_settings.choose_scenario_settings(
+                        use_expander=False,
+                        render_button=lambda s: self.optimization_execution.run_scenarios(
+                            self.loaded_data, s, message_outside=True
+                        ),
+                    )
+                if StateKeys.SESSION_KEY_SCENARIOS in st.session_state:
+                    self.optimization_execution.optimization_completed_message(flag="scenarios")
+            else:
+                self._show_warning()
+
+        with tab4:
+            if is_data_ready:
+                with st.expander("Rolling Horizon Configuration", expanded=True):
+                    self.optimization_settings.choose_horizon_settings(
+                        use_expander=False,
+                        render_button=lambda s: self.optimization_execution.run_rolling_horizon(
+                            self.loaded_data, s, message_outside=True
+                        ),
+                    )
+                if StateKeys.SESSION_KEY_HORIZON in st.session_state:
+                    self.optimization_execution.optimization_completed_message(flag="horizon")
+            else:
+                self._show_warning()
+
+        with tab5:
             with st.container():
                 self.optimization_history.show()
                 #self.optimization_history.show_optimization_history()
@@ -0,0 +1,121 @@
+# services/allocation_greedy_service.py
+import heapq
+import numpy as np
+from typing import List, Optional, Tuple
+from backend.services.grid_service import QglGrid, as_well_grids
+from backend.services.presolve_service import upper_concave_envelope
+
+
+class GreedyAllocator:
+    """Fast approximate solver for the gas lift allocation problem.
+
+    Every well starts at its cheapest admissible point. Gas is then handed out one
+    increment at a time to the well whose next step on its upper concave envelope
+    gains the most oil per Mscf, with a heap over wells, so a solve costs
+    O(S log N) for S envelope steps and N wells. When the best step no longer fits,
+    that well takes the best point it can still afford and leaves the heap.
+
+    Taking that step fractionally gives the LP relaxation of the problem, so the
+    production at the first step that does not fit plus the fraction of its gain
+    bounds the optimum from above. The allocation and the bound together give the gap.
+    """
+
+    def __init__(self,
+                 q_gl: QglGrid,
+                 q_fluid_wells: List[np.ndarray],
+                 qgl_min: float,
+                 p_qgl_list: List[float],
+                 candidates: List[np.ndarray] = None):
+        """
+        Args:
+            q_gl: Gas lift grid shared by all wells, or one grid per well
+            q_fluid_wells: Production on the grid for each well
+            qgl_min: Minimum gas rate allowed to inject to a well
+            p_qgl_list: Maximum gas rate per well (MRP caps)
+            candidates: Indices of q_gl each well may choose from, defaults to the whole grid
+        """
+        self.q_fluid_wells = [np.asarray(q, dtype=float) for q in q_fluid_wells]
+        self.q_gl_wells = as_well_grids(q_gl, len(self.q_fluid_wells))
+        self.qgl_min = qgl_min
+        self.p_qgl_list = p_qgl_list
+        self.allowed = candidates
+        self.candidates = [self._candidate_points(i) for i in range(len(self.q_fluid_wells))]
+        self.envelopes = [upper_concave_envelope(gas, values) for _, gas, values in self.candidates]
+        self.objective = None
+        self.upper_bound = None
+
+    def _candidate_points(self, well: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Grid indices, gas and production of the admissible, undominated points of a well, cheapest first"""
+        q_gl = self.q_gl_wells[well]
+        q_fluid = self.q_fluid_wells[well]
+        admissible = np.where((q_gl >= self.qgl_min) & (q_gl <= self.p_qgl_list[well]))[0]
+        if self.allowed is not None:
+            admissible = np.intersect1d(admissible, self.allowed[well])
+        if admissible.size == 0:
+            return admissible, np.empty(0), np.empty(0)
+
+        order = np.lexsort((-q_fluid[admissible], q_gl[admissible]))
+        admissible = admissible[order]
+        best_before = np.maximum.accumulate(np.r_[-np.inf, q_fluid[admissible][:-1]])
+        keep = q_fluid[admissible] > best_before
+        admissible = admissible[keep]
+        return admissible, q_gl[admissible], q_fluid[admissible]
+
+    def solve(self, available_qgl_total: float) -> Optional[List[int]]:
+        """
+        Allocate one gas budget greedily. ``objective`` and ``upper_bound`` hold the
+        production of the allocation and the envelope bound afterwards.
+
+        Returns:
+            Chosen index of ``q_gl`` for each well, or None when the cheapest
+            admissible points of all wells already exceed the budget
+        """
+        self.objective = self.upper_bound = None
+        if any(indices.size == 0 for indices, _, _ in self.candidates):
+            return None
+        position = [0] * len(self.candidates)  # Current point of each well, in its candidate order
+        remaining = available_qgl_total - sum(gas[0] for _, gas, _ in self.candidates)
+        if remaining < 0:
+            return None
+        objective = float(sum(values[0] for _, _, values in self.candidates))
+        upper_bound = None
+
+        def next_step(well: int, vertex: int):
+            """Heap entry for moving a well from envelope vertex ``vertex`` to the next one"""
+            envelope = self.envelopes[well]
+            if vertex + 1 >= envelope.size:
+                return None
+            _, gas, values = self.candidates[well]
+            a, b = envelope[vertex], envelope[vertex + 1]
+            slope = (values[b] - values[a]) / (gas[b] - gas[a])
+            return -slope, well, vertex
+
+        heap = [entry for entry in (next_step(well, 0) for well in range(len(self.candidates))) if entry]
+        heapq.heapify(heap)
+        while heap:
+            negative_slope, well, vertex = heapq.heappop(heap)
+            _, gas, values = self.candidates[well]
+            target = self.envelopes[well][vertex + 1]
+            cost = gas[target] - gas[position[well]]
+            if cost <= remaining:
+                objective += values[target] - values[position[well]]
+                remaining -= cost
+                position[well] = target
+                entry = next_step(well, vertex + 1)
+                if entry:
+                    heapq.heappush(heap, entry)
+                continue
+
+            if upper_bound is None:
+                # Every steeper step is taken: filling the rest of the budget at this slope is the LP optimum
+                upper_bound = objective - negative_slope * remaining
+            # The envelope step is out of reach; take the best point the budget still affords
+            affordable = np.searchsorted(gas, gas[position[well]] + remaining, side="right") - 1
+            if affordable > position[well]:
+                objective += values[affordable] - values[position[well]]
+                remaining -= gas[affordable] - gas[position[well]]
+                position[well] = affordable
+
+        self.objective = objective
+        self.upper_bound = objective if upper_bound is None else upper_bound
+        return [int(indices[p]) for (indices, _, _), p in zip(self.candidates, position)]
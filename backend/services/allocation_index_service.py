@@ -0,0 +1,127 @@
+# services/allocation_index_service.py
+import time
+import numpy as np
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from backend.services.cache_service import DiskBackedCache, stable_digest
+from backend.services.grid_service import QglGrid, as_well_grids
+
+# Solver name the pipelines report for an allocation read from the index; it bypasses OptimizationModel
+INDEX_SOLVER = "index"
+
+
+@dataclass
+class AllocationIndex:
+    """Optimal allocation at every breakpoint of a field's production-vs-gas frontier"""
+    total_qgl: np.ndarray  # Gas used at each breakpoint, strictly increasing
+    total_production: np.ndarray  # Production at each breakpoint, strictly increasing
+    selection: np.ndarray  # Chosen q_gl index per well at each breakpoint, shaped (breakpoints, wells)
+    build_seconds: float = 0.0
+    gas_resolution: Optional[float] = None  # Mscf per lattice unit of the DP behind the frontier
+    bound_table: Optional[np.ndarray] = None  # Floor-rounded DP optimum per lattice budget, up to saturation
+
+    @classmethod
+    def build(cls,
+              q_gl: QglGrid,
+              q_fluid_wells: List[np.ndarray],
+              qgl_min: float,
+              p_qgl_list: List[float],
+              candidates: List[np.ndarray] = None) -> Optional["AllocationIndex"]:
+        """
+        One DP frontier from the cheapest allocation up to every well at its MRP cap.
+
+        Breakpoints are kept only where production rises with the gas actually used,
+        so a query is a binary search on ``total_qgl``. The frontier is exact on the
+        gas lattice only, so the floor-rounded relaxation is stored alongside it to
+        bound every answer. None when no budget admits a feasible allocation.
+        """
+        start = time.perf_counter()
+        q_fluid_wells = [np.asarray(q, dtype=float) for q in q_fluid_wells]
+        grids = as_well_grids(q_gl, len(q_fluid_wells))
+        allocator = DynamicProgrammingAllocator(
+            q_gl=grids,
+            q_fluid_wells=q_fluid_wells,
+            qgl_min=qgl_min,
+            p_qgl_list=p_qgl_list,
+            gas_resolution=max(sum(p_qgl_list), 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS,
+            candidates=candidates
+        )
+        frontier = allocator.frontier()
+        if frontier is None:
+            return None
+
+        _, selection = frontier
+        gas = sum(grid[selection[:, i]] for i, grid in enumerate(grids))
+        production = sum(rates[selection[:, i]] for i, rates in enumerate(q_fluid_wells))
+        # Lattice rounding can order two breakpoints differently by their real gas, or give
+        # several the same real gas: keep the points no cheaper point matches, and of points
+        # with the same gas the last, so both totals are increasing
+        order = np.lexsort((production, gas))
+        gas, production, selection = gas[order], production[order], selection[order]
+        keep = production > np.maximum.accumulate(np.r_[-np.inf, production[:-1]])
+        gas, production, selection = gas[keep], production[keep], selection[keep]
+        keep = np.r_[np.diff(gas) > 1e-9, True]
+        return cls(total_qgl=gas[keep], total_production=production[keep], selection=selection[keep],
+                   gas_resolution=allocator.gas_resolution, bound_table=allocator.upper_bounds(),
+                   build_seconds=time.perf_counter() - start)
+
+    @property
+    def breakpoints(self) -> int:
+        return int(self.total_qgl.size)
+
+    def position(self, qgl_limit: float) -> int:
+        """Breakpoint answering ``qgl_limit``, -1 when even the cheapest allocation does not fit"""
+        return int(np.searchsorted(self.total_qgl, float(qgl_limit) + 1e-9, side="right")) - 1
+
+    def bound(self, qgl_limit: float) -> Optional[float]:
+        """Upper bound on the unrounded optimum under ``qgl_limit``, None when it is infeasible"""
+        if self.bound_table is None:
+            return None
+        unit = min(max(int(np.floor(float(qgl_limit) / self.gas_resolution + 1e-9)), 0), self.bound_table.size - 1)
+        value = float(self.bound_table[unit])
+        return value if np.isfinite(value) else None
+
+    def query(self, qgl_limit: float) -> Optional[np.ndarray]:
+        """Chosen q_gl index per well under ``qgl_limit``, None when it is infeasible"""
+        position = self.position(qgl_limit)
+        return None if position < 0 else self.selection[position]
+
+
+class AllocationIndexStore(DiskBackedCache):
+    """
+    Persistent allocation indexes keyed by the fitted curves and everything that shapes the frontier.
+
+    The caps stand in for the prices: price pairs giving the same MRP caps share one index.
+    """
+
+    # Bumped whenever AllocationIndex changes fields, so stale disk entries are never served
+    FORMAT_VERSION = 2
+
+    def __init__(self, max_entries: int = 8, cache_dir: Optional[Path] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        super().__init__(max_entries, cache_dir, max_disk_bytes)
+
+    def key(self, q_gl: QglGrid, q_fluid_wells: List[np.ndarray], qgl_min: float,
+            p_qgl_list: List[float], presolve: str) -> str:
+        return stable_digest(
+            self.FORMAT_VERSION,
+            as_well_grids(q_gl, len(q_fluid_wells)),
+            [np.asarray(rates, dtype=float) for rates in q_fluid_wells],
+            qgl_min, [float(cap) for cap in p_qgl_list], presolve,
+        )
+
+    def get_or_build(self, q_gl: QglGrid, q_fluid_wells: List[np.ndarray], qgl_min: float,
+                     p_qgl_list: List[float], presolve: str,
+                     candidates: List[np.ndarray] = None) -> Optional[AllocationIndex]:
+        """Return the stored index of this field, building and storing it on a miss"""
+        key = self.key(q_gl, q_fluid_wells, qgl_min, p_qgl_list, presolve)
+        index = self.get(key)
+        if index is not None:
+            return index
+        self.stats["misses"] += 1
+        index = AllocationIndex.build(q_gl, q_fluid_wells, qgl_min, p_qgl_list, candidates)
+        if index is not None:
+            self.put(key, index)
+        return index
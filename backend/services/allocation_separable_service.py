@@ -0,0 +1,64 @@
+# services/allocation_separable_service.py
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+from backend.services.grid_service import QglGrid, as_well_grids
+
+# Solver name of the closed-form allocation used when the total gas row is slack
+SEPARABLE_SOLVER = "separable"
+
+
+@dataclass
+class SaturatedAllocation:
+    """Every well at the best admissible point of its own curve"""
+    selection: List[int]  # Chosen q_gl index per well
+    total_qgl: float
+    total_production: float
+
+    def fits(self, available_qgl_total: float) -> bool:
+        """True when the budget leaves the total gas constraint slack at this allocation"""
+        return self.total_qgl <= available_qgl_total
+
+
+def saturated_allocation(q_gl: QglGrid,
+                         q_fluid_wells: List[np.ndarray],
+                         qgl_min: float,
+                         p_qgl_list: List[float],
+                         candidates: List[np.ndarray] = None) -> Optional[SaturatedAllocation]:
+    """
+    Best admissible point of each well on its own, in one argmax over a (wells x grid) matrix.
+
+    Admissible points lie between ``qgl_min`` and the well's MRP cap (and among its
+    candidates when given); ties go to the cheapest point. Once the gas limit covers
+    ``total_qgl`` the total gas constraint is slack and this is the optimum, whatever
+    the solver: the problem splits into one independent choice per well.
+
+    Returns:
+        The allocation, or None when a well has no admissible point
+    """
+    grids = as_well_grids(q_gl, len(q_fluid_wells))
+    width = max((grid.size for grid in grids), default=0)
+    gas = np.full((len(grids), width), np.nan)
+    production = np.full((len(grids), width), -np.inf)
+    allowed = np.zeros((len(grids), width), dtype=bool)
+    for well, (grid, rates) in enumerate(zip(grids, q_fluid_wells)):
+        gas[well, :grid.size] = grid
+        production[well, :grid.size] = rates
+        if candidates is None:
+            allowed[well, :grid.size] = True
+        else:
+            allowed[well, candidates[well]] = True
+
+    caps = np.asarray(p_qgl_list, dtype=float)[:, np.newaxis]
+    with np.errstate(invalid="ignore"):
+        admissible = allowed & (gas >= qgl_min) & (gas <= caps)
+    if not admissible.any(axis=1).all():
+        return None
+
+    selection = np.argmax(np.where(admissible, production, -np.inf), axis=1)
+    wells = np.arange(len(grids))
+    return SaturatedAllocation(
+        selection=selection.tolist(),
+        total_qgl=float(gas[wells, selection].sum()),
+        total_production=float(production[wells, selection].sum())
+    )
@@ -0,0 +1,234 @@
+# services/cache_service.py
+import hashlib
+import os
+import pickle
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from backend.services.grid_service import as_well_grids
+
+
+def _update_digest(hasher, value: Any) -> None:
+    """Feed a value into the hasher with type tags so different layouts never collide"""
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        hasher.update(f"nd{array.dtype.str}{array.shape}".encode())
+        hasher.update(array.tobytes())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"seq{len(value)}[".encode())
+        for item in value:
+            _update_digest(hasher, item)
+        hasher.update(b"]")
+    elif isinstance(value, dict):
+        hasher.update(f"map{len(value)}{{".encode())
+        for key in sorted(value, key=str):
+            _update_digest(hasher, str(key))
+            _update_digest(hasher, value[key])
+        hasher.update(b"}")
+    elif isinstance(value, (bool, np.bool_)):
+        hasher.update(f"b{bool(value)}".encode())
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        hasher.update(f"n{float(value)!r}".encode())
+    elif value is None:
+        hasher.update(b"none")
+    else:
+        hasher.update(f"s{value}".encode())
+
+
+def stable_digest(*parts: Any) -> str:
+    """Content hash of arrays, numbers, strings and nested lists of them, stable across runs"""
+    hasher = hashlib.sha256()
+    for part in parts:
+        _update_digest(hasher, part)
+    return hasher.hexdigest()
+
+
+class LRUCache:
+    """Bounded in-memory cache that drops the least recently used entry first"""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskBackedCache:
+    """
+    Two-tier cache of picklable values keyed by content digests.
+
+    The memory tier is an LRU of values. The optional disk tier stores one
+    pickle per key and evicts the least recently used files once their total size
+    goes over ``max_disk_bytes``.
+    """
+
+    def __init__(self,
+                 max_entries: int = 16,
+                 cache_dir: Optional[Path] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.memory = LRUCache(max_entries)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+        value = self._read_disk(key)
+        if value is not None:
+            self.stats["disk_hits"] += 1
+            self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self.memory.put(key, value)
+        self._write_disk(key, value)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        self.memory.clear()
+        if self.cache_dir is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.pkl"):
+                path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # mark as recently used for eviction
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"❌ Discarding unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, value: Any) -> None:
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            print(f"❌ Could not write cache entry to {self.cache_dir}: {e}")
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used files until the tier fits in max_disk_bytes"""
+        files = sorted(self.cache_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for path in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+
+class FittingCache(DiskBackedCache):
+    """Two-tier cache of perform_fitting_group() results keyed by the well data and model choice"""
+
+    # Bumped whenever the cached dict gains or changes keys, so stale disk entries are never served
+    FORMAT_VERSION = 3
+
+    def key(self, fitting_service) -> str:
+        """Digest of the loaded q_gl/q_fluid/wct arrays and the fitting configuration"""
+        return stable_digest(
+            self.FORMAT_VERSION,
+            [np.asarray(q_gl, dtype=float) for q_gl in fitting_service.q_gl_list],
+            [np.asarray(q_fluid, dtype=float) for q_fluid in fitting_service.q_fluid_list],
+            np.asarray(fitting_service.wct_list, dtype=float),
+            fitting_service.model_name,
+            fitting_service.fitting_method,
+            fitting_service.grid_mode,
+            fitting_service.grid_points,
+        )
+
+    def get_or_fit(self, fitting_service, parallel: bool = False, max_workers: Optional[int] = None) -> Dict:
+        """
+        Return the cached fit for the service's data, fitting and storing it on a miss.
+        ``parallel`` and ``max_workers`` go to perform_fitting_group; the fit does not
+        depend on them, so they are not part of the key.
+        """
+        key = self.key(fitting_service)
+        fit = self.get(key)
+        if fit is not None:
+            return fit
+        self.stats["misses"] += 1
+        fit = fitting_service.perform_fitting_group(parallel=parallel, max_workers=max_workers)
+        self.put(key, fit)
+        return fit
+
+
+class OptimizationResultCache:
+    """
+    Bounded memo of pipeline results keyed on the fitted curves and the economic settings.
+
+    Keys are content digests, so a new upload or new prices can never hit a stale
+    entry; ``invalidate`` and ``clear`` drop entries explicitly (e.g. after a
+    solver upgrade or when memory has to be released).
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.memory = LRUCache(max_entries)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def key(self, kind: str, q_gl_common_range, q_oil_rates_list, **settings) -> str:
+        """Digest of the pipeline kind, the curves and every setting that changes the result"""
+        return stable_digest(
+            kind,
+            as_well_grids(q_gl_common_range, len(q_oil_rates_list)),
+            [np.asarray(rates, dtype=float) for rates in q_oil_rates_list],
+            settings,
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        result = self.memory.get(key)
+        if result is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return result
+
+    def put(self, key: str, result: Dict) -> None:
+        self.memory.put(key, result)
+
+    def invalidate(self, key: str) -> None:
+        self.memory.invalidate(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
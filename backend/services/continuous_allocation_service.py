@@ -0,0 +1,328 @@
+# services/continuous_allocation_service.py
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Solver name the pipelines use for this allocator; it bypasses OptimizationModel
+CONTINUOUS_SOLVER = "lagrangian"
+
+def _namdar(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """a + b q + c q^0.7 + d ln q + e exp(-q^0.6), one parameter row per well"""
+    return p[0] + p[1] * q + p[2] * q ** 0.7 + p[3] * np.log(q) + p[4] * np.exp(-(q ** 0.6))
+
+
+def _namdar_derivative(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    return p[1] + 0.7 * p[2] * q ** -0.3 + p[3] / q - 0.6 * p[4] * q ** -0.4 * np.exp(-(q ** 0.6))
+
+
+def _namdar_second_derivative(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    return (-0.21 * p[2] * q ** -1.3 - p[3] / q ** 2
+            + 0.6 * p[4] * np.exp(-(q ** 0.6)) * (0.4 * q ** -1.4 + 0.6 * q ** -0.8))
+
+
+def _dan(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """a + b q + c q^0.5 + d ln q + e exp(-q)"""
+    return p[0] + p[1] * q + p[2] * np.sqrt(q) + p[3] * np.log(q) + p[4] * np.exp(-q)
+
+
+def _dan_derivative(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    return p[1] + 0.5 * p[2] / np.sqrt(q) + p[3] / q - p[4] * np.exp(-q)
+
+
+def _dan_second_derivative(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    return -0.25 * p[2] * q ** -1.5 - p[3] / q ** 2 + p[4] * np.exp(-q)
+
+
+# Fluid rate and its first two derivatives for every model FittingService can fit
+CURVE_MODELS = {
+    "namdar": (_namdar, _namdar_derivative, _namdar_second_derivative),
+    "dan": (_dan, _dan_derivative, _dan_second_derivative),
+}
+
+
+@dataclass
+class ContinuousAllocation:
+    """Continuous injection rates from the Lagrangian allocator"""
+    status: str  # Optimal, Feasible (the dual bound leaves a gap) or Infeasible
+    q_gl: List[float]
+    q_oil: List[float]
+    shadow_price: float  # Marginal oil per Mscf of the last unit of gas (bbl/Mscf)
+    solve_seconds: float = 0.0
+    best_bound: Optional[float] = None  # Lagrangian dual bound on the total oil
+
+    @property
+    def gap(self) -> Optional[float]:
+        """Relative distance between the allocation and the dual bound"""
+        if self.best_bound is None or not self.q_oil:
+            return None
+        return abs(self.best_bound - self.total_production) / max(abs(self.best_bound), 1e-9)
+
+    @property
+    def total_production(self) -> float:
+        return float(sum(self.q_oil))
+
+    @property
+    def total_qgl(self) -> float:
+        return float(sum(self.q_gl))
+
+
+class LagrangianAllocator:
+    """
+    Equal-marginal-rate allocation on the fitted curves themselves, without a grid.
+
+    For concave curves the optimum gives every well that is not at a bound the same
+    marginal oil per Mscf, the shadow price of gas. The allocator searches that price
+    by bracketed false position (Illinois); for each price every well's rate solves
+    f_i'(q) = price by safeguarded Newton steps in log q, vectorized over all wells.
+
+    Fitted curves are often convex (or dip) just above qgl_min. There the concave
+    envelope starts with a straight edge from qgl_min to a tangent point, so a well
+    either stays at qgl_min or jumps past the tangent point once the price drops below
+    that edge's slope. When the budget falls inside such a jump, the allocator compares
+    spending the leftover on wells still at qgl_min with holding the jumping wells back;
+    this is a heuristic, so on strongly non-concave fields the grid solvers can do better.
+
+    The Lagrangian dual at the prices the search ends between bounds the optimum. The
+    allocation is reported Optimal only when that bound closes the gap up to
+    GAP_TOLERANCE; a price jump, or gas the rates could not use up, leaves it Feasible.
+    """
+
+    PRICE_ITERATIONS = 100
+    RATE_ITERATIONS = 30
+    TANGENT_SAMPLES = 64
+    TANGENT_ITERATIONS = 40
+    TOLERANCE = 1e-9
+    GAP_TOLERANCE = 1e-6
+    DUAL_SAMPLES = 256
+
+    def __init__(self,
+                 params_list: List[np.ndarray],
+                 wct_list: List[float],
+                 qgl_min: float,
+                 p_qgl_list: List[float],
+                 model_name: str = "namdar"):
+        """
+        Args:
+            params_list: Fitted (a, b, c, d, e) of the fluid curve of each well
+            wct_list: Water cut of each well, oil = fluid * (1 - wct)
+            qgl_min: Minimum gas rate allowed to inject to a well
+            p_qgl_list: Maximum gas rate per well (MRP caps)
+            model_name: Curve model the parameters belong to, see CURVE_MODELS
+        """
+        if model_name not in CURVE_MODELS:
+            raise ValueError(f"Unknown model '{model_name}', expected one of {tuple(CURVE_MODELS)}")
+        self.curve, self.derivative, self.second_derivative = CURVE_MODELS[model_name]
+        # One column per well so every evaluation is vectorized across the field
+        self.params = np.asarray(params_list, dtype=float).T
+        self.oil_fraction = 1.0 - np.asarray(wct_list, dtype=float)
+        self.lower = np.full(self.params.shape[1], max(float(qgl_min), 1e-10))
+        self.upper = np.maximum(np.asarray(p_qgl_list, dtype=float), self.lower)
+        self.tangent, self.edge_slope = self._first_envelope_edge()
+
+    def marginal_oil(self, q_gl: np.ndarray) -> np.ndarray:
+        """Oil gained per extra Mscf at q_gl, per well; zero where the curve is clipped at zero"""
+        clipped = self.curve(q_gl, self.params) <= 0
+        return np.where(clipped, 0.0, self.oil_fraction * self.derivative(q_gl, self.params))
+
+    def oil_rates(self, q_gl: np.ndarray) -> np.ndarray:
+        """Oil rate at q_gl, per well, clipped at zero like the fitted curves"""
+        return self.oil_fraction * np.maximum(self.curve(q_gl, self.params), 0)
+
+    def _first_envelope_edge(self):
+        """
+        End point and slope of the concave envelope's first edge from qgl_min, per well.
+
+        The edge ends where the chord slope (f(q) - f(lower)) / (q - lower) peaks. A coarse
+        log-spaced sample brackets the peak, golden-section search refines it. For a curve
+        that is concave from qgl_min on, the peak is qgl_min itself and the slope is f'(lower).
+        """
+        n_wells = self.lower.size
+        base = self.oil_rates(self.lower)
+        fractions = np.linspace(0, 1, self.TANGENT_SAMPLES)[1:, np.newaxis]
+        log_low, log_high = np.log(self.lower), np.log(self.upper)
+        samples = np.exp(log_low + fractions * (log_high - log_low))  # (samples, wells)
+
+        def chord_slope(q):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(q > self.lower, (self.oil_rates(q) - base) / (q - self.lower), -np.inf)
+
+        slopes = np.vstack([chord_slope(row) for row in samples])
+        best = np.argmax(slopes, axis=0)
+        wells = np.arange(n_wells)
+        left = samples[np.maximum(best - 1, 0), wells]
+        right = samples[np.minimum(best + 1, samples.shape[0] - 1), wells]
+        left = np.where(best == 0, self.lower, left)
+
+        ratio = (np.sqrt(5) - 1) / 2
+        for _ in range(self.TANGENT_ITERATIONS):
+            inner_left = right - ratio * (right - left)
+            inner_right = left + ratio * (right - left)
+            move_right = chord_slope(inner_right) >= chord_slope(inner_left)
+            left = np.where(move_right, inner_left, left)
+            right = np.where(move_right, right, inner_right)
+        tangent = 0.5 * (left + right)
+        slope = chord_slope(tangent)
+
+        # Concave from the start: no straight edge, the derivative at qgl_min is the slope
+        concave_start = self.marginal_oil(self.lower) >= slope
+        tangent = np.where(concave_start, self.lower, tangent)
+        slope = np.where(concave_start, self.marginal_oil(self.lower), slope)
+        return tangent, slope
+
+    def rates_at_price(self,
+                       shadow_price: float,
+                       start: Optional[np.ndarray] = None,
+                       held: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rate of every well where its marginal oil falls to the shadow price, within its bounds.
+        ``start`` (e.g. the rates at a nearby price) seeds the Newton iterations; wells flagged
+        in ``held`` stay at qgl_min whatever the price.
+        """
+        # Wells whose envelope never pays the price stay at the minimum, wells whose
+        # marginal oil still covers it at the cap stay at the cap; only the others need a root
+        at_lower = self.edge_slope <= shadow_price
+        if held is not None:
+            at_lower = at_lower | held
+        at_upper = ~at_lower & (self.marginal_oil(self.upper) >= shadow_price)
+        rates = np.where(at_lower, self.lower, self.upper)
+        interior = np.flatnonzero(~at_lower & ~at_upper)
+        if interior.size == 0:
+            return rates
+
+        params, oil_fraction = self.params[:, interior], self.oil_fraction[interior]
+        low, high = np.log(self.tangent[interior]), np.log(self.upper[interior])
+        x = 0.5 * (low + high) if start is None else np.clip(np.log(start[interior]), low, high)
+        for _ in range(self.RATE_ITERATIONS):
+            q = np.exp(x)
+            excess = oil_fraction * self.derivative(q, params) - shadow_price
+            # Keep the root bracketed: marginal oil above the price means the root lies to the right
+            low = np.where(excess > 0, x, low)
+            high = np.where(excess > 0, high, x)
+            slope = oil_fraction * self.second_derivative(q, params) * q
+            with np.errstate(divide="ignore", invalid="ignore"):
+                newton = x - excess / slope
+            inside = (slope < 0) & (newton > low) & (newton < high)
+            step = np.where(inside, newton, 0.5 * (low + high)) - x
+            x = x + step
+            if np.max(np.abs(step)) < self.TOLERANCE:
+                break
+        rates[interior] = np.exp(x)
+        return rates
+
+    def _search_price(self, available_qgl_total: float, held: Optional[np.ndarray] = None):
+        """
+        Lowest price whose rates fit the budget, by Illinois false position on the price.
+        Returns the price, its rates and the highest price found over budget.
+        """
+        rates = self.rates_at_price(0.0, held=held)
+        if rates.sum() <= available_qgl_total:
+            return 0.0, rates, 0.0
+
+        # Total gas falls as the price rises; the high end always fits the budget
+        low, high = 0.0, float(np.max(self.edge_slope))
+        excess_low = rates.sum() - available_qgl_total
+        high_rates = self.rates_at_price(high, held=held)
+        excess_high = high_rates.sum() - available_qgl_total
+        side = 0
+        for _ in range(self.PRICE_ITERATIONS):
+            price = (low * excess_high - high * excess_low) / (excess_high - excess_low)
+            if not low < price < high:
+                price = 0.5 * (low + high)
+            price_rates = self.rates_at_price(price, start=high_rates, held=held)
+            excess = price_rates.sum() - available_qgl_total
+            if excess > 0:
+                low, excess_low = price, excess
+                if side == -1:
+                    excess_high /= 2  # Illinois step: stop one end from stalling
+                side = -1
+            else:
+                high, excess_high, high_rates = price, excess, price_rates
+                if side == 1:
+                    excess_low /= 2
+                side = 1
+            if -excess <= self.TOLERANCE * available_qgl_total and excess <= 0 \
+                    or high - low <= self.TOLERANCE * max(high, 1.0):
+                break
+        return high, high_rates, low
+
+    def dual_bound(self, shadow_price: float, available_qgl_total: float) -> float:
+        """
+        Lagrangian dual at a price: price * budget + sum over wells of max (oil(q) - price * q)
+        between qgl_min and the cap. Each maximum is taken over the stationary point, the
+        bounds and a log-spaced sample of the curve, so curves that are not concave past
+        their tangent point still get their best point.
+        """
+        samples = np.exp(np.linspace(0, 1, self.DUAL_SAMPLES)[:, np.newaxis]
+                         * (np.log(self.upper) - np.log(self.lower)) + np.log(self.lower))
+        stationary = self.rates_at_price(shadow_price)
+        points = np.vstack([samples, stationary])  # (samples + 1, wells)
+        values = np.vstack([self.oil_rates(row) for row in points]) - shadow_price * points
+        return float(shadow_price * available_qgl_total + values.max(axis=0).sum())
+
+    def _spend_leftover(self, rates: np.ndarray, leftover: float) -> np.ndarray:
+        """
+        Give gas the price search left over to wells still at qgl_min, largest oil gain first.
+        Below its tangent point the chord slope only grows, so each well takes as much of the
+        leftover as reaches its tangent point.
+        """
+        rates = rates.copy()
+        waiting = rates <= self.lower
+        base = self.oil_rates(self.lower)
+        while leftover > self.TOLERANCE and waiting.any():
+            target = np.minimum(self.tangent, self.lower + leftover)
+            gain = np.where(waiting & (target > self.lower), self.oil_rates(target) - base, 0.0)
+            well = int(np.argmax(gain))
+            if gain[well] <= 0:
+                break
+            leftover -= target[well] - rates[well]
+            rates[well] = target[well]
+            waiting[well] = False
+        return rates
+
+    def solve(self, available_qgl_total: float) -> ContinuousAllocation:
+        """Allocate available_qgl_total and report the shadow price of gas"""
+        start = time.perf_counter()
+        if self.lower.sum() > available_qgl_total:
+            return ContinuousAllocation("Infeasible", [], [], float("nan"), time.perf_counter() - start)
+
+        shadow_price, rates, over_budget_price = self._search_price(available_qgl_total)
+        # The optimal price lies between the two ends of the search; either one's dual is a bound
+        best_bound = min(self.dual_bound(price, available_qgl_total) for price in {shadow_price, over_budget_price})
+        leftover = available_qgl_total - rates.sum()
+        if shadow_price > 0 and leftover > self.TOLERANCE * available_qgl_total:
+            # The budget falls inside a jump: some well's envelope edge starts between the two
+            # prices. Compare spending the leftover at this price with holding the jumping
+            # wells at qgl_min and letting the others take the whole budget at a lower price.
+            jumping = (self.edge_slope > over_budget_price) & (rates <= self.lower)
+            options = [(shadow_price, self._spend_leftover(rates, leftover))]
+            if jumping.any():
+                price, held_rates, _ = self._search_price(available_qgl_total, held=jumping)
+                options.append((price, self._spend_leftover(held_rates, available_qgl_total - held_rates.sum())))
+            shadow_price, rates = max(options, key=lambda option: self.oil_rates(option[1]).sum())
+
+        allocation = ContinuousAllocation(
+            status="Optimal",
+            q_gl=rates.tolist(),
+            q_oil=self.oil_rates(rates).tolist(),
+            shadow_price=float(shadow_price),
+            # The allocation itself is feasible, so the bound never sits below it
+            best_bound=max(best_bound, float(self.oil_rates(rates).sum()))
+        )
+        if allocation.gap > self.GAP_TOLERANCE:
+            allocation.status = "Feasible"
+        allocation.solve_seconds = time.perf_counter() - start
+        return allocation
+
+if __name__ == "__main__":
+    # Scaling check on synthetic concave wells
+    rng = np.random.default_rng(0)
+    for n_wells in (10, 1000, 10000):
+        params = np.column_stack([
+            rng.uniform(0, 50, n_wells), rng.uniform(-0.05, -0.01, n_wells),
+            rng.uniform(5, 20, n_wells), rng.uniform(0, 10, n_wells), np.zeros(n_wells)])
+        allocator = LagrangianAllocator(params, rng.uniform(0, 0.8, n_wells), 1.0,
+                                        rng.uniform(500, 3000, n_wells))
+        result: Optional[ContinuousAllocation] = allocator.solve(300.0 * n_wells)
+        print(f"{n_wells:>6} wells: {result.solve_seconds * 1000:8.1f} ms, "
+              f"shadow price {result.shadow_price:.4f} bbl/Mscf, gas {result.total_qgl:,.0f}")
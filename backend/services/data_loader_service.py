@@ -1,11 +1,20 @@
 import pandas as pd
 import numpy as np
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
+
+# First cell of the optional row, right after the wct row, naming each well's compressor header
+HEADER_ROW_LABEL = "header"
+# First cell of the water-cut row; files without one are taken as oil rates (wct 0)
+WCT_ROW_LABEL = "wct"
 
 class DataLoader:
     """
     Class to load and preprocess production data (QGL and Qprod)
     from CSV files, supporting different formats.
+
+    Rows are found by content rather than position: the data starts at the first row
+    whose cells are all numbers, the column labels are the row before it, and the
+    optional wct and header rows are recognised by their first cell.
     """
     def __init__(self, file_path: str):
         self.file_path = file_path
@@ -16,21 +25,65 @@ class DataLoader:
     '''
     def load_data(self) -> Tuple[List[List[float]], List[List[float]], List[float], List[str]]:
         try:
-            df_info = pd.read_csv(self.file_path, nrows=3, header=None)
-            df_wct = pd.read_csv(self.file_path, skiprows=3, nrows=1, header=None)
-            df_data = pd.read_csv(self.file_path, skiprows=5, header=None)
+            df_rows = self._read_rows()
+            data_start = self._data_start(df_rows)
         except Exception as e:
             print(f"Error reading UI data from {self.file_path}: {e}")
-            return [], [], []
+            return [], [], [], []
 
-        field_name = df_info.iloc[2, 0]
-        well_names = df_info.iloc[2, 1:].dropna().tolist()
-        wct_values = df_wct.iloc[:, 1:].to_numpy().flatten().tolist()
+        field_name = df_rows.iloc[2, 0]
+        well_names = df_rows.iloc[2, 1:].dropna().tolist()
+        df_data = df_rows.iloc[data_start:].apply(pd.to_numeric, errors="coerce")
         column_labels_qgl = df_data.columns[1::2]
         column_label_prod = df_data.columns[2::2]
         list_of_wells_qgl = df_data.loc[:, column_labels_qgl].T.to_numpy().tolist()
         list_of_well_prods = df_data.loc[:, column_label_prod].T.to_numpy().tolist()
         list_of_wells_qgl   = [[x for x in q_gl if not np.isnan(x)] for q_gl in list_of_wells_qgl]
         list_of_well_prods = [[x for x in q_oil if not np.isnan(x)] for q_oil in list_of_well_prods]
-        wct_values = [x for x in wct_values if not np.isnan(x)]
+        list_of_wells_qgl = [q_gl for q_gl in list_of_wells_qgl if q_gl]
+        list_of_well_prods = [q_oil for q_oil in list_of_well_prods if q_oil]
+
+        wct_row = self._labelled_row(df_rows, WCT_ROW_LABEL, data_start)
+        if wct_row is None:
+            wct_values = [0.0] * len(list_of_wells_qgl)
+        else:
+            wct_values = pd.to_numeric(df_rows.iloc[wct_row, 1:], errors="coerce").dropna().tolist()
         return (list_of_wells_qgl, list_of_well_prods, wct_values, [field_name] + well_names)
+
+    '''
+    Method to load the compressor header of each well.
+    Returns one header name per well, or None when the file has no header row.
+    '''
+    def load_well_headers(self) -> Optional[List[str]]:
+        try:
+            df_rows = self._read_rows()
+            header_row = self._labelled_row(df_rows, HEADER_ROW_LABEL, self._data_start(df_rows))
+        except Exception as e:
+            print(f"Error reading the header row from {self.file_path}: {e}")
+            return None
+        if header_row is None:
+            return None
+        return [str(header).strip() for header in df_rows.iloc[header_row, 1:].dropna().tolist()]
+
+    def _read_rows(self) -> pd.DataFrame:
+        """Every row of the file as text"""
+        return pd.read_csv(self.file_path, header=None, dtype=str)
+
+    @staticmethod
+    def _data_start(df_rows: pd.DataFrame) -> int:
+        """First row whose non-empty cells are all numbers, below the description, field and well-name rows"""
+        for row in range(len(df_rows)):
+            cells = df_rows.iloc[row].dropna()
+            if cells.size and pd.to_numeric(cells, errors="coerce").notna().all():
+                if row < 3:
+                    raise ValueError("Expected the description, field and well-name rows above the data")
+                return row
+        raise ValueError("No numeric data rows")
+
+    @staticmethod
+    def _labelled_row(df_rows: pd.DataFrame, label: str, data_start: int) -> Optional[int]:
+        """Row above the data whose first cell is ``label``, None when there is none"""
+        for row in range(data_start):
+            if str(df_rows.iloc[row, 0]).strip().lower() == label:
+                return row
+        return None
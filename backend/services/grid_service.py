@@ -0,0 +1,23 @@
+# services/grid_service.py
+import numpy as np
+from typing import List, Sequence, Union
+
+QglGrid = Union[np.ndarray, Sequence[np.ndarray]]
+
+
+def is_shared_grid(q_gl: QglGrid) -> bool:
+    """True for one grid shared by every well, False for a list of per-well grids"""
+    return len(q_gl) == 0 or np.ndim(q_gl[0]) == 0
+
+
+def as_well_grids(q_gl: QglGrid, n_wells: int) -> List[np.ndarray]:
+    """
+    Per-well q_gl grids from either one shared grid or a list of (ragged) per-well grids.
+    A shared grid is not copied: every well gets the same array.
+    """
+    if is_shared_grid(q_gl):
+        shared = np.asarray(q_gl, dtype=float)
+        return [shared] * n_wells
+    if len(q_gl) != n_wells:
+        raise ValueError(f"Expected {n_wells} per-well q_gl grids, got {len(q_gl)}")
+    return [np.asarray(grid, dtype=float) for grid in q_gl]
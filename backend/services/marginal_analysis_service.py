@@ -0,0 +1,68 @@
+# services/marginal_analysis_service.py
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+from backend.services.cache_service import LRUCache, stable_digest
+from backend.services.grid_service import QglGrid, as_well_grids
+
+
+@dataclass
+class MarginalAnalysisResult:
+    """MRP caps of every well and the MRP curves they were read from"""
+    p_qgl_optim_list: List[float]  # Gas rate of the last point where MRP >= gas cost, per well
+    p_qoil_optim_list: List[float]  # Oil rate at that point, per well
+    cap_indices: np.ndarray  # Grid index of the cap, per well
+    mrp: np.ndarray  # MRP on q_gl[:-1], shaped (wells, longest grid - 1), NaN padded for ragged grids
+
+
+def _padded(rows: List[np.ndarray], width: int) -> np.ndarray:
+    """Stack ragged rows into one matrix, NaN past each row's end"""
+    matrix = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        matrix[i, :row.size] = row
+    return matrix
+
+
+def calculate_marginal_analysis(q_gl: QglGrid,
+                                q_oil_rates_list: List[np.ndarray],
+                                p_qoil: float,
+                                p_qgl: float,
+                                cache: Optional[LRUCache] = None) -> MarginalAnalysisResult:
+    """
+    Marginal revenue product of every well in one pass over a (wells x grid) matrix.
+
+    The cap of a well is the last grid point whose MRP still covers the gas cost, or
+    the last point of the MRP curve when none does. The result only depends on the
+    curves and the two prices, so it is keyed on them in ``cache`` and reused by every
+    gas limit, sweep iteration and later run with the same inputs.
+    """
+    grids = as_well_grids(q_gl, len(q_oil_rates_list))
+    rates = [np.asarray(rate, dtype=float) for rate in q_oil_rates_list]
+    key = None
+    if cache is not None:
+        key = stable_digest(grids, rates, p_qoil, p_qgl)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    width = max((grid.size for grid in grids), default=0)
+    gas = _padded(grids, width)
+    oil = _padded(rates, width)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mrp = p_qoil * (np.diff(oil, axis=1) / np.diff(gas, axis=1))
+
+    sizes = np.array([grid.size for grid in grids])
+    covers_cost = mrp >= p_qgl  # NaN padding compares False
+    last_covering = mrp.shape[1] - 1 - np.argmax(covers_cost[:, ::-1], axis=1)
+    cap_indices = np.where(covers_cost.any(axis=1), last_covering, sizes - 2)
+
+    wells = np.arange(len(grids))
+    result = MarginalAnalysisResult(
+        p_qgl_optim_list=gas[wells, cap_indices].tolist(),
+        p_qoil_optim_list=oil[wells, cap_indices].tolist(),
+        cap_indices=cap_indices,
+        mrp=mrp
+    )
+    if key is not None:
+        cache.put(key, result)
+    return result
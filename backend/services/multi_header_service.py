@@ -0,0 +1,216 @@
+# services/multi_header_service.py
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from backend.services.grid_service import QglGrid, as_well_grids
+from backend.services.solver_backend_service import OPTIMALITY_TOLERANCE
+
+# Solver name the pipelines report for the header decomposition; it bypasses OptimizationModel
+HEADER_SOLVER = "header_dp"
+
+
+@dataclass
+class HeaderAllocation:
+    """Allocation of a field whose wells share gas by compressor header"""
+    status: str  # Optimal, Feasible (the bound leaves a gap) or Infeasible
+    selection: Optional[List[int]]  # Chosen q_gl index per well
+    headers: Dict[str, Dict] = field(default_factory=dict)  # Per header: wells, limit, total_qgl, total_production
+    best_bound: Optional[float] = None  # Proven upper bound on the total production
+    solve_seconds: float = 0.0
+
+    @property
+    def objective(self) -> Optional[float]:
+        if self.selection is None:
+            return None
+        return sum(header["total_production"] for header in self.headers.values())
+
+    @property
+    def gap(self) -> Optional[float]:
+        """Relative distance between the allocation and the bound"""
+        if self.objective is None or self.best_bound is None:
+            return None
+        return abs(self.best_bound - self.objective) / max(abs(self.best_bound), 1e-9)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": HEADER_SOLVER,
+            "status": self.status,
+            "objective": self.objective,
+            "best_bound": self.best_bound,
+            "gap": self.gap,
+            "solve_seconds": self.solve_seconds
+        }
+
+
+class MultiHeaderAllocator:
+    """
+    Gas allocation with one capacity per compressor header and an optional field-wide limit.
+
+    Wells only share gas within their header, so the problem decomposes: one lattice DP
+    per header gives that header's frontier, its best production for every budget up to
+    its capacity (DynamicProgrammingAllocator.frontier). Without a field-wide limit each
+    header simply takes the frontier point at its capacity. With one, the frontiers are
+    composed by a second DP in which every header is a single item whose choices are its
+    frontier breakpoints, so the cost grows with the wells of the largest header and the
+    number of headers, never with one monolithic model over all wells.
+
+    Both DPs round gas up to their lattice, so the allocation is reported Optimal only
+    when the same two steps with gas rounded down (a relaxation) bound it within
+    OPTIMALITY_TOLERANCE, Feasible otherwise.
+    """
+
+    def __init__(self,
+                 q_gl: QglGrid,
+                 q_fluid_wells: List[np.ndarray],
+                 qgl_min: float,
+                 p_qgl_list: List[float],
+                 well_headers: List[str],
+                 header_limits: Dict[str, float],
+                 candidates: List[np.ndarray] = None):
+        """
+        Args:
+            q_gl: Gas lift grid shared by all wells, or one grid per well
+            q_fluid_wells: Production on the grid for each well
+            qgl_min: Minimum gas rate allowed to inject to a well
+            p_qgl_list: Maximum gas rate per well (MRP caps)
+            well_headers: Header name of each well
+            header_limits: Gas capacity per header (Mscf); headers left out or set to
+                None are only bound by the field-wide limit
+            candidates: Indices of q_gl each well may choose from, defaults to the whole grid
+        """
+        if len(well_headers) != len(q_fluid_wells):
+            raise ValueError(f"Got {len(well_headers)} well headers for {len(q_fluid_wells)} wells")
+        self.q_fluid_wells = [np.asarray(q, dtype=float) for q in q_fluid_wells]
+        self.q_gl_wells = as_well_grids(q_gl, len(self.q_fluid_wells))
+        self.qgl_min = qgl_min
+        self.p_qgl_list = list(p_qgl_list)
+        self.candidates = candidates
+        self.members = {}  # Header -> indices of its wells, in input order
+        for well, header in enumerate(well_headers):
+            self.members.setdefault(header, []).append(well)
+        self.header_limits = {header: header_limits.get(header) for header in self.members}
+
+    def _header_budget(self, header: str, field_limit: float) -> float:
+        """Gas a header may use: its capacity, the field-wide limit, or saturation when neither binds"""
+        header_limit = self.header_limits[header]
+        limit = min(field_limit, np.inf if header_limit is None else float(header_limit))
+        if not np.isfinite(limit):
+            limit = sum(self.p_qgl_list[i] for i in self.members[header])
+        return limit
+
+    def _header_frontier(self, wells: List[int], limit: float):
+        """Breakpoint gas, production and per-well selections of one header's frontier up to ``limit``"""
+        allocator = DynamicProgrammingAllocator(
+            q_gl=[self.q_gl_wells[i] for i in wells],
+            q_fluid_wells=[self.q_fluid_wells[i] for i in wells],
+            qgl_min=self.qgl_min,
+            p_qgl_list=[self.p_qgl_list[i] for i in wells],
+            gas_resolution=max(limit, 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS,
+            candidates=[self.candidates[i] for i in wells] if self.candidates is not None else None
+        )
+        frontier = allocator.frontier(limit)
+        if frontier is None:
+            # As in solve: rounding up can overshoot a limit the cheapest allocation still fits
+            if any(indices.size == 0 for indices, _, _ in allocator.candidates):
+                return None
+            cheapest = np.array([[indices[0] for indices, _, _ in allocator.candidates]])
+            if sum(self.q_gl_wells[i][cheapest[0, k]] for k, i in enumerate(wells)) > limit:
+                return None
+            frontier = (None, cheapest)
+        _, selection = frontier
+        gas = sum(self.q_gl_wells[i][selection[:, k]] for k, i in enumerate(wells))
+        production = sum(self.q_fluid_wells[i][selection[:, k]] for k, i in enumerate(wells))
+        return gas, production, selection
+
+    def _best_bound(self, field_limit: float) -> float:
+        """
+        Upper bound on the production: the floor-rounded DP table of each header up to its
+        budget, composed under the field-wide limit by a floor-rounded DP over headers
+        """
+        resolution = max(field_limit, 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS \
+            if np.isfinite(field_limit) else None
+        tables = []
+        for header, wells in self.members.items():
+            limit = self._header_budget(header, field_limit)
+            allocator = DynamicProgrammingAllocator(
+                q_gl=[self.q_gl_wells[i] for i in wells],
+                q_fluid_wells=[self.q_fluid_wells[i] for i in wells],
+                qgl_min=self.qgl_min,
+                p_qgl_list=[self.p_qgl_list[i] for i in wells],
+                gas_resolution=resolution or max(limit, 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS,
+                candidates=[self.candidates[i] for i in wells] if self.candidates is not None else None
+            )
+            tables.append(allocator.upper_bounds(limit))
+        if resolution is None:
+            return float(sum(table[-1] for table in tables))
+
+        # Entry u of a table bounds the header on at most u units, so it is an item with one choice per entry
+        composition = DynamicProgrammingAllocator(
+            q_gl=[np.arange(table.size) * resolution for table in tables],
+            q_fluid_wells=tables,
+            qgl_min=0.0,
+            p_qgl_list=[np.inf] * len(tables),
+            gas_resolution=resolution,
+            rounding="floor"
+        )
+        bounds = composition.upper_bounds(field_limit)
+        return float(bounds[min(composition.budget_units(field_limit), bounds.size - 1)])
+
+    def solve(self, available_qgl_total: float = None) -> HeaderAllocation:
+        """
+        Allocate under every header capacity and, when given, the field-wide limit.
+
+        Returns:
+            The allocation and its best bound; Infeasible when some header cannot hold its
+            wells at their minimum
+        """
+        start = time.perf_counter()
+        field_limit = np.inf if available_qgl_total is None else float(available_qgl_total)
+        frontiers = {}
+        for header, wells in self.members.items():
+            frontiers[header] = self._header_frontier(wells, self._header_budget(header, field_limit))
+            if frontiers[header] is None:
+                return HeaderAllocation(status="Infeasible", selection=None,
+                                        solve_seconds=time.perf_counter() - start)
+
+        headers = list(self.members)
+        if np.isfinite(field_limit):
+            # Compose: each header is one item choosing a breakpoint of its frontier
+            composition = DynamicProgrammingAllocator(
+                q_gl=[frontiers[header][0] for header in headers],
+                q_fluid_wells=[frontiers[header][1] for header in headers],
+                qgl_min=0.0,
+                p_qgl_list=[np.inf] * len(headers),
+                gas_resolution=max(field_limit, 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS
+            )
+            points = composition.solve(field_limit)
+            if points is None and sum(frontiers[header][0][0] for header in headers) <= field_limit:
+                # Rounding every header up to the lattice can overshoot a limit just above the
+                # cheapest allocation; that allocation itself still fits
+                points = [0] * len(headers)
+            if points is None:
+                return HeaderAllocation(status="Infeasible", selection=None,
+                                        solve_seconds=time.perf_counter() - start)
+        else:
+            points = [frontiers[header][0].size - 1 for header in headers]
+
+        selection = [0] * len(self.q_fluid_wells)
+        summary = {}
+        for header, point in zip(headers, points):
+            gas, production, header_selection = frontiers[header]
+            for k, well in enumerate(self.members[header]):
+                selection[well] = int(header_selection[point, k])
+            summary[header] = {
+                "wells": len(self.members[header]),
+                "limit": self.header_limits[header],
+                "total_qgl": float(gas[point]),
+                "total_production": float(production[point])
+            }
+        allocation = HeaderAllocation(status="Feasible", selection=selection, headers=summary,
+                                      best_bound=self._best_bound(field_limit))
+        if allocation.gap <= OPTIMALITY_TOLERANCE:
+            allocation.status = "Optimal"
+        allocation.solve_seconds = time.perf_counter() - start
+        return allocation
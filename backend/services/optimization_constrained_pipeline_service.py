@@ -1,6 +1,21 @@
  # services/optimization_pipeline.py
 from backend.services.optimization_model_service import OptimizationModel
 from backend.services.saving_orchestration_service import SavingOrchestrationService
+from backend.services.cache_service import LRUCache, OptimizationResultCache, stable_digest
+from backend.services.solver_backend_service import SolveResult, SolverOptions
+from backend.services.presolve_service import PRESOLVE_MODES, presolve_candidates
+from backend.services.grid_service import QglGrid, as_well_grids
+from backend.services.refinement_service import RefinementOptions, refine_allocation
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.continuous_allocation_service import CONTINUOUS_SOLVER, LagrangianAllocator
+from backend.services.allocation_separable_service import SEPARABLE_SOLVER, saturated_allocation
+from backend.services.uncertainty_service import MonteCarloAllocator, MonteCarloOptions
+from backend.services.multi_header_service import MultiHeaderAllocator
+from backend.services.allocation_index_service import INDEX_SOLVER, AllocationIndexStore
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from backend.services.sensitivity_service import gas_sensitivity
+from dataclasses import asdict
+import time
 import numpy as np
 from typing import Dict, List, Tuple
 from backend.entities.database import SnowflakeDB
@@ -9,7 +24,7 @@ class OptimizationConstrainedPipelineService:
     """Handles the optimization process using pre-calculated fitting results"""
 
     def __init__(self,
-                 q_gl_common_range: np.ndarray,
+                 q_gl_common_range: QglGrid,
                  q_oil_rates_list: List[np.ndarray],
                  plot_data: List[Dict],
                  list_info: List[str],
@@ -17,20 +32,59 @@ class OptimizationConstrainedPipelineService:
                  qgl_min: float = 0.0,
                  p_qoil: float = 0.0,
                  p_qgl: float = 0.0,
-                 db: SnowflakeDB = None):
+                 db: SnowflakeDB = None,
+                 solver: str = "milp",
+                 result_cache: OptimizationResultCache = None,
+                 solver_options: SolverOptions = None,
+                 model_cache: LRUCache = None,
+                 presolve: str = "exact",
+                 refinement: RefinementOptions = None,
+                 marginal_cache: LRUCache = None,
+                 curve_params: Dict = None,
+                 uncertainty: MonteCarloOptions = None,
+                 well_headers: List[str] = None,
+                 header_limits: Dict[str, float] = None,
+                 allocation_index: AllocationIndexStore = None,
+                 sensitivity_delta: float = 500.0):
         """
         Initialize with pre-calculated fitting results
 
         Args:
             csv_file_path: Path to source CSV file
-            q_gl_range: Generated gas lift range
+            q_gl_range: Generated gas lift range, shared or one per well
             q_oil_list: Predicted oil rates for each well
             plot_data: Visualization-ready data
             list_info: Well information list
             qgl_limit: Gas lift availability constraint
             p_qoil: Oil price
             p_qgl: Gas lift cost
+            solver: Allocation engine, "milp" (PuLP/CBC), "highs", "dp" (dynamic programming on
+                a gas lattice, approximate), "greedy" (fast heuristic with a gap) or "lagrangian" (continuous rates on
+                the fitted curves, needs curve_params)
+            result_cache: Optional memo of previous results for identical inputs
+            solver_options: Time limit, relative MIP gap and thread count for the solve
+            model_cache: Optional store of built models; a run that differs from a
+                previous one only in qgl_limit updates and re-solves that model
+            presolve: Candidate pruning ahead of the model, one of PRESOLVE_MODES
+            refinement: Solve coarse-to-fine over the candidates with this schedule,
+                None solves on all candidates at once
+            marginal_cache: Optional store of marginal analyses keyed on curves and prices
+            curve_params: Fitted curves for the continuous allocator and the uncertainty
+                analysis: "params_list", "covariance_list", "params_bounds", "wct_list" and "model_name"
+            uncertainty: Also allocate qgl_limit on fields sampled from the fit covariance
+                and report the distributions, None skips it
+            well_headers: Compressor header of each well; with header_limits the gas is
+                allocated per header by the DP decomposition, whatever the solver
+            header_limits: Gas capacity per header (Mscf), on top of qgl_limit for the field
+            allocation_index: Optional store of frontier indexes; when given, qgl_limit is
+                answered by a binary search on this field's index (built on first use)
+                instead of building and solving OptimizationModel, then improved on the real
+                gas values and bounded by the index's floor-rounded frontier
+            sensitivity_delta: Change of the total gas limit (Mscf) the sensitivity
+                reports the production change for, in both directions
         """
+        if presolve not in PRESOLVE_MODES:
+            raise ValueError(f"Unknown presolve mode '{presolve}', expected one of {PRESOLVE_MODES}")
         #self.csv_file_path = csv_file_path
         self.q_gl_common_range = q_gl_common_range
         self.q_oil_rates_list = q_oil_rates_list
@@ -43,39 +97,85 @@ class OptimizationConstrainedPipelineService:
         self.model = None
         self.results = None
         self.db = db
+        self.solver = solver
+        self.result_cache = result_cache
+        self.solver_options = solver_options or SolverOptions()
+        self.model_cache = model_cache
+        self.presolve = presolve
+        self.presolve_result = None
+        self.refinement = refinement
+        self.refinement_report = None
+        self.marginal_cache = marginal_cache
+        self.curve_params = curve_params
+        self.continuous_allocation = None
+        self.uncertainty = uncertainty
+        self.well_headers = well_headers
+        self.header_limits = header_limits
+        self.header_allocation = None
+        self.allocation_index = allocation_index
+        self.index = None
+        self.sensitivity_delta = sensitivity_delta
 
     def _calculate_marginal_analysis(self) -> Tuple[List[float], List[float]]:
         """Calculate optimal gas lift rates using marginal analysis"""
-        delta_q_gl = np.diff(self.q_gl_common_range)
-        p_qgl_optim_list = []
-        p_qoil_optim_list = []
+        analysis = calculate_marginal_analysis(
+            self.q_gl_common_range, self.q_oil_rates_list, self.p_qoil, self.p_qgl, self.marginal_cache)
+        return analysis.p_qgl_optim_list, analysis.p_qoil_optim_list
 
-        for well in range(len(self.q_oil_rates_list)):
-            delta_q_oil = np.diff(self.q_oil_rates_list[well])
-            mrp = self.p_qoil * (delta_q_oil / delta_q_gl)
-            qgl_values = self.q_gl_common_range[:-1]
+    def _setup_optimization_model(self, p_qgl_optim_list: List[float]):
+        """Configure and solve the optimization model"""
+        # Only a model served by model_cache may be reused: one left by an earlier run()
+        # carries that run's presolve and caps
+        self.model = None
+        self.presolve_result = presolve_candidates(
+            self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min, p_qgl_optim_list, self.presolve)
+        saturated = saturated_allocation(self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min,
+                                         p_qgl_optim_list, self.presolve_result.candidates)
+        if saturated is not None and saturated.fits(self.qgl_limit):
+            # The gas limit is slack: every well takes its own best point, no model to build
+            self.model = self._build_model(p_qgl_optim_list, self.presolve_result.candidates, SEPARABLE_SOLVER)
+            self.model.solve_prob()
+            return
+        if self.refinement is not None:
+            self.model, self.refinement_report = refine_allocation(
+                lambda candidates: self._build_model(p_qgl_optim_list, candidates),
+                self.presolve_result.candidates, self.refinement)
+            return
 
-            optimal_idx = np.where(mrp >= self.p_qgl)[0][-1] if any(mrp >= self.p_qgl) else len(mrp)-1
-            p_qgl_optim_list.append(qgl_values[optimal_idx])
-            p_qoil_optim_list.append(self.q_oil_rates_list[well][optimal_idx])
+        model_key = None
+        if self.model_cache is not None:
+            # Everything but qgl_limit: those models can be reused with a new right-hand side
+            model_key = stable_digest(
+                as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list)),
+                [np.asarray(rates, dtype=float) for rates in self.q_oil_rates_list],
+                p_qgl_optim_list, self.qgl_min, self.solver, asdict(self.solver_options), self.presolve)
+            self.model = self.model_cache.get(model_key)
 
-        return p_qgl_optim_list, p_qoil_optim_list
+        if self.model is not None:
+            self.model.update_available_qgl_total(self.qgl_limit)
+        else:
+            self.model = self._build_model(p_qgl_optim_list, self.presolve_result.candidates)
+            if model_key is not None:
+                self.model_cache.put(model_key, self.model)
+        self.model.solve_prob()
 
-    def _setup_optimization_model(self, p_qgl_optim_list: List[float]):
-        """Configure and solve the optimization model"""
-        self.model = OptimizationModel(
+    def _build_model(self, p_qgl_optim_list: List[float], candidates: List[np.ndarray],
+                     solver: str = None) -> OptimizationModel:
+        """Build (without solving) the model over the given candidate points"""
+        model = OptimizationModel(
             q_gl=self.q_gl_common_range,
             q_fluid_wells=self.q_oil_rates_list,
             available_qgl_total=self.qgl_limit,
             qgl_min=self.qgl_min,
-            p_qgl_list=p_qgl_optim_list
+            p_qgl_list=p_qgl_optim_list,
+            solver=solver or self.solver,
+            solver_options=self.solver_options,
+            candidates=candidates
         )
-
-        self.model.define_optimisation_problem()
-        self.model.define_variables()
-        self.model.build_objective_function()
-        self.model.add_constraints()
-        self.model.solve_prob()
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        return model
 
     def run(self) -> Dict:
         """
@@ -84,28 +184,215 @@ class OptimizationConstrainedPipelineService:
         Returns:
             Dictionary with all results and visualization data
         """
+        start = time.perf_counter()
+        cache_key = None
+        optimization_results = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.key(
+                "constrained", self.q_gl_common_range, self.q_oil_rates_list,
+                qgl_limit=self.qgl_limit, qgl_min=self.qgl_min,
+                p_qoil=self.p_qoil, p_qgl=self.p_qgl, solver=self.solver,
+                solver_options=asdict(self.solver_options), presolve=self.presolve,
+                refinement=asdict(self.refinement) if self.refinement is not None else None,
+                uncertainty=asdict(self.uncertainty) if self.uncertainty is not None else None,
+                well_headers=self.well_headers, header_limits=self.header_limits,
+                allocation_index=self.allocation_index is not None,
+                sensitivity_delta=self.sensitivity_delta)
+            optimization_results = self.result_cache.get(cache_key)
+
+        cache_hit = optimization_results is not None
+        if cache_hit:
+            # Already saved by the run that filled the cache: its optimization_id still applies
+            optimization_results = dict(optimization_results, plot_data=self.plot_data)
+            self.results = optimization_results["results"]
+        else:
+            optimization_results = self._optimize()
+            # Step 4: Save to database
+            optimization_results["optimization_id"] = self._save_results(optimization_results)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, optimization_results)
+
+        return dict(optimization_results, instrumentation={
+            "cache_hit": cache_hit,
+            "elapsed_seconds": time.perf_counter() - start
+        })
+
+    def _optimize(self) -> Dict:
+        """Marginal analysis, model solve and result collection"""
         # Step 1: Marginal analysis
         p_qgl_optim_list, p_qoil_optim_list = self._calculate_marginal_analysis()
 
-        # Step 2: Setup and solve optimization
-        self._setup_optimization_model(p_qgl_optim_list)
-
-        # Step 3: Get results
-        result_prod_rates = self.model.get_maximised_prod_rates()
-        result_optimal_qgl = self.model.get_optimal_injection_rates()
+        # Step 2 and 3: Solve and get results
+        if self.header_limits and self.well_headers:
+            result_prod_rates, result_optimal_qgl, solver_info = self._allocate_by_header(p_qgl_optim_list)
+        elif self.solver == CONTINUOUS_SOLVER:
+            result_prod_rates, result_optimal_qgl, solver_info = self._allocate_continuous(p_qgl_optim_list)
+        elif self.allocation_index is not None:
+            result_prod_rates, result_optimal_qgl, solver_info = self._allocate_from_index(p_qgl_optim_list)
+        else:
+            self._setup_optimization_model(p_qgl_optim_list)
+            result_prod_rates = self.model.get_maximised_prod_rates()
+            result_optimal_qgl = self.model.get_optimal_injection_rates()
+            solver_info = dict(self.model.solve_result.to_dict(), name=self.model.solver)
         self.results = list(zip(result_prod_rates, result_optimal_qgl))
 
-        # Step 4: Save to database
+        return {
+            "results": self.results,
+            "plot_data": self.plot_data,
+            "summary": {
+                "total_production": sum(result_prod_rates),
+                "total_qgl": sum(result_optimal_qgl),
+                "qgl_limit": self.qgl_limit
+            },
+            "q_gl_common_range": self.q_gl_common_range,
+            "q_oil_rates_list": self.q_oil_rates_list,
+            "p_qgl_optim_list": p_qgl_optim_list,
+            "p_qoil_optim_list": p_qoil_optim_list,
+            "solver": solver_info,
+            "presolve": dict(self.presolve_result.to_dict(), mode=self.presolve) if self.presolve_result is not None else None,
+            "refinement": self.refinement_report.to_dict() if self.refinement_report is not None else None,
+            "headers": self.header_allocation.headers if self.header_allocation is not None else None,
+            "sensitivity": self._sensitivity(p_qgl_optim_list, result_optimal_qgl, solver_info),
+            "uncertainty": self._run_uncertainty() if self.uncertainty is not None else None
+        }
+
+    def _sensitivity(self, p_qgl_optim_list: List[float], result_optimal_qgl: List[float],
+                     solver_info: Dict) -> Dict:
+        """Shadow price and +/- sensitivity_delta production change of the allocation, without a re-solve"""
+        if solver_info.get("status") not in ("Optimal", "Feasible") or self.header_allocation is not None:
+            # Header capacities bind separately, so no single field-wide price describes them
+            return None
+        sensitivity = gas_sensitivity(
+            q_gl=self.q_gl_common_range,
+            q_fluid_wells=self.q_oil_rates_list,
+            well_qgl=result_optimal_qgl,
+            qgl_limit=self.qgl_limit,
+            qgl_min=self.qgl_min,
+            p_qgl_list=p_qgl_optim_list,
+            delta_qgl=self.sensitivity_delta,
+            candidates=self.presolve_result.candidates if self.presolve_result is not None else None,
+            index=self.index,
+            shadow_price=solver_info.get("shadow_price")
+        )
+        return sensitivity.to_dict(self.p_qoil)
+
+    def _allocate_by_header(self, p_qgl_optim_list: List[float]) -> Tuple[List[float], List[float], Dict]:
+        """One DP frontier per compressor header, composed under the field-wide qgl_limit"""
+        self.presolve_result = presolve_candidates(
+            self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min, p_qgl_optim_list, self.presolve)
+        allocator = MultiHeaderAllocator(
+            q_gl=self.q_gl_common_range,
+            q_fluid_wells=self.q_oil_rates_list,
+            qgl_min=self.qgl_min,
+            p_qgl_list=p_qgl_optim_list,
+            well_headers=self.well_headers,
+            header_limits=self.header_limits,
+            candidates=self.presolve_result.candidates
+        )
+        self.header_allocation = allocator.solve(self.qgl_limit)
+        solver_info = self.header_allocation.to_dict()
+        if self.header_allocation.selection is None:
+            zeros = [0.0] * len(self.q_oil_rates_list)
+            return zeros, zeros, solver_info
+        grids = as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list))
+        selection = self.header_allocation.selection
+        return ([float(self.q_oil_rates_list[i][j]) for i, j in enumerate(selection)],
+                [float(grids[i][j]) for i, j in enumerate(selection)], solver_info)
+
+    def _allocate_from_index(self, p_qgl_optim_list: List[float]) -> Tuple[List[float], List[float], Dict]:
+        """Read qgl_limit off the field's frontier index, building the index on its first query"""
+        start = time.perf_counter()
+        self.presolve_result = presolve_candidates(
+            self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min, p_qgl_optim_list, self.presolve)
+        misses = self.allocation_index.stats["misses"]
+        self.index = self.allocation_index.get_or_build(
+            self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min, p_qgl_optim_list, self.presolve,
+            candidates=self.presolve_result.candidates)
+        selection = self.index.query(self.qgl_limit) if self.index is not None else None
+        result = SolveResult(status="Infeasible")
+        if selection is not None:
+            # The frontier is exact on the DP lattice only: improve the answer on the real gas
+            # values, and report it Optimal only when the stored bound closes the gap
+            selection = DynamicProgrammingAllocator(
+                q_gl=as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list)),
+                q_fluid_wells=self.q_oil_rates_list,
+                qgl_min=self.qgl_min,
+                p_qgl_list=p_qgl_optim_list,
+                gas_resolution=self.index.gas_resolution,
+                candidates=self.presolve_result.candidates
+            ).repair(selection, self.qgl_limit)
+            result.objective = float(sum(self.q_oil_rates_list[i][j] for i, j in enumerate(selection)))
+            result.best_bound = self.index.bound(self.qgl_limit)
+            result.status = result.bound_status()
+        result.solve_seconds = time.perf_counter() - start
+        solver_info = dict(result.to_dict(), name=INDEX_SOLVER,
+                           breakpoints=self.index.breakpoints if self.index is not None else 0,
+                           index_built=self.allocation_index.stats["misses"] > misses)
+        if selection is None:
+            zeros = [0.0] * len(self.q_oil_rates_list)
+            return zeros, zeros, solver_info
+        grids = as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list))
+        prod_rates = [float(self.q_oil_rates_list[i][j]) for i, j in enumerate(selection)]
+        return prod_rates, [float(grids[i][j]) for i, j in enumerate(selection)], solver_info
+
+    def _allocate_continuous(self, p_qgl_optim_list: List[float]) -> Tuple[List[float], List[float], Dict]:
+        """Equal-marginal-rate allocation on the fitted curve parameters, no grid and no model"""
+        if not self.curve_params:
+            raise ValueError("The continuous allocator needs the fitted curve parameters (curve_params)")
+        allocator = LagrangianAllocator(
+            params_list=self.curve_params["params_list"],
+            wct_list=self.curve_params["wct_list"],
+            qgl_min=self.qgl_min,
+            p_qgl_list=p_qgl_optim_list,
+            model_name=self.curve_params.get("model_name", "namdar")
+        )
+        self.continuous_allocation = allocator.solve(self.qgl_limit)
+        allocation = self.continuous_allocation
+        if allocation.status == "Infeasible":
+            zeros = [0.0] * len(self.q_oil_rates_list)
+            return zeros, zeros, {"name": self.solver, "status": allocation.status, "objective": None,
+                                  "best_bound": None, "gap": None, "solve_seconds": allocation.solve_seconds}
+        return allocation.q_oil, allocation.q_gl, {
+            "name": self.solver,
+            "status": allocation.status,
+            "objective": allocation.total_production,
+            "best_bound": allocation.best_bound,
+            "gap": allocation.gap,
+            "solve_seconds": allocation.solve_seconds,
+            "shadow_price": allocation.shadow_price
+        }
+
+    def _run_uncertainty(self) -> Dict:
+        """Distributions of the allocation over curves sampled from the fit covariance"""
+        if not self.curve_params or self.curve_params.get("covariance_list") is None:
+            raise ValueError("The uncertainty analysis needs the fitted curve parameters and their "
+                             "covariance (curve_params)")
+        allocator = MonteCarloAllocator(
+            q_gl=self.q_gl_common_range,
+            params_list=self.curve_params["params_list"],
+            covariance_list=self.curve_params["covariance_list"],
+            wct_list=self.curve_params["wct_list"],
+            qgl_min=self.qgl_min,
+            p_qoil=self.p_qoil,
+            p_qgl=self.p_qgl,
+            model_name=self.curve_params.get("model_name", "namdar"),
+            bounds=self.curve_params.get("params_bounds"),
+            options=self.uncertainty
+        )
+        return allocator.run(self.qgl_limit).to_dict()
+
+    def _save_results(self, optimization_results: Dict) -> int:
+        """Persist the field and well results of a run and return the id of the field record"""
         wells_data = [{
             'well_number': i+1,
             'optimal_production': prod,
             'optimal_gas_injection': qgl,
             'well_name': self.list_info[i+1]
-        } for i, (prod, qgl) in enumerate(self.results)]
+        } for i, (prod, qgl) in enumerate(optimization_results["results"])]
 
         data = {
-            "total_prod": sum(result_prod_rates),
-            "total_qgl": sum(result_optimal_qgl),
+            "total_prod": optimization_results["summary"]["total_production"],
+            "total_qgl": optimization_results["summary"]["total_qgl"],
             "info": self.list_info,
             "wells_data": wells_data,
             "qgl_limit": self.qgl_limit,
@@ -113,22 +400,7 @@ class OptimizationConstrainedPipelineService:
             "gas_price": self.p_qgl
         }
         result_service = SavingOrchestrationService(self.db)
-        result_service.save_constrained_optimization_results(data)
-
-
-        return {
-            "results": self.results,
-            "plot_data": self.plot_data,
-            "summary": {
-                "total_production": sum(result_prod_rates),
-                "total_qgl": sum(result_optimal_qgl),
-                "qgl_limit": self.qgl_limit
-            },
-            "q_gl_common_range": self.q_gl_common_range,
-            "q_oil_rates_list": self.q_oil_rates_list,
-            "p_qgl_optim_list": p_qgl_optim_list,
-            "p_qoil_optim_list": p_qoil_optim_list
-        }
+        return result_service.save_constrained_optimization_results(data)
 
     def get_well_count(self) -> int:
         """Get the number of wells in the dataset"""
@@ -1,29 +1,79 @@
 from backend.services.optimization_model_service import OptimizationModel
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from backend.services.cache_service import LRUCache, OptimizationResultCache
+from backend.services.solver_backend_service import OPTIMALITY_TOLERANCE, SolverOptions
+from backend.services.presolve_service import PRESOLVE_MODES, presolve_candidates
+from backend.services.grid_service import QglGrid, as_well_grids
+from backend.services.refinement_service import RefinementOptions, refine_allocation
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.allocation_separable_service import SEPARABLE_SOLVER, saturated_allocation
+from backend.services.sweep_service import SweepOptions, adaptive_sweep, solve_inline, thin_curve
+from backend.services.parallel_sweep_service import SharedCurves, submit_limit, sweep_pool
+from dataclasses import asdict
+from operator import itemgetter
+import os
+import time
 import numpy as np
 
+MODES = ("sweep", "frontier")
+# Solvers whose sweep points take long enough (a CBC or HiGHS solve each) for a process pool
+# to pay for its workers' start-up; DP and greedy points take milliseconds and run in-process
+POOL_SOLVERS = ("milp", "highs", "sos2")
+
 class OptimizationGlobalPipelineService:
     """Handles the complete optimization workflow from data processing to solution"""
 
     def __init__(self,
-                q_gl_common_range: np.ndarray,
+                q_gl_common_range: QglGrid,
                 q_oil_rates_list: list[list],
                 qgl_min: int = 0,
                 p_qoil: float = 0.0,
                 p_qgl: float = 0.0,
                 max_iterations: int = 40,
-                max_qgl: int = 50000):
+                max_qgl: float = None,
+                solver: str = "milp",
+                mode: str = "sweep",
+                result_cache: OptimizationResultCache = None,
+                solver_options: SolverOptions = None,
+                presolve: str = "exact",
+                refinement: RefinementOptions = None,
+                marginal_cache: LRUCache = None,
+                sweep: SweepOptions = None,
+                workers: int = None):
         """
         Initialize the optimization pipeline with required parameters
 
         Args:
-            q_gl_common_range: Array of gas lift injection rates
+            q_gl_common_range: Array of gas lift injection rates, or one array per well
             q_oil_rates_list: List of oil production predictions, following curve fitting
             qgl_min: Minimum gas rate allowed to inject to a well
             p_qoil: Oil price for economic calculation
             p_qgl: Gas lift cost for economic calculation
-            max_iterations: number of optimisations to run in global curve
-            max_qgl: upper bound of max q_gl it can take
+            max_iterations: most optimisations to run in global curve
+            max_qgl: Optional cap on the gas limits of the curve; by default it runs until
+                every well sits at its best admissible point (at most the sum of the MRP caps)
+            solver: Allocation engine, "milp" (PuLP/CBC), "highs", "dp" (dynamic programming on
+                a gas lattice, approximate) or "greedy" (fast heuristic with a gap)
+            mode: "sweep" solves one model per sampled qgl_limit, "frontier" computes
+                the production-vs-gas curve for every lattice budget in a single DP pass,
+                thinned to the bends that exceed the sweep tolerance
+            result_cache: Optional memo of previous results for identical inputs
+            solver_options: Time limit, relative MIP gap and thread count for each solve
+            presolve: Candidate pruning ahead of the model, one of PRESOLVE_MODES
+            refinement: Solve each sweep point coarse-to-fine with this schedule, None
+                solves on all candidates at once. The frontier mode always uses the full grid
+            marginal_cache: Optional store of marginal analyses keyed on curves and prices,
+                shared across runs; within a run the analysis is computed once regardless
+            sweep: Tolerance and seeding of the adaptive sweep between qgl_min per well
+                and the saturation of every well
+            workers: Processes solving sweep points in parallel, for the POOL_SOLVERS only;
+                None uses one per CPU. 1, and any other solver, solves them one after the
+                other in this process
         """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        if presolve not in PRESOLVE_MODES:
+            raise ValueError(f"Unknown presolve mode '{presolve}', expected one of {PRESOLVE_MODES}")
         self.q_gl_common_range = q_gl_common_range
         self.q_oil_rates_list = q_oil_rates_list
         self.qgl_min = qgl_min
@@ -33,30 +83,168 @@ class OptimizationGlobalPipelineService:
         self.result_prod_rates = None
         self.result_optimal_qgl = None
         self.current_qgl = None
-        self.optimization_results = {"qgl_limit": [], "total_production": [], "total_qgl": [], 'summary': {}}
+        self.optimization_results = {"qgl_limit": [], "total_production": [], "total_qgl": [],
+                                     "solver_status": [], "best_bound": [], 'summary': {}}
         self.qgl_history = []
-        self.qgl_min = 0
         self.max_iterations = max_iterations
         self.max_qgl = max_qgl
+        self.solver = solver
+        self.mode = mode
+        self.result_cache = result_cache
+        self.solver_options = solver_options or SolverOptions()
+        self.presolve = presolve
+        self.presolve_result = None
+        self.refinement = refinement
+        self.marginal_cache = marginal_cache
+        self.marginal_analysis = None
+        self.saturated = None
+        self.sweep = sweep or SweepOptions()
+        if solver not in POOL_SOLVERS:
+            workers = 1
+        elif workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, int(workers))
 
 
     '''
     this method runs the optimization pipeline for a range of gas lift injection rates
-    it uses a logspace to generate the range of gas lift injection rates and
-    it runs the optimization pipeline for each gas lift injection rate
-    it returns the optimization results
+    between the bounds of the curve, placing more limits where the production bends,
+    and it returns the optimization results
     '''
     def run(self) -> dict:
-        log_vals = np.logspace(start=1, stop=np.log10(self.max_qgl), num=self.max_iterations)
-        log_vals = np.unique(log_vals)
-        for i, qgl_limit in enumerate(log_vals):
-            dic_optim_result = self._execute(qgl_limit)
-            prod_history: list = self._convert_dict_to_list(dic_optim_result, qgl_limit)
-            if self._has_stabilized(values=prod_history):
-                break
+        start = time.perf_counter()
+        cache_key = None
+        cached = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.key(
+                "global", self.q_gl_common_range, self.q_oil_rates_list,
+                qgl_min=self.qgl_min, p_qoil=self.p_qoil, p_qgl=self.p_qgl, solver=self.solver,
+                mode=self.mode, max_iterations=self.max_iterations, max_qgl=self.max_qgl,
+                solver_options=asdict(self.solver_options), presolve=self.presolve,
+                refinement=asdict(self.refinement) if self.refinement is not None else None,
+                sweep=asdict(self.sweep))
+            cached = self.result_cache.get(cache_key)
+
+        if cached is not None:
+            self.optimization_results = dict(cached)
+        else:
+            self._run_curve()
+            if cache_key is not None:
+                self.result_cache.put(cache_key, dict(self.optimization_results))
+
+        self.optimization_results["instrumentation"] = {
+            "cache_hit": cached is not None,
+            "elapsed_seconds": time.perf_counter() - start
+        }
+        return self.optimization_results
+
+    def _run_curve(self) -> dict:
+        """Compute the global curve with the configured mode"""
+        if self.mode == "frontier":
+            return self._run_frontier()
+        lower, upper = self._sweep_bounds(self._calculate_marginal_analysis())
+        if self.workers > 1:
+            rows = self._run_parallel_sweep(lower, upper)
+        else:
+            rows = adaptive_sweep(solve_inline(self._execute), lower, upper, self.max_iterations,
+                                  self.sweep, score=itemgetter("total_production"))
+        for qgl_limit, dic_optim_result in rows:
+            self._convert_dict_to_list(dic_optim_result, qgl_limit)
+        self._get_global_optimal_values()
+        return self.optimization_results
+
+    def _run_parallel_sweep(self, lower: float, upper: float) -> list:
+        """
+        Solve the sweep points in a process pool. The curves go to the workers once, through
+        shared memory; each worker builds its own model and reuses it for every point it gets.
+        """
+        grids = as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list))
+        shared = SharedCurves(grids, [np.asarray(rates, dtype=float) for rates in self.q_oil_rates_list])
+        pipeline_kwargs = dict(qgl_min=self.qgl_min, p_qoil=self.p_qoil, p_qgl=self.p_qgl, solver=self.solver,
+                               solver_options=self.solver_options, presolve=self.presolve,
+                               refinement=self.refinement)
+        pool = sweep_pool(shared.spec, pipeline_kwargs, self.marginal_analysis, self.workers)
+        try:
+            rows = adaptive_sweep(submit_limit(pool), lower, upper, self.max_iterations, self.sweep,
+                                  self.workers, score=itemgetter("total_production"))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            shared.close()
+        refinement = [row["refinement"] for _, row in rows if row.get("refinement") is not None]
+        if refinement:
+            self.optimization_results["refinement"] = refinement[-1]
+        return rows
+
+    def _sweep_bounds(self, p_qgl_optim_list: list):
+        """
+        Gas limits the curve spans: below the lower one the wells cannot all sit at their
+        minimum (or only a single well can get any gas), above the upper one every well is
+        at its best admissible point and production stops growing.
+        """
+        saturated = self._saturated_allocation(p_qgl_optim_list)
+        if saturated is None:
+            raise ValueError("No feasible allocation for any gas limit up to the MRP caps")
+        grids = as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list))
+        admissible = [grid[(grid >= self.qgl_min) & (grid <= cap)] for grid, cap in zip(grids, p_qgl_optim_list)]
+        cheapest = sum(gas.min() for gas in admissible)
+        first_positive = min((gas[gas > 0].min() for gas in admissible if (gas > 0).any()), default=cheapest)
+        lower = max(self.qgl_min * len(grids), cheapest, first_positive)
+        upper = saturated.total_qgl if self.max_qgl is None else min(saturated.total_qgl, self.max_qgl)
+        return float(lower), float(max(upper, lower))
+
+    def _run_frontier(self) -> dict:
+        """
+        Build the whole global curve from a single DP over the gas budget axis. Only the
+        breakpoints thin_curve keeps are reported, each with the floor-rounded DP bound
+        at its limit as best bound.
+        """
+        p_qgl_optim_list = self._calculate_marginal_analysis()
+        max_budget = sum(p_qgl_optim_list) if self.max_qgl is None else min(self.max_qgl, sum(p_qgl_optim_list))
+        presolve_result = self._presolve(p_qgl_optim_list)
+        allocator = DynamicProgrammingAllocator(
+            q_gl=self.q_gl_common_range,
+            q_fluid_wells=self.q_oil_rates_list,
+            qgl_min=self.qgl_min,
+            p_qgl_list=p_qgl_optim_list,
+            gas_resolution=max(max_budget, 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS,
+            candidates=presolve_result.candidates
+        )
+        frontier = allocator.frontier(self.max_qgl)
+        if frontier is None:
+            raise ValueError("No feasible allocation for any gas limit up to the MRP caps")
+
+        breakpoints, selection = frontier
+        production = sum(np.asarray(rates, dtype=float)[selection[:, i]] for i, rates in enumerate(self.q_oil_rates_list))
+        keep = thin_curve(breakpoints * allocator.gas_resolution, production, self.sweep.tolerance)
+        breakpoints, selection = breakpoints[keep], selection[keep]
+        bound_table = allocator.upper_bounds(self.max_qgl)
+        # Past the end of the table the relaxation is saturated: its last entry still bounds
+        bounds = bound_table[np.minimum(breakpoints, bound_table.size - 1)]
+        grids = as_well_grids(self.q_gl_common_range, len(self.q_oil_rates_list))
+        well_gas = np.column_stack([grid[selection[:, i]] for i, grid in enumerate(grids)])
+        well_prod = np.column_stack([
+            np.asarray(rates, dtype=float)[selection[:, i]] for i, rates in enumerate(self.q_oil_rates_list)])
+
+        self.optimization_results["qgl_limit"] = (breakpoints * allocator.gas_resolution).tolist()
+        self.optimization_results["total_production"] = well_prod.sum(axis=1).tolist()
+        self.optimization_results["total_qgl"] = well_gas.sum(axis=1).tolist()
+        self.optimization_results["well_production_rates"] = well_prod.tolist()
+        self.optimization_results["well_gas_injection_rates"] = well_gas.tolist()
+        gaps = np.abs(bounds - well_prod.sum(axis=1)) / np.maximum(np.abs(bounds), 1e-9)
+        self.optimization_results["solver_status"] = ["Optimal" if gap <= OPTIMALITY_TOLERANCE else "Feasible"
+                                                      for gap in gaps]
+        self.optimization_results["best_bound"] = bounds.tolist()
         self._get_global_optimal_values()
         return self.optimization_results
 
+    def _presolve(self, p_qgl_optim_list: list):
+        """Prune the candidate points once per curve and record what was removed"""
+        presolve_result = presolve_candidates(
+            self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min, p_qgl_optim_list, self.presolve)
+        self.optimization_results["presolve"] = dict(presolve_result.to_dict(), mode=self.presolve)
+        self.presolve_result = presolve_result
+        return presolve_result
+
     def _get_global_optimal_values(self):
         last_total_production = self.optimization_results['total_production'][-1]
         last_total_qgl = self.optimization_results['total_qgl'][-1]
@@ -66,54 +254,66 @@ class OptimizationGlobalPipelineService:
         self.optimization_results['summary']['qgl_limit']= last_qgl
         return
 
-
-    def _has_stabilized(self, values, window_size=3, tolerance=1e-6) -> bool:
-        '''
-        This method checks if the gas lift injection rate has stabilized
-        it uses a window size to check if the gas lift injection rate has stabilized
-        it returns True if the gas lift injection rate has stabilized
-        '''
-        if len(values) < window_size:
-            return False
-        recent = values[-window_size:]
-        return all(abs(x - recent[0]) < tolerance for x in recent)
-
     '''
     this method calculates the optimal gas lift rates using marginal analysis
-    it returns the optimal gas lift rates for each well
+    it returns the optimal gas lift rates for each well. The caps do not depend
+    on qgl_limit, so they are computed once per run and shared by every sweep iteration
     '''
     def _calculate_marginal_analysis(self) -> list:
-        delta_q_gl = np.diff(self.q_gl_common_range)
-        p_qgl_optim_list = []
-
-        for well in range(len(self.q_oil_rates_list)):
-            delta_q_oil = np.diff(self.q_oil_rates_list[well])
-            mp = delta_q_oil / delta_q_gl  # Marginal Product
-            mrp = self.p_qoil * mp  # Marginal Revenue Product
-            qgl_values = self.q_gl_common_range[:-1]
-
-            # Find last point where MRP >= gas lift cost
-            optimal_idx = np.where(mrp >= self.p_qgl)[0][-1] if any(mrp >= self.p_qgl) else len(mrp)-1
-            p_qgl_optim_list.append(qgl_values[optimal_idx])
-        return p_qgl_optim_list
+        if self.marginal_analysis is None:
+            self.marginal_analysis = calculate_marginal_analysis(
+                self.q_gl_common_range, self.q_oil_rates_list, self.p_qoil, self.p_qgl, self.marginal_cache)
+        return self.marginal_analysis.p_qgl_optim_list
 
     '''
     this method sets up the optimization model and configure the optimization model
-    with parameters
+    with parameters. Only the total gas limit changes between sweep iterations, so
+    the model is built once and afterwards its right-hand side is updated in place
+    and re-solved from the previous incumbent
     '''
     def _setup_optimization_model(self, p_qgl_optim_list: list, qgl_limit: int) -> None:
-        self.model = OptimizationModel(
+        if self.model is not None and self.model.solver == self.solver \
+                and list(self.model.p_qgl_list) == list(p_qgl_optim_list):
+            self.model.update_available_qgl_total(qgl_limit)
+            return
+        presolve_result = self.presolve_result if self.presolve_result is not None else self._presolve(p_qgl_optim_list)
+        self.model = self._build_model(p_qgl_optim_list, qgl_limit, presolve_result.candidates)
+
+    def _build_model(self, p_qgl_optim_list: list, qgl_limit: float, candidates: list,
+                     solver: str = None) -> OptimizationModel:
+        """Build (without solving) the model over the given candidate points"""
+        model = OptimizationModel(
             q_gl=self.q_gl_common_range,
             q_fluid_wells=self.q_oil_rates_list,
             available_qgl_total=qgl_limit,
             qgl_min=self.qgl_min,
-            p_qgl_list=p_qgl_optim_list
+            p_qgl_list=p_qgl_optim_list,
+            solver=solver or self.solver,
+            solver_options=self.solver_options,
+            candidates=candidates
         )
-        self.model.define_optimisation_problem()
-        self.model.define_variables()
-        self.model.build_objective_function()
-        self.model.add_constraints()
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        return model
+
+    def _refine_model(self, p_qgl_optim_list: list, qgl_limit: float) -> None:
+        """Solve one sweep point coarse-to-fine and keep the report of the latest point"""
+        if self.presolve_result is None:
+            self._presolve(p_qgl_optim_list)
+        self.model, report = refine_allocation(
+            lambda candidates: self._build_model(p_qgl_optim_list, qgl_limit, candidates),
+            self.presolve_result.candidates, self.refinement)
+        self.optimization_results["refinement"] = report.to_dict()
 
+    def _saturated_allocation(self, p_qgl_optim_list: list):
+        """Every well at its own best admissible point; computed once per run like the caps"""
+        if self.saturated is None:
+            if self.presolve_result is None:
+                self._presolve(p_qgl_optim_list)
+            self.saturated = saturated_allocation(self.q_gl_common_range, self.q_oil_rates_list, self.qgl_min,
+                                                  p_qgl_optim_list, self.presolve_result.candidates)
+        return self.saturated
 
     '''
     this method runs the complete optimization pipeline using the other methods
@@ -121,8 +321,17 @@ class OptimizationGlobalPipelineService:
     '''
     def _execute(self, qgl_limit) -> dict:
         p_qgl_optim_list = self._calculate_marginal_analysis() # Step 1: Marginal analysis
-        self._setup_optimization_model(p_qgl_optim_list, qgl_limit) # Step 2: Model setup
-        self.model.solve_prob() # Step 3: Solve optimization
+        saturated = self._saturated_allocation(p_qgl_optim_list)
+        if saturated is not None and saturated.fits(qgl_limit):
+            # Slack gas limit: every well at its own best point, in closed form
+            self.model = self._build_model(p_qgl_optim_list, qgl_limit, self.presolve_result.candidates,
+                                           SEPARABLE_SOLVER)
+            self.model.solve_prob()
+        elif self.refinement is not None:
+            self._refine_model(p_qgl_optim_list, qgl_limit) # Steps 2-3: coarse-to-fine solve
+        else:
+            self._setup_optimization_model(p_qgl_optim_list, qgl_limit) # Step 2: Model setup
+            self.model.solve_prob() # Step 3: Solve optimization
         self.result_prod_rates: list[float] = self.model.get_maximised_prod_rates() # Step 4: Get results
         self.result_optimal_qgl: list[float] = self.model.get_optimal_injection_rates()
         return {
@@ -130,7 +339,9 @@ class OptimizationGlobalPipelineService:
             "total_qgl": sum(self.result_optimal_qgl),
             "qgl_limit": qgl_limit,
             "well_production_rates": self.result_prod_rates,
-            "well_gas_injection_rates": self.result_optimal_qgl
+            "well_gas_injection_rates": self.result_optimal_qgl,
+            "solver_status": self.model.solve_result.status,
+            "best_bound": self.model.solve_result.best_bound
                 }
 
     '''
@@ -142,4 +353,6 @@ class OptimizationGlobalPipelineService:
         self.optimization_results["qgl_limit"].append(qgl_limit)
         self.optimization_results["total_production"].append(dic_optim_result["total_production"])
         self.optimization_results["total_qgl"].append(dic_optim_result["total_qgl"])
+        self.optimization_results["solver_status"].append(dic_optim_result["solver_status"])
+        self.optimization_results["best_bound"].append(dic_optim_result["best_bound"])
         return self.optimization_results["total_production"]
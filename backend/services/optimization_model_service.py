@@ -1,5 +1,13 @@
 import pulp
+import numpy as np
+from scipy import optimize, sparse
 from backend.services.data_loader_service import DataLoader
+from backend.services.grid_service import as_well_grids
+from backend.services.piecewise_linear_service import select_breakpoints
+from backend.services.solver_backend_service import (
+    SOLVER_BACKENDS, SolveResult, SolverOptions, get_solver_backend)
+
+SOLVERS = tuple(SOLVER_BACKENDS)
 
 
 class OptimizationModel:
@@ -10,88 +18,238 @@ class OptimizationModel:
                  q_fluid_wells, 
                  available_qgl_total,
                  qgl_min, 
-                 p_qgl_list):
-        
+                 p_qgl_list,
+                 solver: str = "milp",
+                 gas_resolution: float = None,
+                 solver_options: SolverOptions = None,
+                 candidates=None):
+        """
+        Args:
+            q_gl: Gas lift grid shared by all wells, or one grid per well
+            solver: "milp" builds the binary PuLP model solved by CBC,
+                "dp" approximates the same problem as a multiple-choice knapsack
+                on a gas lattice by dynamic programming (no PuLP model is built;
+                Feasible with its gap when the lattice bound does not prove it),
+                "highs" assembles the same model as NumPy/scipy.sparse arrays
+                and solves it with scipy.optimize.milp, "greedy" allocates by
+                incremental oil gain (fast, approximate, reports the gap to a bound),
+                "sos2" replaces the binaries by SOS2 weights on a few breakpoints
+                of each curve (see SolverOptions.breakpoints) solved by CBC
+            gas_resolution: Budget lattice (Mscf) used by the "dp" solver,
+                defaults to the gas budget split in DEFAULT_BUDGET_UNITS units
+            solver_options: Time limit, relative MIP gap and thread count for the solve
+            candidates: Indices of q_gl kept for each well (see presolve_candidates);
+                only those points get a variable, defaults to the whole grid
+        """
+        self.backend = get_solver_backend(solver, solver_options)
+
         self.q_gl = q_gl
         self.q_fluid_wells = q_fluid_wells
+        self.q_gl_wells = as_well_grids(q_gl, len(q_fluid_wells))
         self.available_qgl_total = available_qgl_total
         self.qgl_min = qgl_min
         #self.prob = pulp.LpProblem("Maximizar_Suma_Wells", pulp.LpMaximize)
         self.p_qgl_list = p_qgl_list
+        self.solver = solver
+        self.gas_resolution = gas_resolution
+        if candidates is None:
+            candidates = [np.arange(len(grid)) for grid in self.q_gl_wells]
+        self.candidates = [np.asarray(indices, dtype=np.int64) for indices in candidates]
+        self.status = None
+        self.selection = None
+        self.solve_result = SolveResult()
+        self.objective = None
+        self.constraints = None
+        self.well_gas = None
+        self.total_gas_constraint = None
+        self.warm_start = None
+        self.breakpoints = None
+        self.breakpoint_errors = None
+        if self.backend.piecewise_linear:
+            self._select_breakpoints(solver_options or SolverOptions())
         self.variables = self.define_variables()
         #self.build_objective_function()
         #self.agregar_restricciones()
 
     def define_optimisation_problem(self):
+        if not self.backend.needs_pulp_model:
+            return
         self.prob = pulp.LpProblem("Maximise the sum of wells' production", pulp.LpMaximize)
 
 
+    def _select_breakpoints(self, solver_options: SolverOptions):
+        """Breakpoints of each well's curve among its admissible candidates, and their largest error"""
+        self.breakpoints, self.breakpoint_errors = [], []
+        for grid, rates, indices, cap in zip(self.q_gl_wells, self.q_fluid_wells, self.candidates, self.p_qgl_list):
+            gas = grid[indices]
+            admissible = indices[(gas >= self.qgl_min) & (gas <= cap)]
+            kept, error = select_breakpoints(
+                grid[admissible], np.asarray(rates, dtype=float)[admissible],
+                solver_options.breakpoints, solver_options.breakpoint_tolerance)
+            self.breakpoints.append(admissible[kept])
+            self.breakpoint_errors.append(error)
+
+    def _variable_points(self, well_index: int) -> np.ndarray:
+        """Grid indices the variables of a well stand for: candidates, or breakpoints for SOS2"""
+        if self.breakpoints is not None:
+            return self.breakpoints[well_index]
+        return self.candidates[well_index]
+
     def define_variables(self):
-        """Define the binary variables for each q_gl and q_fluid"""
+        """Define the binary variables for each candidate q_gl of each well
+        (SOS2 weights in [0, 1] on the breakpoints for the piecewise-linear model)"""
+        if not self.backend.needs_pulp_model:
+            return None
+        if self.backend.piecewise_linear:
+            return [
+                [pulp.LpVariable(f'l{well_index}_{i}', lowBound=0, upBound=1) for i in self.breakpoints[well_index]]
+                for well_index in range(len(self.q_fluid_wells))
+            ]
         binary_variables = [
-            [pulp.LpVariable(f'y{well_index}_{i}', cat='Binary') for i in range(len(self.q_gl))]
+            [pulp.LpVariable(f'y{well_index}_{i}', cat='Binary') for i in self.candidates[well_index]]
             for well_index in range(len(self.q_fluid_wells))
         ]
         return binary_variables
 
+    def _well_gas_expressions(self):
+        """Gas injected in each well as a PuLP expression, built once and shared"""
+        if self.well_gas is None:
+            self.well_gas = [
+                pulp.lpSum(variable * self.q_gl_wells[i][j] for variable, j in zip(self.variables[i], self._variable_points(i)))
+                for i in range(len(self.q_fluid_wells))
+            ]
+        return self.well_gas
+
+    def _candidate_production(self) -> np.ndarray:
+        """Production of every (well, candidate point) pair, laid out well by well"""
+        return np.concatenate([
+            np.asarray(rates, dtype=float)[indices]
+            for rates, indices in zip(self.q_fluid_wells, self.candidates)
+        ])
+
+    def split_by_well(self, values: np.ndarray):
+        """Cut a vector laid out well by well into one array per well"""
+        sizes = [indices.size for indices in self.candidates]
+        return np.split(np.asarray(values), np.cumsum(sizes)[:-1])
+
     def build_objective_function(self):
         """Defines the objective function to be maximised"""
+        if self.backend.needs_sparse_model:
+            # milp minimises, variables are laid out well by well
+            self.objective = -self._candidate_production()
+            return
+        if not self.backend.needs_pulp_model:
+            return
         self.prob += pulp.lpSum(
-            self.variables[i][j] * self.q_fluid_wells[i][j]
+            variable * self.q_fluid_wells[i][j]
             for i in range(len(self.q_fluid_wells))
-            for j in range(len(self.q_gl))
+            for variable, j in zip(self.variables[i], self._variable_points(i))
         ), "Objective function"
         #return self.prob
 
     def add_constraints(self):
         """Make sure that each well selects only one value of q_gl"""
+        if self.backend.needs_sparse_model:
+            self._build_sparse_constraints()
+            return
+        if not self.backend.needs_pulp_model:
+            return
         for index, col in enumerate(self.variables):
             self.prob += pulp.lpSum(col) == 1, f"Restriccion_Seleccion_Unica_{index}"
+            if self.backend.piecewise_linear:
+                # At most two adjacent breakpoints carry weight: a point on one segment of the curve
+                self.prob.sos2[f"curve_{index}"] = {variable: k + 1 for k, variable in enumerate(col)}
 
-        self.prob += pulp.lpSum(
-            self.variables[i][j] * self.q_gl[j]
-            for j in range(len(self.q_gl))
-            for i in range(len(self.q_fluid_wells))
-        ) <= self.available_qgl_total, "constraint q_gl available"
+        well_gas = self._well_gas_expressions()
+        self.total_gas_constraint = pulp.lpSum(well_gas) <= self.available_qgl_total
+        self.prob += self.total_gas_constraint, "constraint q_gl available"
 
         # este for tiene en cuenta los valores óptimos del MRP para cada pozo
         for i in range(len(self.q_fluid_wells)):
             self.prob += (
-                pulp.lpSum(self.variables[i][j] * self.q_gl[j] for j in range(len(self.q_gl))) <= self.p_qgl_list[i],
+                well_gas[i] <= self.p_qgl_list[i],
                 f"Restriccion_Produccion_Pozo_{i}_GasLimit"  # Nombre único por pozo
             )
         #return self.prob
 
         for i in range(len(self.q_fluid_wells)):
             self.prob += (
-                pulp.lpSum(self.variables[i][j] * self.q_gl[j] for j in range(len(self.q_gl))) >= self.qgl_min,
+                well_gas[i] >= self.qgl_min,
                 f"Restriccion_Produccion_Pozo_{i}_GasLimit_Minimo"  # Nombre único por pozo
             )
 
+    def _build_sparse_constraints(self):
+        """Same rows as the PuLP model, assembled as one sparse matrix
+
+        Rows: one selection row per well (== 1), the total gas row (<= available)
+        and one gas row per well bounded by [qgl_min, MRP cap]. Wells may keep
+        different numbers of candidates, so the blocks are ragged.
+        """
+        n_wells = len(self.q_fluid_wells)
+        well_gas = [grid[indices] for grid, indices in zip(self.q_gl_wells, self.candidates)]
+
+        selection_rows = sparse.block_diag([np.ones((1, gas.size)) for gas in well_gas], format="csr")
+        total_gas_row = sparse.csr_matrix(np.concatenate(well_gas))
+        well_gas_rows = sparse.block_diag([gas[np.newaxis, :] for gas in well_gas], format="csr")
+        matrix = sparse.vstack([selection_rows, total_gas_row, well_gas_rows], format="csr")
+
+        lower = np.concatenate([np.ones(n_wells), [-np.inf], np.full(n_wells, self.qgl_min)])
+        upper = np.concatenate([np.ones(n_wells), [self.available_qgl_total],
+                                np.asarray(self.p_qgl_list, dtype=float)])
+        self.constraints = optimize.LinearConstraint(matrix, lower, upper)
+
 
     def solve_prob(self):
-        """Solve the optimisation problem"""
-        self.prob.solve()
+        """Solve the optimisation problem with the selected backend"""
+        self.solve_result = self.backend.solve(self)
+        self.status = self.solve_result.status
+        self.selection = self.solve_result.selection
         #return self.prob
 
+    def update_available_qgl_total(self, available_qgl_total):
+        """
+        Change the total gas limit of an already built model in place.
+        The next solve_prob() starts from the current incumbent instead of rebuilding the model.
+        """
+        self.available_qgl_total = available_qgl_total
+        if self.total_gas_constraint is not None:
+            self.total_gas_constraint.changeRHS(available_qgl_total)
+        if self.constraints is not None:
+            # Same sparse matrix, only the total gas row's upper bound changes
+            upper = np.array(self.constraints.ub, dtype=float)
+            upper[len(self.q_fluid_wells)] = available_qgl_total
+            self.constraints = optimize.LinearConstraint(self.constraints.A, self.constraints.lb, upper)
+        self.warm_start = self.selection
+
+    def cheapest_selection(self):
+        """Cheapest admissible candidate of every well, None when a well has none"""
+        selection = []
+        for cap, grid, indices in zip(self.p_qgl_list, self.q_gl_wells, self.candidates):
+            gas = grid[indices]
+            admissible = indices[(gas >= self.qgl_min) & (gas <= cap)]
+            if admissible.size == 0:
+                return None
+            selection.append(int(admissible[np.argmin(grid[admissible])]))
+        return selection
+
+    def has_feasible_minimum(self) -> bool:
+        """Cheap infeasibility test: every well needs an admissible point and their cheapest sum must fit"""
+        cheapest = self.cheapest_selection()
+        if cheapest is None:
+            return False
+        return sum(grid[j] for grid, j in zip(self.q_gl_wells, cheapest)) <= self.available_qgl_total
 
     def get_maximised_prod_rates(self):
         """Get production value for each well"""
-        var_results = [
-        pulp.value(pulp.lpSum(self.variables[i][j] * self.q_fluid_wells[i][j]
-            for j in range(len(self.q_gl))))
-            for i in range(len(self.q_fluid_wells))
-        ]
-        return var_results
+        if self.selection is None:
+            return [0.0] * len(self.q_fluid_wells)
+        return [float(self.q_fluid_wells[i][j]) for i, j in enumerate(self.selection)]
 
     def get_optimal_injection_rates(self):
         """Get production value for each well"""
-        var_results = [
-        pulp.value(pulp.lpSum(self.variables[i][j] * self.q_gl[j]
-            for j in range(len(self.q_gl))))
-            for i in range(len(self.q_fluid_wells))
-        ]
-        return var_results
+        if self.selection is None:
+            return [0.0] * len(self.q_fluid_wells)
+        return [float(self.q_gl_wells[i][j]) for i, j in enumerate(self.selection)]
 
 
 if __name__ == "__main__":
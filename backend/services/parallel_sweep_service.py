@@ -0,0 +1,97 @@
+# services/parallel_sweep_service.py
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+# Per-process state of a sweep worker, set once by the pool initializer
+_worker = {}
+
+
+@dataclass
+class SharedCurvesSpec:
+    """Picklable handle on curves placed in shared memory: block names, shape and row lengths"""
+    gas_name: str
+    production_name: str
+    shape: Tuple[int, int]
+    sizes: List[int]
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """
+    Open a block created by another process without handing it to the resource tracker.
+    The creator unlinks the block; a tracked attach would let the worker's tracker unlink
+    it (or warn about a leak) when the worker exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attach registers the block. Pool workers share the
+        # creator's tracker, where registrations are a set, so unregistering afterwards
+        # would also drop the creator's entry; skip the registration instead
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedCurves:
+    """
+    Per-well q_gl grids and production curves in two shared (wells x grid) blocks.
+
+    Workers attach to the blocks by name instead of receiving a pickled copy of every
+    curve with each task. The creating process owns the blocks and unlinks them on close().
+    """
+
+    def __init__(self, grids: List[np.ndarray], rates: List[np.ndarray]):
+        sizes = [int(np.size(grid)) for grid in grids]
+        shape = (len(grids), max(sizes, default=0))
+        nbytes = max(int(np.prod(shape)) * np.dtype(float).itemsize, 1)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(2)]
+        for block, rows in zip(self.blocks, (grids, rates)):
+            matrix = np.ndarray(shape, dtype=float, buffer=block.buf)
+            for i, row in enumerate(rows):
+                matrix[i, :sizes[i]] = row
+        self.spec = SharedCurvesSpec(self.blocks[0].name, self.blocks[1].name, shape, sizes)
+
+    @staticmethod
+    def attach(spec: SharedCurvesSpec):
+        """Blocks and per-well row views (no copy) of curves shared by another process"""
+        blocks = [_attach_block(name) for name in (spec.gas_name, spec.production_name)]
+        matrices = [np.ndarray(spec.shape, dtype=float, buffer=block.buf) for block in blocks]
+        grids, rates = ([matrix[i, :size] for i, size in enumerate(spec.sizes)] for matrix in matrices)
+        return blocks, grids, rates
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def _init_worker(spec: SharedCurvesSpec, pipeline_kwargs: Dict, marginal_analysis) -> None:
+    """Attach the shared curves and build this worker's pipeline; its model is reused across tasks"""
+    from backend.services.optimization_global_pipeline_service import OptimizationGlobalPipelineService
+    blocks, grids, rates = SharedCurves.attach(spec)
+    pipeline = OptimizationGlobalPipelineService(q_gl_common_range=grids, q_oil_rates_list=rates, **pipeline_kwargs)
+    pipeline.marginal_analysis = marginal_analysis
+    _worker.update(blocks=blocks, pipeline=pipeline)
+
+
+def _solve_limit(qgl_limit: float) -> Dict:
+    """One sweep point, solved in a worker, with its refinement report when there is one"""
+    pipeline = _worker["pipeline"]
+    return dict(pipeline._execute(qgl_limit), refinement=pipeline.optimization_results.get("refinement"))
+
+
+def sweep_pool(spec: SharedCurvesSpec, pipeline_kwargs: Dict, marginal_analysis, workers: int) -> ProcessPoolExecutor:
+    """Process pool whose workers solve sweep points on the shared curves"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(spec, pipeline_kwargs, marginal_analysis))
+
+
+def submit_limit(pool: ProcessPoolExecutor):
+    """Submit-style function for adaptive_sweep: only the gas limit travels with each task"""
+    return lambda qgl_limit: pool.submit(_solve_limit, qgl_limit)
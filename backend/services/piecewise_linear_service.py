@@ -0,0 +1,81 @@
+# services/piecewise_linear_service.py
+import numpy as np
+from typing import Optional, Tuple
+
+# Breakpoints per well when SolverOptions leaves the count open
+DEFAULT_BREAKPOINTS = 24
+
+
+def select_breakpoints(gas: np.ndarray,
+                       production: np.ndarray,
+                       max_points: Optional[int] = None,
+                       tolerance: Optional[float] = None) -> Tuple[np.ndarray, float]:
+    """
+    Pick the points of a sampled curve that a piecewise-linear interpolation keeps.
+
+    Starts from both ends and repeatedly inserts the point the current interpolation
+    misses by the most, until that error is within ``tolerance`` or ``max_points``
+    points are in use.
+
+    Args:
+        gas: Gas of the sampled points, ascending
+        production: Production at those points
+        max_points: Breakpoint budget, defaults to DEFAULT_BREAKPOINTS
+        tolerance: Largest accepted production error (bbl) at any sampled point,
+            None uses the whole breakpoint budget
+
+    Returns:
+        Tuple of the kept positions (ascending) and the largest remaining error
+    """
+    max_points = max(2, max_points or DEFAULT_BREAKPOINTS)
+    if gas.size <= 2:
+        return np.arange(gas.size), 0.0
+
+    kept = np.array([0, gas.size - 1])
+    while True:
+        error = np.abs(production - np.interp(gas, gas[kept], production[kept]))
+        worst = int(np.argmax(error))
+        if kept.size >= max_points or error[worst] <= (tolerance or 0.0):
+            return kept, float(error[worst])
+        kept = np.sort(np.r_[kept, worst])
+
+
+if __name__ == "__main__":
+    # Benchmark: binary model (one binary per grid point) against SOS2 breakpoints
+    import sys
+    import time
+    from backend.services.data_loader_service import DataLoader
+    from backend.services.fitting_service import FittingService
+    from backend.services.marginal_analysis_service import calculate_marginal_analysis
+    from backend.services.optimization_model_service import OptimizationModel
+    from backend.services.presolve_service import presolve_candidates
+    from backend.services.solver_backend_service import SolverOptions
+
+    path_data = sys.argv[1] if len(sys.argv) > 1 else "./data/data_field101.csv"
+    q_gl, q_fluid, wct, _ = DataLoader(path_data).load_data()
+    fit = FittingService(q_gl, q_fluid, wct).perform_fitting_group()
+    grid, rates = fit["q_gl_common_range"], fit["q_oil_rates_list"]
+    caps = calculate_marginal_analysis(grid, rates, p_qoil=70, p_qgl=1).p_qgl_optim_list
+    candidates = presolve_candidates(grid, rates, 1.0, caps, mode="off").candidates
+
+    def solve(limit, solver, options=None):
+        model = OptimizationModel(grid, rates, limit, 1.0, caps, solver=solver,
+                                  solver_options=options, candidates=candidates)
+        start = time.perf_counter()
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        model.solve_prob()
+        return model, time.perf_counter() - start
+
+    print(f"{'limit':>7} {'model':>14} {'variables':>10} {'seconds':>8} {'production':>11} {'error %':>8}")
+    for limit in (300, 1500, 5000):
+        binary, seconds = solve(limit, "milp")
+        reference = binary.solve_result.objective
+        print(f"{limit:>7} {'binary':>14} {sum(map(len, binary.variables)):>10} "
+              f"{seconds:>8.2f} {reference:>11.1f} {0:>8.3f}")
+        for points in (8, 16, 32):
+            sos2, seconds = solve(limit, "sos2", SolverOptions(breakpoints=points))
+            objective = sos2.solve_result.objective
+            print(f"{limit:>7} {f'sos2 k={points}':>14} {sum(map(len, sos2.variables)):>10} "
+                  f"{seconds:>8.2f} {objective:>11.1f} {100 * (reference - objective) / reference:>8.3f}")
@@ -0,0 +1,105 @@
+# services/presolve_service.py
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List
+from backend.services.grid_service import QglGrid, as_well_grids
+
+# "off" keeps every grid point, "exact" drops points that can never be optimal,
+# "envelope" also drops points below the upper concave envelope of each curve
+PRESOLVE_MODES = ("off", "exact", "envelope")
+
+
+@dataclass
+class PresolveResult:
+    """Grid points kept per well and how many binary variables were removed"""
+    candidates: List[np.ndarray]  # Kept indices of q_gl for each well, ascending
+    original_variables: int = 0
+    eliminated: Dict[str, int] = field(default_factory=dict)  # Removed points by reason
+
+    @property
+    def kept_variables(self) -> int:
+        return int(sum(indices.size for indices in self.candidates))
+
+    @property
+    def eliminated_variables(self) -> int:
+        return self.original_variables - self.kept_variables
+
+    def to_dict(self) -> dict:
+        return {
+            "original_variables": self.original_variables,
+            "kept_variables": self.kept_variables,
+            "eliminated_variables": self.eliminated_variables,
+            "eliminated_by_reason": dict(self.eliminated)
+        }
+
+
+def upper_concave_envelope(gas: np.ndarray, production: np.ndarray) -> np.ndarray:
+    """Positions of the points on the upper concave hull, gas sorted ascending (monotone chain)"""
+    hull = []
+    for k in range(gas.size):
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            # b is dropped when it lies on or below the chord from a to k
+            cross = (gas[b] - gas[a]) * (production[k] - production[a]) \
+                - (production[b] - production[a]) * (gas[k] - gas[a])
+            if cross < 0:
+                break
+            hull.pop()
+        hull.append(k)
+    return np.asarray(hull, dtype=np.int64)
+
+
+def presolve_candidates(q_gl: QglGrid,
+                        q_fluid_wells: List[np.ndarray],
+                        qgl_min: float,
+                        p_qgl_list: List[float],
+                        mode: str = "exact") -> PresolveResult:
+    """
+    Remove per-well grid points that cannot change the optimum before the model is built.
+
+    "exact" drops points above the well's MRP cap or below ``qgl_min`` (infeasible)
+    and points that produce no more than a cheaper admissible point (dominated: swapping
+    to the cheaper point keeps every constraint and the objective). The optimum is unchanged.
+
+    "envelope" additionally keeps only the vertices of the upper concave envelope of
+    each well's curve. That is the LP-relaxation view of the problem: it is exact for
+    concave curves, but on a non-concave curve it can remove the true optimum.
+
+    Returns:
+        PresolveResult whose ``candidates`` map the reduced model back to the original grid
+    """
+    if mode not in PRESOLVE_MODES:
+        raise ValueError(f"Unknown presolve mode '{mode}', expected one of {PRESOLVE_MODES}")
+    grids = as_well_grids(q_gl, len(q_fluid_wells))
+    result = PresolveResult(candidates=[], original_variables=int(sum(grid.size for grid in grids)))
+    if mode == "off":
+        result.candidates = [np.arange(grid.size) for grid in grids]
+        return result
+
+    removed = {"above_cap": 0, "below_min": 0, "dominated": 0}
+    if mode == "envelope":
+        removed["below_envelope"] = 0
+    for well, (q_gl, rates) in enumerate(zip(grids, q_fluid_wells)):
+        rates = np.asarray(rates, dtype=float)
+        all_points = np.arange(q_gl.size)
+        above_cap = q_gl > p_qgl_list[well]
+        below_min = (q_gl < qgl_min) & ~above_cap
+        removed["above_cap"] += int(above_cap.sum())
+        removed["below_min"] += int(below_min.sum())
+        admissible = all_points[~above_cap & ~below_min]
+
+        # Cheapest first, best production first among equal gas
+        order = np.lexsort((-rates[admissible], q_gl[admissible]))
+        admissible = admissible[order]
+        best_before = np.maximum.accumulate(np.r_[-np.inf, rates[admissible][:-1]])
+        kept = admissible[rates[admissible] > best_before]
+        removed["dominated"] += admissible.size - kept.size
+
+        if mode == "envelope" and kept.size > 2:
+            on_envelope = kept[upper_concave_envelope(q_gl[kept], rates[kept])]
+            removed["below_envelope"] += kept.size - on_envelope.size
+            kept = on_envelope
+        result.candidates.append(np.sort(kept))
+
+    result.eliminated = removed
+    return result
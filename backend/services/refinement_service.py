@@ -0,0 +1,127 @@
+# services/refinement_service.py
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+
+@dataclass
+class RefinementOptions:
+    """Schedule of the coarse-to-fine solve"""
+    coarse_points: int = 50  # Points per well in the first solve
+    shrink: int = 4  # Stride divisor between rounds
+    window: int = 2  # Half-width of the re-gridded band around the chosen point, in previous strides
+    tolerance: float = 1e-4  # Relative objective change that stops the refinement
+    max_rounds: int = 10
+
+
+@dataclass
+class RefinementReport:
+    """How the refinement went, round by round, and the resolution it ended at"""
+    objectives: List[float] = field(default_factory=list)
+    variables: List[int] = field(default_factory=list)  # Model size of each round
+    final_stride: List[int] = field(default_factory=list)  # Grid points skipped per step, per well
+    effective_spacing: List[float] = field(default_factory=list)  # Mscf per final step at the chosen point, per well
+    converged: bool = False
+
+    @property
+    def rounds(self) -> int:
+        return len(self.objectives)
+
+    def to_dict(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "objectives": list(self.objectives),
+            "variables": list(self.variables),
+            "final_stride": list(self.final_stride),
+            "effective_spacing": list(self.effective_spacing),
+            "max_effective_spacing": max(self.effective_spacing, default=None),
+            "converged": self.converged
+        }
+
+
+def _coarse_positions(size: int, stride: int) -> np.ndarray:
+    """Every stride-th position plus both ends"""
+    if size == 0:
+        return np.arange(0)
+    return np.unique(np.r_[np.arange(0, size, stride), size - 1])
+
+
+def _chosen_spacing(q_gl: np.ndarray, candidates: np.ndarray, chosen: int, stride: int) -> float:
+    """
+    Gas covered by one step of the final stride around the chosen grid index. The stride
+    counts candidate positions, so the neighbours are ``stride`` candidates away, not
+    ``stride`` grid points.
+    """
+    p = int(np.searchsorted(candidates, chosen))
+    steps = [abs(q_gl[candidates[k]] - q_gl[chosen]) for k in (p - stride, p + stride) if 0 <= k < candidates.size]
+    return float(max(steps, default=0.0))
+
+
+def refine_allocation(build_model: Callable,
+                      candidates: List[np.ndarray],
+                      options: Optional[RefinementOptions] = None) -> Tuple[object, RefinementReport]:
+    """
+    Solve on a coarse subset of each well's candidate points, then repeatedly re-grid
+    a band around each well's chosen point with a finer stride and re-solve.
+
+    The previous choice is always kept, so the objective never decreases. Refinement
+    stops when the relative objective change falls below ``tolerance`` or once every
+    well is solved at stride 1 (the full candidate set inside its band).
+
+    Args:
+        build_model: Callable taking per-well candidate indices and returning a built,
+            unsolved OptimizationModel
+        candidates: Full candidate indices of q_gl per well, ascending (e.g. from presolve)
+        options: Refinement schedule
+
+    Returns:
+        Tuple of the last solved model and the refinement report
+    """
+    options = options or RefinementOptions()
+    full = [np.asarray(indices, dtype=np.int64) for indices in candidates]
+    strides = [max(1, int(np.ceil(indices.size / options.coarse_points))) for indices in full]
+    positions = [_coarse_positions(indices.size, stride) for indices, stride in zip(full, strides)]
+    report = RefinementReport()
+
+    model = None
+    solved_strides = strides
+    for _ in range(options.max_rounds):
+        solved_strides = strides
+        model = build_model([indices[p] for indices, p in zip(full, positions)])
+        model.solve_prob()
+        report.variables.append(int(sum(p.size for p in positions)))
+        if model.selection is None:
+            if report.rounds == 0 and max(strides) > 1:
+                # The coarse grid may miss the only feasible points: solve on the full set instead
+                positions = [np.arange(indices.size) for indices in full]
+                strides = [1] * len(full)
+                continue
+            break
+
+        objective = model.solve_result.objective
+        previous = report.objectives[-1] if report.objectives else None
+        report.objectives.append(objective)
+        if previous is not None and abs(objective - previous) <= options.tolerance * max(abs(previous), 1e-9):
+            report.converged = True
+            break
+        if all(stride == 1 for stride in strides):
+            report.converged = True
+            break
+
+        chosen = [int(np.searchsorted(indices, j)) for indices, j in zip(full, model.selection)]
+        next_positions, next_strides = [], []
+        for indices, p, stride in zip(full, chosen, strides):
+            finer = max(1, stride // options.shrink)
+            low = max(0, p - options.window * stride)
+            high = min(indices.size - 1, p + options.window * stride)
+            next_positions.append(np.unique(np.r_[np.arange(low, high + 1, finer), p]))
+            next_strides.append(finer)
+        positions, strides = next_positions, next_strides
+
+    report.final_stride = list(solved_strides)
+    if model is not None and model.selection is not None:
+        report.effective_spacing = [
+            _chosen_spacing(q_gl, indices, j, stride)
+            for q_gl, indices, j, stride in zip(model.q_gl_wells, full, model.selection, solved_strides)
+        ]
+    return model, report
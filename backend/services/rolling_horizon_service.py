@@ -0,0 +1,176 @@
+# services/rolling_horizon_service.py
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+from backend.services.optimization_model_service import OptimizationModel
+from backend.services.grid_service import QglGrid, as_well_grids
+from backend.services.presolve_service import PRESOLVE_MODES, presolve_candidates
+from backend.services.solver_backend_service import SolverOptions
+
+
+@dataclass
+class HorizonPeriod:
+    """Allocation of one period of the horizon"""
+    qgl_limit: float
+    status: str  # Solver status; Infeasible when the change limits cannot get under qgl_limit
+    well_qgl: List[float]
+    well_production: List[float]
+    solve_seconds: float = 0.0
+    rebuilt: bool = False  # The model had to be rebuilt for this period's candidate windows
+
+    @property
+    def total_production(self) -> float:
+        return float(sum(self.well_production))
+
+    @property
+    def total_qgl(self) -> float:
+        return float(sum(self.well_qgl))
+
+
+class RollingHorizonAllocator:
+    """
+    Period-by-period allocation over a forecast of gas availability.
+
+    The curves, MRP caps and presolve are fixed for the horizon, so they are computed
+    once and the model is built once. Every new period only changes the total gas
+    limit: the model's right-hand side is updated in place and re-solved from the
+    previous period's allocation (the DP keeps its tables, CBC gets a MIP start).
+
+    With ``max_change`` a well may move at most that much gas from one period to the
+    next. Each period then only offers a well the candidates inside that window around
+    its previous rate; the model is rebuilt when the windows move, warm-started from
+    the previous allocation, which always lies inside them. Periods are solved in
+    order, each one given the allocation the previous one left (no look-ahead). When
+    the limit drops faster than the wells may follow, the period is reported
+    Infeasible with every well as low as its window allows.
+    """
+
+    def __init__(self,
+                 q_gl: QglGrid,
+                 q_fluid_wells: List[np.ndarray],
+                 qgl_min: float,
+                 p_qgl_list: List[float],
+                 solver: str = "dp",
+                 solver_options: SolverOptions = None,
+                 presolve: str = "exact",
+                 max_change: Union[float, List[float], None] = None,
+                 initial_qgl: List[float] = None):
+        """
+        Args:
+            q_gl: Gas lift grid shared by all wells, or one grid per well
+            q_fluid_wells: Production on the grid for each well
+            qgl_min: Minimum gas rate allowed to inject to a well
+            p_qgl_list: Maximum gas rate per well (MRP caps)
+            solver: Allocation engine of the periods, see OptimizationModel
+            solver_options: Time limit, relative MIP gap and thread count for each solve
+            presolve: Candidate pruning ahead of the model, one of PRESOLVE_MODES
+            max_change: Largest change of a well's gas between periods (Mscf), one
+                value for every well or one per well; None leaves the periods independent
+            initial_qgl: Gas of each well before the first period, the starting point of
+                the change limits; None leaves the first period free
+        """
+        if presolve not in PRESOLVE_MODES:
+            raise ValueError(f"Unknown presolve mode '{presolve}', expected one of {PRESOLVE_MODES}")
+        self.q_gl = q_gl
+        self.q_fluid_wells = [np.asarray(q, dtype=float) for q in q_fluid_wells]
+        self.q_gl_wells = as_well_grids(q_gl, len(self.q_fluid_wells))
+        self.qgl_min = qgl_min
+        self.p_qgl_list = list(p_qgl_list)
+        self.solver = solver
+        self.solver_options = solver_options or SolverOptions()
+        if max_change is not None and np.ndim(max_change) == 0:
+            max_change = [float(max_change)] * len(self.q_fluid_wells)
+        self.max_change = max_change
+        self.candidates = presolve_candidates(
+            self.q_gl_wells, self.q_fluid_wells, qgl_min, self.p_qgl_list, presolve).candidates
+        self.model = None
+        self.windows = None
+        self.previous_qgl = None if initial_qgl is None else [float(q) for q in initial_qgl]
+        self.previous_selection = None
+
+    def _windows(self) -> List[np.ndarray]:
+        """Candidates each well can reach from its previous rate"""
+        if self.max_change is None or self.previous_qgl is None:
+            return self.candidates
+        windows = []
+        for grid, indices, previous, change in zip(self.q_gl_wells, self.candidates, self.previous_qgl,
+                                                   self.max_change):
+            reachable = indices[np.abs(grid[indices] - previous) <= change + 1e-9]
+            if reachable.size == 0 and indices.size:
+                # A starting rate off the candidates: the nearest candidate stands in for it
+                reachable = indices[[np.argmin(np.abs(grid[indices] - previous))]]
+            windows.append(reachable)
+        return windows
+
+    def _build_model(self, qgl_limit: float, candidates: List[np.ndarray]) -> OptimizationModel:
+        model = OptimizationModel(
+            q_gl=self.q_gl,
+            q_fluid_wells=self.q_fluid_wells,
+            available_qgl_total=qgl_limit,
+            qgl_min=self.qgl_min,
+            p_qgl_list=self.p_qgl_list,
+            solver=self.solver,
+            solver_options=self.solver_options,
+            candidates=candidates
+        )
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        return model
+
+    def solve_period(self, qgl_limit: float) -> HorizonPeriod:
+        """Allocate the next period and make it the starting point of the one after"""
+        start = time.perf_counter()
+        windows = self._windows()
+        rebuilt = self.model is None or not all(
+            np.array_equal(a, b) for a, b in zip(windows, self.windows))
+        if rebuilt:
+            self.model = self._build_model(qgl_limit, windows)
+            self.model.warm_start = self.previous_selection
+            self.windows = windows
+        else:
+            self.model.update_available_qgl_total(qgl_limit)
+        self.model.solve_prob()
+
+        status = self.model.solve_result.status
+        selection = self.model.selection
+        if selection is None:
+            # Out of reach this period: every well goes as low as its window allows
+            selection = self.model.cheapest_selection()
+            status = "Infeasible"
+        if selection is None:
+            raise ValueError("A well has no admissible point between qgl_min and its MRP cap")
+
+        well_qgl = [float(grid[j]) for grid, j in zip(self.q_gl_wells, selection)]
+        self.previous_qgl = well_qgl
+        self.previous_selection = list(selection)
+        return HorizonPeriod(
+            qgl_limit=float(qgl_limit),
+            status=status,
+            well_qgl=well_qgl,
+            well_production=[float(rates[j]) for rates, j in zip(self.q_fluid_wells, selection)],
+            solve_seconds=time.perf_counter() - start,
+            rebuilt=rebuilt
+        )
+
+    def run(self, qgl_limits: Sequence[float]) -> Dict:
+        """
+        Allocate every period of the forecast in order.
+
+        Returns:
+            Per-period lists: qgl_limit, total_production, total_qgl, solver_status,
+            well_gas_injection_rates, well_production_rates, solve_seconds and rebuilt
+        """
+        periods = [self.solve_period(qgl_limit) for qgl_limit in qgl_limits]
+        return {
+            "qgl_limit": [period.qgl_limit for period in periods],
+            "total_production": [period.total_production for period in periods],
+            "total_qgl": [period.total_qgl for period in periods],
+            "solver_status": [period.status for period in periods],
+            "well_gas_injection_rates": [period.well_qgl for period in periods],
+            "well_production_rates": [period.well_production for period in periods],
+            "solve_seconds": [period.solve_seconds for period in periods],
+            "rebuilt": [period.rebuilt for period in periods],
+            "max_change": self.max_change
+        }
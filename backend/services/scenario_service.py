@@ -0,0 +1,210 @@
+# services/scenario_service.py
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, List, Sequence
+from backend.services.optimization_model_service import OptimizationModel
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from backend.services.allocation_separable_service import saturated_allocation
+from backend.services.cache_service import LRUCache
+from backend.services.grid_service import QglGrid, as_well_grids
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.parallel_sweep_service import SharedCurves, SharedCurvesSpec
+from backend.services.presolve_service import PRESOLVE_MODES, presolve_candidates
+from backend.services.solver_backend_service import SolveResult, SolverOptions
+
+# Columns of the scenario table, one row per (p_qoil, p_qgl, qgl_limit) combination
+SCENARIO_COLUMNS = ["p_qoil", "p_qgl", "qgl_limit", "total_production", "total_qgl",
+                    "oil_revenue", "gas_cost", "net_revenue", "solver_status"]
+
+# Per-process state of a scenario worker, set once by the pool initializer
+_worker = {}
+
+
+def _solve_price_case(grids: List[np.ndarray],
+                      rates: List[np.ndarray],
+                      qgl_min: float,
+                      p_qgl_list: List[float],
+                      qgl_limits: Sequence[float],
+                      solver: str,
+                      solver_options: SolverOptions,
+                      presolve: str) -> List[Dict]:
+    """
+    Every gas limit of one set of MRP caps, on artifacts built once for the caps.
+
+    Presolve and the saturated allocation are shared by all limits; limits that leave
+    the gas row slack take the saturated allocation without a solve. The "dp" solver
+    answers the other limits from one frontier pass, reported Optimal only where the
+    floor-rounded DP bound closes the gap; any other solver builds one model
+    and re-solves it with each new right-hand side, in ascending order of the limit.
+
+    Returns:
+        Per limit, in the order given: total production, total gas and solver status
+    """
+    candidates = presolve_candidates(grids, rates, qgl_min, p_qgl_list, presolve).candidates
+    saturated = saturated_allocation(grids, rates, qgl_min, p_qgl_list, candidates)
+    rows = {}
+    binding = []
+    for qgl_limit in sorted(set(float(limit) for limit in qgl_limits)):
+        if saturated is not None and saturated.fits(qgl_limit):
+            rows[qgl_limit] = (saturated.total_production, saturated.total_qgl, "Optimal")
+        else:
+            binding.append(qgl_limit)
+
+    def totals(selection) -> tuple:
+        return (float(sum(rate[j] for rate, j in zip(rates, selection))),
+                float(sum(grid[j] for grid, j in zip(grids, selection))))
+
+    if binding and solver == "dp":
+        allocator = DynamicProgrammingAllocator(
+            q_gl=grids,
+            q_fluid_wells=rates,
+            qgl_min=qgl_min,
+            p_qgl_list=p_qgl_list,
+            gas_resolution=max(binding[-1], 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS,
+            candidates=candidates
+        )
+        frontier = allocator.frontier(binding[-1])
+        bound_table = allocator.upper_bounds(binding[-1])
+        for qgl_limit in binding:
+            units = allocator.budget_units(qgl_limit)
+            position = -1 if frontier is None else \
+                int(np.searchsorted(frontier[0], units, side="right")) - 1
+            if position < 0:
+                rows[qgl_limit] = (np.nan, np.nan, "Infeasible")
+            else:
+                production, total_qgl = totals(frontier[1][position])
+                # Lattice answers are Optimal only when the floor-rounded bound proves them
+                bound = float(bound_table[min(units, bound_table.size - 1)])
+                status = SolveResult("Optimal", production, bound).bound_status()
+                rows[qgl_limit] = (production, total_qgl, status)
+    elif binding:
+        model = OptimizationModel(grids, rates, binding[0], qgl_min, p_qgl_list, solver=solver,
+                                  solver_options=solver_options, candidates=candidates)
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        for qgl_limit in binding:
+            model.update_available_qgl_total(qgl_limit)
+            model.solve_prob()
+            if model.selection is None:
+                rows[qgl_limit] = (np.nan, np.nan, model.solve_result.status)
+            else:
+                rows[qgl_limit] = totals(model.selection) + (model.solve_result.status,)
+    return [dict(zip(("total_production", "total_qgl", "solver_status"), rows[float(limit)]))
+            for limit in qgl_limits]
+
+
+def _init_worker(spec: SharedCurvesSpec, case_kwargs: Dict) -> None:
+    """Attach the shared curves once per worker; only the caps travel with each task"""
+    blocks, grids, rates = SharedCurves.attach(spec)
+    _worker.update(blocks=blocks, grids=grids, rates=rates, case_kwargs=case_kwargs)
+
+
+def _solve_shared_case(p_qgl_list: List[float], qgl_limits: Sequence[float]) -> List[Dict]:
+    return _solve_price_case(_worker["grids"], _worker["rates"], p_qgl_list=p_qgl_list,
+                             qgl_limits=qgl_limits, **_worker["case_kwargs"])
+
+
+class ScenarioEngine:
+    """
+    Allocations for a grid of oil prices, gas costs and gas limits.
+
+    The fitted curves are shared by every scenario. The MRP caps only depend on the
+    prices, so the marginal analysis runs once per price pair, and price pairs with the
+    same caps (the same gas-to-oil price ratio, in practice) are one case: their
+    allocations coincide, only the revenue differs. Each case solves all gas limits on
+    one presolve and one model or DP frontier (see _solve_price_case); cases run in a
+    process pool over curves placed in shared memory when ``workers`` > 1.
+    """
+
+    def __init__(self,
+                 q_gl_common_range: QglGrid,
+                 q_oil_rates_list: List[np.ndarray],
+                 qgl_min: float = 0.0,
+                 solver: str = "dp",
+                 solver_options: SolverOptions = None,
+                 presolve: str = "exact",
+                 marginal_cache: LRUCache = None,
+                 workers: int = 1):
+        """
+        Args:
+            q_gl_common_range: Gas lift grid shared by all wells, or one grid per well
+            q_oil_rates_list: Fitted oil production on the grid for each well
+            qgl_min: Minimum gas rate allowed to inject to a well
+            solver: Allocation engine for the binding gas limits; "dp" reads them all
+                from one frontier per case, the others re-solve one model per limit
+            solver_options: Time limit, relative MIP gap and thread count for each solve
+            presolve: Candidate pruning ahead of the model, one of PRESOLVE_MODES
+            marginal_cache: Optional store of marginal analyses keyed on curves and prices
+            workers: Processes solving price cases in parallel; 1 solves them in this process
+        """
+        if presolve not in PRESOLVE_MODES:
+            raise ValueError(f"Unknown presolve mode '{presolve}', expected one of {PRESOLVE_MODES}")
+        self.rates = [np.asarray(rates, dtype=float) for rates in q_oil_rates_list]
+        self.grids = as_well_grids(q_gl_common_range, len(self.rates))
+        self.qgl_min = qgl_min
+        self.solver = solver
+        self.solver_options = solver_options or SolverOptions()
+        self.presolve = presolve
+        self.marginal_cache = marginal_cache
+        self.workers = max(1, int(workers))
+        self.instrumentation = {}
+
+    def run(self,
+            p_qoil_values: Sequence[float],
+            p_qgl_values: Sequence[float],
+            qgl_limit_values: Sequence[float]) -> pd.DataFrame:
+        """
+        Solve every combination of the three vectors.
+
+        Returns:
+            Tidy table with one row per scenario and the columns of SCENARIO_COLUMNS;
+            totals are NaN where no allocation fits the gas limit
+        """
+        start = time.perf_counter()
+        qgl_limits = [float(limit) for limit in qgl_limit_values]
+        cases = {}  # Caps -> price pairs sharing them
+        for p_qoil, p_qgl in product(p_qoil_values, p_qgl_values):
+            analysis = calculate_marginal_analysis(
+                self.grids, self.rates, p_qoil, p_qgl, self.marginal_cache)
+            cases.setdefault(tuple(analysis.p_qgl_optim_list), []).append((float(p_qoil), float(p_qgl)))
+
+        case_rows = self._solve_cases(list(cases), qgl_limits)
+        records = []
+        for (caps, prices), rows in zip(cases.items(), case_rows):
+            for p_qoil, p_qgl in prices:
+                for qgl_limit, row in zip(qgl_limits, rows):
+                    records.append(dict(row, p_qoil=p_qoil, p_qgl=p_qgl, qgl_limit=qgl_limit))
+
+        table = pd.DataFrame.from_records(records, columns=SCENARIO_COLUMNS)
+        table["oil_revenue"] = table["p_qoil"] * table["total_production"]
+        table["gas_cost"] = table["p_qgl"] * table["total_qgl"]
+        table["net_revenue"] = table["oil_revenue"] - table["gas_cost"]
+        table = table.sort_values(["p_qoil", "p_qgl", "qgl_limit"], ignore_index=True)
+        self.instrumentation = {
+            "scenarios": len(table),
+            "price_cases": len(cases),
+            "elapsed_seconds": time.perf_counter() - start
+        }
+        return table
+
+    def _solve_cases(self, caps_list: List[tuple], qgl_limits: List[float]) -> List[List[Dict]]:
+        """Rows of every case, in this process or in a pool sharing the curves"""
+        case_kwargs = dict(qgl_min=self.qgl_min, solver=self.solver,
+                           solver_options=self.solver_options, presolve=self.presolve)
+        if self.workers == 1 or len(caps_list) == 1:
+            return [_solve_price_case(self.grids, self.rates, p_qgl_list=list(caps), qgl_limits=qgl_limits,
+                                      **case_kwargs) for caps in caps_list]
+
+        shared = SharedCurves(self.grids, self.rates)
+        pool = ProcessPoolExecutor(max_workers=min(self.workers, len(caps_list)), initializer=_init_worker,
+                                   initargs=(shared.spec, case_kwargs))
+        try:
+            futures = [pool.submit(_solve_shared_case, list(caps), qgl_limits) for caps in caps_list]
+            return [future.result() for future in futures]
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            shared.close()
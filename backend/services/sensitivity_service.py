@@ -0,0 +1,135 @@
+# services/sensitivity_service.py
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from backend.services.allocation_greedy_service import GreedyAllocator
+from backend.services.allocation_index_service import AllocationIndex
+from backend.services.grid_service import QglGrid
+from backend.services.presolve_service import upper_concave_envelope
+
+
+@dataclass
+class GasSensitivity:
+    """Value of the total gas limit at an optimum, read without re-solving"""
+    shadow_price: float  # Oil of the next Mscf of total gas (bbl/Mscf)
+    well_marginal_rates: List[float]  # Oil of the next Mscf on each well's curve (bbl/Mscf), 0 at its cap
+    delta_qgl: float  # Change of the total limit the two production changes refer to (Mscf)
+    production_change_up: float  # Production change with delta_qgl more gas (bbl)
+    production_change_down: Optional[float]  # With delta_qgl less gas, None when that limit is infeasible
+    method: str  # "frontier" (read off the allocation index) or "envelope" (concave-envelope estimate)
+    lattice_resolution: Optional[float] = None  # Gas lattice (Mscf) the frontier changes are accurate to
+
+    def to_dict(self, p_qoil: float = 0.0) -> Dict:
+        return {
+            "shadow_price": self.shadow_price,
+            "shadow_value": self.shadow_price * p_qoil,
+            "well_marginal_rates": self.well_marginal_rates,
+            "delta_qgl": self.delta_qgl,
+            "production_change_up": self.production_change_up,
+            "production_change_down": self.production_change_down,
+            "method": self.method,
+            "lattice_resolution": self.lattice_resolution
+        }
+
+
+def _envelope_steps(gas: np.ndarray, values: np.ndarray, qgl: float) -> Tuple[List, List]:
+    """
+    Envelope segments of one well ahead of and behind its rate ``qgl``.
+
+    Returns:
+        (slope, gas) pairs for adding gas, nearest first, and the same for removing it
+    """
+    slopes = np.diff(values) / np.diff(gas)
+    k = min(max(int(np.searchsorted(gas, qgl, side="right")) - 1, 0), gas.size - 1)
+    ahead, behind = [], []
+    if k + 1 < gas.size:
+        ahead.append((slopes[k], gas[k + 1] - max(qgl, gas[k])))
+        ahead.extend(zip(slopes[k + 1:], np.diff(gas)[k + 1:]))
+    if qgl > gas[k] and k + 1 < gas.size:
+        behind.append((slopes[k], qgl - gas[k]))
+    behind.extend(zip(slopes[:k][::-1], np.diff(gas)[:k][::-1]))
+    return ahead, behind
+
+
+def _walk(steps: List, amount: float, steepest_first: bool) -> float:
+    """Oil moved by spending (or releasing) ``amount`` of gas over the steps in slope order"""
+    total = 0.0
+    for slope, length in sorted(steps, key=lambda step: step[0], reverse=steepest_first):
+        if amount <= 0:
+            break
+        used = min(length, amount)
+        total += slope * used
+        amount -= used
+    return total
+
+
+def gas_sensitivity(q_gl: QglGrid,
+                    q_fluid_wells: List[np.ndarray],
+                    well_qgl: List[float],
+                    qgl_limit: float,
+                    qgl_min: float,
+                    p_qgl_list: List[float],
+                    delta_qgl: float = 500.0,
+                    candidates: List[np.ndarray] = None,
+                    index: AllocationIndex = None,
+                    shadow_price: float = None) -> GasSensitivity:
+    """
+    Shadow price of the total gas limit, per-well marginal rates and the production change
+    for ``delta_qgl`` more or less gas, all from curves or frontiers already at hand.
+
+    With an allocation index the frontier is simply read at qgl_limit +/- delta_qgl,
+    and the shadow price is the slope of its concave envelope at qgl_limit; both are
+    accurate to the index's DP gas lattice, reported as ``lattice_resolution``.
+    Otherwise each well's admissible points are reduced to their upper
+    concave envelope and the changes are the LP response: extra gas (plus what the
+    allocation left unused) goes to the steepest envelope steps ahead of the wells,
+    and a cut comes out of the flattest steps behind them; the shadow price is the
+    steepest step ahead. A solver's own dual (``shadow_price``, e.g. the Lagrangian
+    multiplier of the continuous allocator) takes precedence when given.
+    """
+    envelope = GreedyAllocator(q_gl, q_fluid_wells, qgl_min, p_qgl_list, candidates)
+    ahead, behind, rates = [], [], []
+    for (_, gas, values), hull, qgl in zip(envelope.candidates, envelope.envelopes, well_qgl):
+        if gas.size == 0:
+            rates.append(0.0)
+            continue
+        well_ahead, well_behind = _envelope_steps(gas[hull], values[hull], float(qgl))
+        rates.append(float(well_ahead[0][0]) if well_ahead else 0.0)
+        ahead.extend(well_ahead)
+        behind.extend(well_behind)
+
+    if index is not None and index.breakpoints:
+        current = index.position(qgl_limit)
+        production = index.total_production
+        up = index.position(qgl_limit + delta_qgl)
+        down = index.position(qgl_limit - delta_qgl)
+        hull = upper_concave_envelope(index.total_qgl, production)
+        k = int(np.searchsorted(index.total_qgl[hull], qgl_limit, side="right")) - 1
+        slope = 0.0
+        if 0 <= k < hull.size - 1:
+            a, b = hull[k], hull[k + 1]
+            slope = float((production[b] - production[a]) / (index.total_qgl[b] - index.total_qgl[a]))
+        return GasSensitivity(
+            shadow_price=slope if shadow_price is None else float(shadow_price),
+            well_marginal_rates=rates,
+            delta_qgl=float(delta_qgl),
+            production_change_up=float(production[up] - production[current]),
+            production_change_down=float(production[down] - production[current]) if down >= 0 else None,
+            method="frontier",
+            lattice_resolution=index.gas_resolution
+        )
+
+    leftover = max(float(qgl_limit) - float(sum(well_qgl)), 0.0)
+    gain = _walk(ahead, leftover + delta_qgl, steepest_first=True) - _walk(ahead, leftover, steepest_first=True)
+    release = max(delta_qgl - leftover, 0.0)
+    releasable = sum(length for _, length in behind)
+    return GasSensitivity(
+        shadow_price=max((float(slope) for slope, _ in ahead), default=0.0) if shadow_price is None
+        else float(shadow_price),
+        well_marginal_rates=rates,
+        delta_qgl=float(delta_qgl),
+        production_change_up=float(gain),
+        production_change_down=0.0 - _walk(behind, release, steepest_first=False)
+        if release <= releasable + 1e-9 else None,
+        method="envelope"
+    )
@@ -0,0 +1,386 @@
+# services/solver_backend_service.py
+import os
+import re
+import tempfile
+import time
+import numpy as np
+import pulp
+from dataclasses import dataclass
+from typing import List, Optional
+from scipy import optimize
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from backend.services.allocation_greedy_service import GreedyAllocator
+from backend.services.allocation_separable_service import SEPARABLE_SOLVER, saturated_allocation
+
+
+# Relative gap under which an allocation whose engine is not exact by construction is reported Optimal
+OPTIMALITY_TOLERANCE = 1e-9
+
+
+@dataclass
+class SolverOptions:
+    """Limits applied to a single solve; None keeps the engine's default"""
+    time_limit: Optional[float] = None  # Wall-clock seconds
+    mip_gap: Optional[float] = None  # Relative MIP gap
+    threads: Optional[int] = None
+    breakpoints: Optional[int] = None  # Piecewise-linear breakpoints per well ("sos2")
+    breakpoint_tolerance: Optional[float] = None  # Production error (bbl) at which fewer breakpoints suffice
+
+
+@dataclass
+class SolveResult:
+    """Outcome of a solve, independent of the engine that produced it"""
+    status: str = "Not Solved"  # Optimal, Feasible (stopped on a limit), Infeasible, Unbounded, Not Solved
+    objective: Optional[float] = None  # Total production of the returned allocation
+    best_bound: Optional[float] = None  # Proven upper bound on the total production
+    selection: Optional[List[int]] = None  # Chosen q_gl index per well
+    solve_seconds: float = 0.0
+
+    @property
+    def gap(self) -> Optional[float]:
+        """Relative distance between the allocation and the bound"""
+        if self.objective is None or self.best_bound is None:
+            return None
+        return abs(self.best_bound - self.objective) / max(abs(self.best_bound), 1e-9)
+
+    def bound_status(self, tolerance: float = OPTIMALITY_TOLERANCE) -> str:
+        """Optimal when the best bound proves the allocation within ``tolerance``, Feasible otherwise"""
+        return "Optimal" if self.gap is not None and self.gap <= tolerance else "Feasible"
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "objective": self.objective,
+            "best_bound": self.best_bound,
+            "gap": self.gap,
+            "solve_seconds": self.solve_seconds
+        }
+
+
+class SolverBackend:
+    """Base class for allocation engines plugged into OptimizationModel"""
+    name = ""
+    # True when the engine needs the PuLP problem / sparse arrays built by the model
+    needs_pulp_model = False
+    needs_sparse_model = False
+    # True when the PuLP model holds SOS2 weights on curve breakpoints instead of binaries
+    piecewise_linear = False
+
+    def __init__(self, options: SolverOptions = None):
+        self.options = options or SolverOptions()
+
+    def solve(self, model) -> SolveResult:
+        start = time.perf_counter()
+        result = self._solve(model)
+        result.solve_seconds = time.perf_counter() - start
+        if result.selection is not None and result.objective is None:
+            result.objective = float(sum(model.q_fluid_wells[i][j] for i, j in enumerate(result.selection)))
+        return result
+
+    def _solve(self, model) -> SolveResult:
+        raise NotImplementedError
+
+
+class CbcBackend(SolverBackend):
+    """PuLP binary model solved by CBC"""
+    name = "milp"
+    needs_pulp_model = True
+
+    _BOUND_PATTERN = re.compile(r"^(?:Upper|Lower) bound:\s*(\S+)", re.MULTILINE)
+
+    def _apply_mip_start(self, model) -> bool:
+        """
+        Load the model's warm-start selection as CBC initial values when it is still feasible.
+        A first solve has none, so it starts from the greedy allocation instead.
+        """
+        start = model.warm_start
+        if start is None:
+            start = GreedyAllocator(model.q_gl, model.q_fluid_wells, model.qgl_min,
+                                    model.p_qgl_list, model.candidates).solve(model.available_qgl_total)
+        if start is None:
+            return False
+        start_gas = sum(grid[j] for grid, j in zip(model.q_gl_wells, start))
+        if start_gas > model.available_qgl_total:
+            return False
+        for row, indices, chosen in zip(model.variables, model.candidates, start):
+            for variable, j in zip(row, indices):
+                variable.setInitialValue(1 if j == chosen else 0)
+        return True
+
+    def _read_selection(self, model) -> List[int]:
+        """Chosen grid index per well from the solved variables"""
+        return [
+            int(indices[np.argmax([pulp.value(variable) or 0.0 for variable in row])])
+            for row, indices in zip(model.variables, model.candidates)
+        ]
+
+    def _solve(self, model) -> SolveResult:
+        warm_start = self._apply_mip_start(model)
+        fd, log_path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        try:
+            command = pulp.PULP_CBC_CMD(
+                msg=False,
+                timeLimit=self.options.time_limit,
+                gapRel=self.options.mip_gap,
+                threads=self.options.threads,
+                warmStart=warm_start,
+                logPath=log_path
+            )
+            # SOS sets only reach CBC through the LP file format
+            model.prob.solve(command, use_mps=not self.piecewise_linear)
+            with open(log_path) as f:
+                log = f.read()
+        finally:
+            os.remove(log_path)
+
+        status = pulp.LpStatus[model.prob.status]
+        # CBC reports "Optimal" even when it stopped on a limit with an incumbent
+        if model.prob.sol_status == pulp.LpSolutionIntegerFeasible:
+            status = "Feasible"
+        if status not in ("Optimal", "Feasible"):
+            return SolveResult(status=status)
+
+        selection = self._read_selection(model)
+        objective = float(pulp.value(model.prob.objective))
+        match = self._BOUND_PATTERN.search(log)
+        best_bound = float(match.group(1)) if match else objective
+        return SolveResult(status=status, objective=objective, best_bound=best_bound, selection=selection)
+
+
+class PiecewiseLinearBackend(CbcBackend):
+    """Each well's curve as a few breakpoints joined by SOS2 weights, solved by CBC.
+
+    A well costs one continuous weight per breakpoint instead of one binary per grid
+    point. The continuous gas of each well is snapped down to the best admissible
+    candidate at or below it, so the allocation stays on the grid and within the
+    budget; the reported objective is that allocation's true production. Adding the
+    breakpoints' largest interpolation error of every well to CBC's bound keeps the
+    best bound valid for the grid problem, and the allocation is reported Feasible
+    unless that bound proves it optimal.
+    """
+    name = "sos2"
+    piecewise_linear = True
+
+    def _apply_mip_start(self, model) -> bool:
+        """Greedy or previous allocation as breakpoint weights: same gas, interpolated"""
+        start = model.warm_start
+        if start is None:
+            start = GreedyAllocator(model.q_gl, model.q_fluid_wells, model.qgl_min,
+                                    model.p_qgl_list, model.candidates).solve(model.available_qgl_total)
+        if start is None or sum(grid[j] for grid, j in zip(model.q_gl_wells, start)) > model.available_qgl_total:
+            return False
+        for row, indices, grid, chosen in zip(model.variables, model.breakpoints, model.q_gl_wells, start):
+            gas = grid[indices]
+            weights = np.zeros(gas.size)
+            k = int(np.clip(np.searchsorted(gas, grid[chosen]), 1, max(gas.size - 1, 1)))
+            if gas.size == 1:
+                weights[0] = 1.0
+            else:
+                share = np.clip((grid[chosen] - gas[k - 1]) / (gas[k] - gas[k - 1]), 0.0, 1.0)
+                weights[k - 1], weights[k] = 1.0 - share, share
+            for variable, weight in zip(row, weights):
+                variable.setInitialValue(weight)
+        return True
+
+    def _read_selection(self, model) -> List[int]:
+        selection = []
+        for row, breakpoints, candidates, grid, rates, cap in zip(
+                model.variables, model.breakpoints, model.candidates,
+                model.q_gl_wells, model.q_fluid_wells, model.p_qgl_list):
+            well_gas = sum((pulp.value(variable) or 0.0) * grid[j] for variable, j in zip(row, breakpoints))
+            gas = grid[candidates]
+            affordable = candidates[(gas >= model.qgl_min) & (gas <= min(cap, well_gas + 1e-6))]
+            selection.append(int(affordable[np.argmax(np.asarray(rates)[affordable])]))
+        return selection
+
+    def _solve(self, model) -> SolveResult:
+        result = super()._solve(model)
+        if result.selection is not None:
+            result.objective = float(sum(model.q_fluid_wells[i][j] for i, j in enumerate(result.selection)))
+            result.best_bound += float(sum(model.breakpoint_errors))
+            if result.status == "Optimal":
+                # CBC's optimum is the breakpoint model's; the grid allocation is only proven
+                # optimal when the interpolation error leaves no room in the bound
+                result.status = result.bound_status()
+        return result
+
+
+class HighsBackend(SolverBackend):
+    """Sparse array model solved by HiGHS through scipy.optimize.milp.
+
+    scipy does not expose HiGHS' thread count or MIP starts, so ``threads`` is
+    ignored and re-solves reuse the assembled arrays but start cold.
+    """
+    name = "highs"
+    needs_sparse_model = True
+
+    # scipy.optimize.milp status codes mapped to PuLP's status names
+    _STATUS = {0: "Optimal", 1: "Feasible", 2: "Infeasible", 3: "Unbounded", 4: "Not Solved"}
+
+    def _solve(self, model) -> SolveResult:
+        if not model.has_feasible_minimum():
+            return SolveResult(status="Infeasible")
+        options = {}
+        if self.options.time_limit is not None:
+            options["time_limit"] = self.options.time_limit
+        if self.options.mip_gap is not None:
+            options["mip_rel_gap"] = self.options.mip_gap
+        result = optimize.milp(
+            c=model.objective,
+            constraints=model.constraints,
+            integrality=np.ones_like(model.objective),
+            bounds=optimize.Bounds(0, 1),
+            options=options
+        )
+        if result.x is None:
+            status = self._STATUS.get(result.status, "Not Solved")
+            return SolveResult(status="Not Solved" if status == "Feasible" else status)
+
+        selection = [
+            int(indices[np.argmax(values)])
+            for values, indices in zip(model.split_by_well(result.x), model.candidates)
+        ]
+        dual_bound = getattr(result, "mip_dual_bound", None)
+        return SolveResult(
+            status=self._STATUS.get(result.status, "Not Solved"),
+            best_bound=-dual_bound if dual_bound is not None else None,
+            selection=selection
+        )
+
+
+class DynamicProgrammingBackend(SolverBackend):
+    """Internal engine: multiple-choice knapsack DP over a lattice of the gas budget.
+
+    An approximation, not an exact solver: the allocation is exact on the gas
+    lattice only (see DynamicProgrammingAllocator), then improved by a local search on
+    the real gas values (spending what rounding up to the lattice left unused, and
+    moving gas between wells). The best bound
+    comes from a second pass with gas rounded down, a relaxation of the unrounded
+    problem, and the allocation is only reported Optimal when that bound closes
+    the gap.
+    Without a fixed ``gas_resolution`` the lattice is a power of two sized to the
+    budget, and the DP tables are kept per lattice, so re-solves after a change
+    of the total gas limit mostly backtrack existing tables. Time limit, gap and
+    threads do not apply.
+    """
+    name = "dp"
+
+    def __init__(self, options: SolverOptions = None):
+        super().__init__(options)
+        self.allocators = {}
+
+    def _gas_resolution(self, model) -> float:
+        if model.gas_resolution:
+            return model.gas_resolution
+        units = max(model.available_qgl_total, 1.0) / DynamicProgrammingAllocator.DEFAULT_BUDGET_UNITS
+        return float(2.0 ** np.ceil(np.log2(units)))
+
+    def _solve(self, model) -> SolveResult:
+        gas_resolution = self._gas_resolution(model)
+        if gas_resolution not in self.allocators:
+            self.allocators[gas_resolution] = [
+                DynamicProgrammingAllocator(
+                    q_gl=model.q_gl,
+                    q_fluid_wells=model.q_fluid_wells,
+                    qgl_min=model.qgl_min,
+                    p_qgl_list=model.p_qgl_list,
+                    gas_resolution=gas_resolution,
+                    rounding=rounding,
+                    candidates=model.candidates
+                )
+                for rounding in ("ceil", "floor")
+            ]
+        feasible, relaxed = self.allocators[gas_resolution]
+        selection = feasible.solve(model.available_qgl_total)
+        if selection is None:
+            if not model.has_feasible_minimum():
+                return SolveResult(status="Infeasible")
+            # Rounding every well up to the lattice can overshoot a budget just above the
+            # cheapest allocation; that allocation itself still fits
+            selection = model.cheapest_selection()
+        selection = feasible.repair(selection, model.available_qgl_total)
+
+        relaxed.solve(model.available_qgl_total)
+        result = SolveResult(
+            objective=float(sum(model.q_fluid_wells[i][j] for i, j in enumerate(selection))),
+            best_bound=float(relaxed.value_table[relaxed.last_budget_unit]),
+            selection=selection
+        )
+        result.status = result.bound_status()
+        return result
+
+
+class GreedyBackend(SolverBackend):
+    """Fast heuristic: incremental-gain greedy over the concave envelope of each well.
+
+    The allocation is feasible but not necessarily optimal; the best bound is the
+    envelope (LP) bound, so the gap shows how far it can be from the optimum. The
+    envelopes do not depend on the budget and are kept between solves. Time limit,
+    gap and threads do not apply.
+    """
+    name = "greedy"
+
+    def __init__(self, options: SolverOptions = None):
+        super().__init__(options)
+        self.allocator = None
+
+    def _solve(self, model) -> SolveResult:
+        if self.allocator is None:
+            self.allocator = GreedyAllocator(
+                q_gl=model.q_gl,
+                q_fluid_wells=model.q_fluid_wells,
+                qgl_min=model.qgl_min,
+                p_qgl_list=model.p_qgl_list,
+                candidates=model.candidates
+            )
+        selection = self.allocator.solve(model.available_qgl_total)
+        if selection is None:
+            return SolveResult(status="Infeasible")
+        result = SolveResult(
+            objective=self.allocator.objective,
+            best_bound=self.allocator.upper_bound,
+            selection=selection
+        )
+        result.status = result.bound_status()
+        return result
+
+
+class SeparableBackend(SolverBackend):
+    """Closed form for a slack total gas constraint: every well at its own best admissible point.
+
+    The pipelines switch to it when the gas limit covers that allocation, so no
+    model is built. Used with a binding limit it reports "Not Solved".
+    """
+    name = SEPARABLE_SOLVER
+
+    def _solve(self, model) -> SolveResult:
+        allocation = saturated_allocation(
+            model.q_gl, model.q_fluid_wells, model.qgl_min, model.p_qgl_list, model.candidates)
+        if allocation is None:
+            return SolveResult(status="Infeasible")
+        if not allocation.fits(model.available_qgl_total):
+            return SolveResult(status="Not Solved")
+        return SolveResult(
+            status="Optimal",
+            objective=allocation.total_production,
+            best_bound=allocation.total_production,
+            selection=allocation.selection
+        )
+
+
+SOLVER_BACKENDS = {
+    CbcBackend.name: CbcBackend,
+    HighsBackend.name: HighsBackend,
+    DynamicProgrammingBackend.name: DynamicProgrammingBackend,
+    GreedyBackend.name: GreedyBackend,
+    PiecewiseLinearBackend.name: PiecewiseLinearBackend,
+    SeparableBackend.name: SeparableBackend,
+}
+
+
+def get_solver_backend(name: str, options: SolverOptions = None) -> SolverBackend:
+    """Instantiate a registered backend by name"""
+    if name not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver '{name}', expected one of {tuple(SOLVER_BACKENDS)}")
+    return SOLVER_BACKENDS[name](options)
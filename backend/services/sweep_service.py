@@ -0,0 +1,170 @@
+# services/sweep_service.py
+import heapq
+import numpy as np
+from concurrent.futures import Future, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, List, Tuple
+
+
+@dataclass
+class SweepOptions:
+    """Sampling of the global curve between the lower and upper gas limit"""
+    tolerance: float = 2e-3  # Largest accepted chord error, relative to the production range
+    seed_points: int = 6  # Log-spaced limits solved before bisecting
+    min_width: float = 0.01  # Intervals narrower than this share of the range in log gas are not split
+
+
+def solve_inline(evaluate: Callable[[float], Any]) -> Callable[[float], Future]:
+    """Submit-style wrapper around ``evaluate`` that solves each limit right away in this process"""
+    def submit(qgl_limit: float) -> Future:
+        future = Future()
+        future.set_result(evaluate(qgl_limit))
+        return future
+    return submit
+
+
+def adaptive_sweep(submit: Callable[[float], Future],
+                   lower: float,
+                   upper: float,
+                   max_points: int = 40,
+                   options: SweepOptions = None,
+                   workers: int = 1,
+                   score: Callable[[Any], float] = None) -> List[Tuple[float, Any]]:
+    """
+    Sample a non-decreasing production-vs-gas curve where it bends.
+
+    Solves ``seed_points`` log-spaced limits between ``lower`` and ``upper``, then keeps
+    bisecting (at the geometric mean) the intervals whose straight chord is estimated to
+    miss the curve by the most. A bisection measures that error exactly at the new point;
+    its two halves inherit a quarter of it, as for a smooth curve. Sampling stops when no
+    interval is expected to miss by more than ``tolerance`` times the production range,
+    or after ``max_points`` solves.
+
+    Each round bisects up to ``workers`` intervals at once. Workers left over go to the
+    quarter points of those intervals, speculatively; once the midpoint of an interval
+    shows it is already within tolerance, its quarter points still waiting are cancelled.
+    With one worker this is the plain sequential bisection.
+
+    Args:
+        submit: Starts the solve of one gas limit and returns its future
+        lower: Smallest gas limit worth solving (every well at its minimum)
+        upper: Limit from which production no longer grows (every well at its best point)
+        workers: Solves running at the same time
+        score: Total production of a solve result, defaults to the result itself
+
+    Returns:
+        The (gas limit, solve result) pairs completed, ascending in gas limit
+    """
+    options = options or SweepOptions()
+    score = score or (lambda result: result)
+    if upper <= lower:
+        return [(lower, submit(lower).result())]
+
+    results = {}
+    values = {}
+
+    def collect(futures: dict, on_result: Callable[[float], None] = None) -> None:
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            limit = futures[future]
+            results[limit] = future.result()
+            values[limit] = score(results[limit])
+            if on_result is not None:
+                on_result(limit)
+
+    def middle(a: float, b: float) -> float:
+        return float(np.sqrt(a * b))
+
+    def splittable(a: float, b: float) -> bool:
+        # A step in the curve (a well switching on) does not shrink by bisection
+        return np.log(b / a) >= options.min_width * np.log(upper / lower)
+
+    def chord_error(a: float, x: float, b: float) -> float:
+        return abs(values[x] - (values[a] + (values[b] - values[a]) * (x - a) / (b - a)))
+
+    seeds = np.geomspace(lower, upper, max(2, min(max(options.seed_points, workers), max_points)))
+    collect({submit(float(limit)): float(limit) for limit in seeds})
+    span = max(max(values.values()) - min(values.values()), 1e-9)
+    threshold = options.tolerance * span
+
+    # Seed intervals have no measured error yet: each is bisected once before any estimate counts
+    limits = sorted(values)
+    heap = [(-np.inf, a, b) for a, b in zip(limits, limits[1:])]
+    heapq.heapify(heap)
+    while heap and len(values) < max_points:
+        budget = min(workers, max_points - len(values))
+        intervals = []
+        while heap and len(intervals) < budget:
+            negative_error, a, b = heapq.heappop(heap)
+            if -negative_error <= threshold:
+                heap = []
+                break
+            if splittable(a, b):
+                intervals.append((a, b))
+        if not intervals:
+            break
+
+        futures = {submit(middle(a, b)): middle(a, b) for a, b in intervals}
+        speculative = {}  # Interval -> futures of its quarter points
+        for a, b in intervals:
+            m = middle(a, b)
+            for c, d in ((a, m), (m, b)):
+                if len(futures) < budget and splittable(c, d):
+                    future = submit(middle(c, d))
+                    futures[future] = middle(c, d)
+                    speculative.setdefault((a, b), []).append(future)
+
+        def cancel_converged(limit: float) -> None:
+            for (a, b), quarter_futures in speculative.items():
+                if limit == middle(a, b) and chord_error(a, limit, b) / 4 <= threshold:
+                    for future in quarter_futures:
+                        future.cancel()
+
+        collect(futures, cancel_converged)
+
+        for a, b in intervals:
+            m = middle(a, b)
+            if m not in values:
+                continue
+            error = chord_error(a, m, b)
+            for c, d in ((a, m), (m, b)):
+                q = middle(c, d)
+                if q in values:
+                    # Already bisected speculatively: its own measured error replaces the estimate
+                    quarter_error = chord_error(c, q, d)
+                    heapq.heappush(heap, (-quarter_error / 4, c, q))
+                    heapq.heappush(heap, (-quarter_error / 4, q, d))
+                else:
+                    heapq.heappush(heap, (-error / 4, c, d))
+    return sorted(results.items())
+
+
+def thin_curve(gas: np.ndarray, production: np.ndarray, tolerance: float = SweepOptions.tolerance) -> np.ndarray:
+    """
+    Positions worth keeping on a densely sampled production-vs-gas curve, gas ascending.
+
+    Keeps the ends, then adds the point furthest from the chord between two kept
+    neighbours until no chord misses the curve by more than ``tolerance`` times the
+    production range, the criterion the adaptive sweep stops on. Kinks of the concave
+    hull and steps where a well switches on are kept this way when they exceed it;
+    the lattice-sized ones of a smooth curve are not.
+    """
+    gas, production = np.asarray(gas, dtype=float), np.asarray(production, dtype=float)
+    if gas.size <= 2:
+        return np.arange(gas.size)
+    threshold = tolerance * max(production.max() - production.min(), 1e-9)
+    keep = {0, gas.size - 1}
+    stack = [(0, gas.size - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        inner = np.arange(a + 1, b)
+        chord = production[a] + (production[b] - production[a]) * (gas[inner] - gas[a]) / max(gas[b] - gas[a], 1e-12)
+        errors = np.abs(production[inner] - chord)
+        k = int(np.argmax(errors))
+        if errors[k] > threshold:
+            keep.add(int(inner[k]))
+            stack.extend([(a, int(inner[k])), (int(inner[k]), b)])
+    return np.asarray(sorted(keep), dtype=np.int64)
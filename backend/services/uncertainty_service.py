@@ -0,0 +1,272 @@
+# services/uncertainty_service.py
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from backend.services.continuous_allocation_service import CURVE_MODELS
+from backend.services.grid_service import QglGrid, as_well_grids
+
+# Bisection steps on the gas price of each sampled field
+PRICE_ITERATIONS = 48
+
+
+@dataclass
+class MonteCarloOptions:
+    """Sampling and batching of the curve uncertainty analysis"""
+    samples: int = 1000  # Sampled fields, each one allocation
+    seed: Optional[int] = None
+    grid_points: int = 120  # Log-spaced q_gl points every sampled curve is evaluated on, per well
+    batch_size: int = 250  # Sampled fields solved together in one array pass
+    workers: int = 1  # Processes solving batches in parallel
+
+
+@dataclass
+class MonteCarloResult:
+    """Allocations of every sampled field; totals are NaN where the gas limit admits none"""
+    total_production: np.ndarray  # (samples,)
+    total_qgl: np.ndarray  # (samples,)
+    well_qgl: np.ndarray  # (samples, wells)
+    well_production: np.ndarray  # (samples, wells)
+    upper_bound: np.ndarray  # (samples,) Lagrangian dual bound on the sampled field's optimum
+    elapsed_seconds: float = 0.0
+
+    @property
+    def feasible(self) -> np.ndarray:
+        return np.isfinite(self.total_production)
+
+    def to_dict(self, percentiles: Tuple[int, ...] = (10, 50, 90)) -> Dict:
+        """Distributions for the result dict: raw totals plus percentiles of totals and per-well injection"""
+        feasible = self.feasible
+        production = self.total_production[feasible]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap = (self.upper_bound[feasible] - production) / np.abs(self.upper_bound[feasible])
+        return {
+            "samples": int(self.total_production.size),
+            "feasible_samples": int(feasible.sum()),
+            "total_production": production.tolist(),
+            "total_qgl": self.total_qgl[feasible].tolist(),
+            "percentiles": list(percentiles),
+            "total_production_percentiles": np.percentile(production, percentiles).tolist() if production.size else None,
+            "well_qgl_mean": self.well_qgl[feasible].mean(axis=0).tolist() if production.size else None,
+            "well_qgl_percentiles": np.percentile(self.well_qgl[feasible], percentiles, axis=0).T.tolist()
+            if production.size else None,
+            "max_gap": float(np.nanmax(gap)) if gap.size else None,
+            "elapsed_seconds": self.elapsed_seconds
+        }
+
+
+def _spend_leftover(gas: np.ndarray,
+                    oil: np.ndarray,
+                    admissible: np.ndarray,
+                    choice: np.ndarray,
+                    leftover: np.ndarray) -> np.ndarray:
+    """
+    Hand out the gas an allocation leaves unused: each round moves, in every field, the
+    one well that gains the most oil to the best point the unused gas still affords,
+    until no move gains anything. Returns the production of each field.
+    """
+    samples, wells, _ = oil.shape
+    fields = np.arange(samples)
+    well_index = np.arange(wells)
+    current_oil = np.take_along_axis(oil, choice[:, :, np.newaxis], axis=2)[:, :, 0]
+    for _ in range(wells):
+        current = gas[well_index, choice]
+        affordable = admissible & (gas <= (current + leftover[:, np.newaxis])[:, :, np.newaxis])
+        target = np.argmax(np.where(affordable, oil, -np.inf), axis=2)
+        gain = np.take_along_axis(oil, target[:, :, np.newaxis], axis=2)[:, :, 0] - current_oil
+        well = np.argmax(gain, axis=1)
+        moves = gain[fields, well] > 0
+        if not moves.any():
+            break
+        point = np.where(moves, target[fields, well], choice[fields, well])
+        leftover = leftover - (gas[well, point] - current[fields, well])
+        current_oil[fields, well] = oil[fields, well, point]
+        choice[fields, well] = point
+    return current_oil.sum(axis=1)
+
+
+def _allocate_batch(gas: np.ndarray,
+                    oil: np.ndarray,
+                    qgl_min: float,
+                    p_qoil: float,
+                    p_qgl: float,
+                    qgl_limit: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Allocate gas on a batch of sampled fields at once.
+
+    ``gas`` is the (wells x points) grid, ``oil`` the sampled curves on it, shaped
+    (samples x wells x points). MRP caps follow calculate_marginal_analysis. Each field
+    then gets, by bisection over all fields together, the price of gas at which every
+    well picking its point of largest oil - price * gas just fits the limit. That
+    allocation sits on the concave envelope of the curves and leaves some gas unused.
+    It is completed in two ways, keeping the better one per field: spending the unused
+    gas, and starting from the allocation just above the limit, pulling back the one
+    well that loses the least by freeing the excess, then spending what is left.
+
+    Returns:
+        Chosen point per field and well (-1 for infeasible fields) and the dual bound per field
+    """
+    samples, wells, points = oil.shape
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slopes = np.diff(oil, axis=2) / np.diff(gas, axis=1)
+    covers_cost = p_qoil * slopes >= p_qgl
+    last_covering = points - 2 - np.argmax(covers_cost[:, :, ::-1], axis=2)
+    cap = np.where(covers_cost.any(axis=2), last_covering, points - 2)
+    admissible = (gas >= qgl_min) & (np.arange(points) <= cap[:, :, np.newaxis])
+
+    fields = np.arange(samples)
+    well_index = np.arange(wells)
+    cheapest = np.where(admissible, gas, np.inf).min(axis=2).sum(axis=1)
+    feasible = cheapest <= qgl_limit
+
+    def choose(price: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        value = np.where(admissible, oil - price[:, np.newaxis, np.newaxis] * gas, -np.inf)
+        choice = np.argmax(value, axis=2)
+        best = np.take_along_axis(value, choice[:, :, np.newaxis], axis=2)[:, :, 0]
+        return choice, gas[well_index, choice].sum(axis=1), best.sum(axis=1)
+
+    # Past the steepest admissible slope every well sits at its cheapest point
+    steepest = np.where(admissible[:, :, 1:] & admissible[:, :, :-1], slopes, 0.0).max(axis=(1, 2))
+    low, high = np.zeros(samples), np.maximum(steepest, 0.0) * 2 + 1.0
+    _, used, _ = choose(low)
+    slack = used <= qgl_limit
+    high[slack] = 0.0
+    for _ in range(PRICE_ITERATIONS):
+        middle = np.where(slack, 0.0, (low + high) / 2)
+        _, used, _ = choose(middle)
+        fits = used <= qgl_limit
+        high = np.where(fits, middle, high)
+        low = np.where(fits, low, middle)
+    choice, used, dual = choose(high)
+    upper_bound = dual + high * qgl_limit
+    production = _spend_leftover(gas, oil, admissible, choice, qgl_limit - used)
+
+    # Just above the limit: pull back the well whose best point within its gas minus the excess loses least
+    over, over_used, _ = choose(low)
+    excess = over_used - qgl_limit
+    current = gas[well_index, over]
+    current_oil = np.take_along_axis(oil, over[:, :, np.newaxis], axis=2)[:, :, 0]
+    within = admissible & (gas <= (current - excess[:, np.newaxis])[:, :, np.newaxis])
+    target = np.argmax(np.where(within, oil, -np.inf), axis=2)
+    loss = np.where(within.any(axis=2),
+                    current_oil - np.take_along_axis(oil, target[:, :, np.newaxis], axis=2)[:, :, 0], np.inf)
+    well = np.argmin(loss, axis=1)
+    pulled_back = ~slack & np.isfinite(loss[fields, well])
+    over[fields, well] = np.where(pulled_back, target[fields, well], over[fields, well])
+    leftover = qgl_limit - gas[well_index, over].sum(axis=1)
+    alternative = _spend_leftover(gas, oil, admissible, over, np.maximum(leftover, 0.0))
+    better = pulled_back & (alternative > production)
+    choice[better] = over[better]
+
+    choice[~feasible] = -1
+    upper_bound[~feasible] = np.nan
+    return choice, upper_bound
+
+
+def _solve_batch(sampler: "MonteCarloAllocator", seed: np.random.SeedSequence, samples: int,
+                 qgl_limit: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sample one batch of fields and allocate it; module level so a process pool can run it"""
+    oil = sampler.sample_curves(np.random.default_rng(seed), samples)
+    choice, upper_bound = _allocate_batch(sampler.gas, oil, sampler.qgl_min, sampler.p_qoil,
+                                          sampler.p_qgl, qgl_limit)
+    return oil, choice, upper_bound
+
+
+class MonteCarloAllocator:
+    """
+    Allocation under curve uncertainty.
+
+    Every well's fitted (a, b, c, d, e) is drawn from a normal distribution with the
+    fit's covariance; the sampled fluid curves, times (1 - wct), give one sampled field
+    per draw. Fields are evaluated on a coarse log grid per well and allocated in
+    batches, each batch one array pass of the bisection in _allocate_batch, so a few
+    thousand fields take seconds. Batches are independent and run in a process pool
+    when ``workers`` > 1; each has its own seed, so results do not depend on the pool.
+    """
+
+    def __init__(self,
+                 q_gl: QglGrid,
+                 params_list: List[np.ndarray],
+                 covariance_list: List[np.ndarray],
+                 wct_list: List[float],
+                 qgl_min: float,
+                 p_qoil: float,
+                 p_qgl: float,
+                 model_name: str = "namdar",
+                 bounds: Tuple[List[float], List[float]] = None,
+                 options: MonteCarloOptions = None):
+        """
+        Args:
+            q_gl: Gas lift grid of the fit, shared or one per well; only its range is used
+            params_list: Fitted (a, b, c, d, e) of the fluid curve of each well
+            covariance_list: 5x5 covariance of those parameters for each well
+            wct_list: Water cut of each well
+            qgl_min: Minimum gas rate allowed to inject to a well
+            p_qoil: Oil price, for the MRP caps of each sampled field
+            p_qgl: Gas cost, for the MRP caps of each sampled field
+            model_name: Curve model the parameters belong to, a key of CURVE_MODELS
+            bounds: (lower, upper) bounds of the fit; draws are clipped to them, so a
+                parameter the data barely determines cannot leave the fitted model family
+            options: Sample count, seed, grid resolution, batch size and workers
+        """
+        if model_name not in CURVE_MODELS:
+            raise ValueError(f"Unknown model '{model_name}', expected one of {tuple(CURVE_MODELS)}")
+        self.options = options or MonteCarloOptions()
+        self.params = np.asarray(params_list, dtype=float)
+        self.covariances = np.asarray(covariance_list, dtype=float)
+        self.oil_fraction = 1 - np.asarray(wct_list, dtype=float)
+        self.qgl_min = qgl_min
+        self.p_qoil = p_qoil
+        self.p_qgl = p_qgl
+        self.model_name = model_name
+        self.bounds = (np.full(5, -np.inf), np.full(5, np.inf)) if bounds is None else \
+            tuple(np.asarray(bound, dtype=float) for bound in bounds)
+        grids = as_well_grids(q_gl, len(self.params))
+        self.gas = np.stack([np.geomspace(max(grid[0], 1e-10), grid[-1], self.options.grid_points)
+                             for grid in grids])
+        # Square roots of the covariances (by eigendecomposition, they may be singular)
+        eigenvalues, eigenvectors = np.linalg.eigh(self.covariances)
+        self.factors = eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None))[:, np.newaxis, :]
+
+    def sample_curves(self, rng: np.random.Generator, samples: int) -> np.ndarray:
+        """Oil rates of ``samples`` sampled fields on the per-well grids, shaped (samples, wells, points)"""
+        noise = rng.standard_normal((samples, *self.params.shape))
+        params = np.clip(self.params + np.einsum("wij,swj->swi", self.factors, noise), *self.bounds)
+        curve = CURVE_MODELS[self.model_name][0]
+        fluid = curve(self.gas, np.moveaxis(params, 2, 0)[..., np.newaxis])
+        return np.maximum(fluid, 0) * self.oil_fraction[:, np.newaxis]
+
+    def run(self, qgl_limit: float) -> MonteCarloResult:
+        """Allocate ``qgl_limit`` on every sampled field"""
+        start = time.perf_counter()
+        batch_size = max(1, self.options.batch_size)
+        sizes = [min(batch_size, self.options.samples - first)
+                 for first in range(0, self.options.samples, batch_size)]
+        seeds = np.random.SeedSequence(self.options.seed).spawn(len(sizes))
+        if self.options.workers > 1 and len(sizes) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.options.workers, len(sizes))) as pool:
+                batches = list(pool.map(_solve_batch, [self] * len(sizes), seeds, sizes,
+                                        [qgl_limit] * len(sizes)))
+        else:
+            batches = [_solve_batch(self, seed, size, qgl_limit) for seed, size in zip(seeds, sizes)]
+
+        wells = np.arange(len(self.params))
+        well_qgl, well_production, upper_bound = [], [], []
+        for oil, choice, bound in batches:
+            rows = np.arange(choice.shape[0])[:, np.newaxis]
+            infeasible = (choice < 0).any(axis=1)
+            gas = np.where(infeasible[:, np.newaxis], np.nan, self.gas[wells, choice])
+            well_qgl.append(gas)
+            well_production.append(np.where(infeasible[:, np.newaxis], np.nan, oil[rows, wells, choice]))
+            upper_bound.append(bound)
+        well_qgl = np.concatenate(well_qgl)
+        well_production = np.concatenate(well_production)
+        return MonteCarloResult(
+            total_production=well_production.sum(axis=1),
+            total_qgl=well_qgl.sum(axis=1),
+            well_qgl=well_qgl,
+            well_production=well_production,
+            upper_bound=np.concatenate(upper_bound),
+            elapsed_seconds=time.perf_counter() - start
+        )
@@ -0,0 +1,127 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.services.continuous_allocation_service import CURVE_MODELS
+from backend.services.fitting_service import FittingService
+from backend.services.grid_service import as_well_grids
+from backend.services.optimization_model_service import OptimizationModel
+from backend.services.solver_backend_service import SolverOptions
+
+# Namdar parameters (a, b, c, d, e) of four wells whose fluid rate peaks inside the grid
+PARAMS = np.array([
+    [0.0, -2.0, 20.0, 5.0, 0.0],
+    [0.0, -1.8, 18.0, 3.0, 0.0],
+    [0.0, -1.6, 22.0, 4.0, 0.0],
+    [0.0, -2.2, 19.0, 2.0, 0.0],
+])
+WCT = np.array([0.2, 0.5, 0.3, 0.4])
+GRID = np.linspace(1.0, 1500.0, 151)
+
+# Gas limits between every well at its minimum and every well at its peak
+BINDING_LIMITS = (150.0, 700.0, 2000.0)
+# Gas limits of the rugged field, from a few wells near their knee to most wells past it
+RUGGED_LIMITS = (2000.0, 5000.0, 10000.0)
+
+
+class Field:
+    """Small synthetic field: oil rates of the namdar curves on a shared grid"""
+
+    def __init__(self):
+        curve = CURVE_MODELS["namdar"][0]
+        self.params = PARAMS
+        self.wct = WCT
+        self.q_gl = GRID
+        self.q_oil = [(1 - wct) * np.maximum(curve(GRID, params), 0) for params, wct in zip(PARAMS, WCT)]
+        self.caps = [float(GRID[-1])] * len(PARAMS)
+
+    @property
+    def wells(self) -> int:
+        return len(self.q_oil)
+
+    def gas(self, selection) -> float:
+        """Total gas of an allocation given as grid indices"""
+        return float(sum(grid[j] for grid, j in zip(as_well_grids(self.q_gl, self.wells), selection)))
+
+    def solve(self, solver: str, qgl_limit: float, qgl_min: float = 1.0, candidates=None,
+              solver_options: SolverOptions = None, gas_resolution: float = None,
+              caps=None) -> OptimizationModel:
+        """Build and solve one model of this field, by default capped at the end of the grid"""
+        model = OptimizationModel(self.q_gl, self.q_oil, qgl_limit, qgl_min, caps or self.caps, solver=solver,
+                                  gas_resolution=gas_resolution, solver_options=solver_options,
+                                  candidates=candidates)
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        model.solve_prob()
+        return model
+
+
+class RuggedField(Field):
+    """Thirty wells on irregular grids of their own: gas rates fall off any lattice,
+    so the DP has to round them and the four-well field cannot show what that costs"""
+
+    def __init__(self, wells: int = 30, points: int = 40, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.q_gl = [np.sort(rng.uniform(1.0, 1000.0, points)) for _ in range(wells)]
+        self.q_oil = [rng.uniform(200.0, 900.0) * (1 - np.exp(-grid / rng.uniform(150.0, 500.0)))
+                      - rng.uniform(0.0, 1e-4) * grid ** 2 for grid in self.q_gl]
+        self.caps = [1000.0] * wells
+
+
+class FittedField(Field):
+    """The namdar wells tested at ten rates up to ``tested_max`` each, fitted on ``grid_mode`` grids"""
+
+    def __init__(self, tested_max, grid_mode: str = "per_well"):
+        curve = CURVE_MODELS["namdar"][0]
+        self.params = PARAMS
+        self.wct = WCT
+        self.tested_max = [float(top) for top in tested_max]
+        q_gl_tests = [np.linspace(50.0, top, 10) for top in self.tested_max]
+        fit = FittingService(q_gl_tests, [curve(q_gl, params) for q_gl, params in zip(q_gl_tests, PARAMS)],
+                             list(WCT), grid_mode=grid_mode, grid_points=200).perform_fitting_group()
+        self.q_gl = fit["q_gl_common_range"]
+        self.q_oil = [np.asarray(rates) for rates in fit["q_oil_rates_list"]]
+        self.caps = [max(self.tested_max)] * len(PARAMS)
+
+
+def optima_of(field: Field):
+    """CBC's optimum of a field for every limit and qgl_min asked for, solved once"""
+    optima = {}
+
+    def optimum(qgl_limit: float, qgl_min: float = 1.0) -> float:
+        if (qgl_limit, qgl_min) not in optima:
+            optima[qgl_limit, qgl_min] = field.solve("milp", qgl_limit, qgl_min).solve_result
+        return optima[qgl_limit, qgl_min]
+    return optimum
+
+
+@pytest.fixture(scope="session")
+def field() -> Field:
+    return Field()
+
+
+@pytest.fixture(scope="session")
+def cbc(field):
+    """CBC's optimum for every binding limit and qgl_min the tests use"""
+    return optima_of(field)
+
+
+@pytest.fixture(scope="session")
+def per_well() -> FittedField:
+    """Wells tested up to 600, 900, 1200 and 1500 Mscf, each on a grid ending at its last test"""
+    return FittedField((600.0, 900.0, 1200.0, 1500.0))
+
+
+@pytest.fixture(scope="session")
+def rugged() -> RuggedField:
+    return RuggedField()
+
+
+@pytest.fixture(scope="session")
+def rugged_cbc(rugged):
+    return optima_of(rugged)
@@ -0,0 +1,73 @@
+import pytest
+
+from backend.services.allocation_dp_service import DynamicProgrammingAllocator
+from conftest import BINDING_LIMITS, RUGGED_LIMITS
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_dp_matches_cbc(field, cbc, qgl_limit):
+    result = field.solve("dp", qgl_limit).solve_result
+    reference = cbc(qgl_limit)
+
+    assert field.gas(result.selection) <= qgl_limit + 1e-9
+    assert result.objective <= reference.objective + 1e-6
+    assert result.best_bound >= reference.objective - 1e-6
+    if result.status == "Optimal":
+        assert result.objective == pytest.approx(reference.objective, rel=1e-6)
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_coarse_lattice_is_not_reported_optimal(field, cbc, qgl_limit):
+    # 37 Mscf units do not divide the 10 Mscf grid: rounding up leaves gas the DP cannot see
+    result = field.solve("dp", qgl_limit, gas_resolution=37.0).solve_result
+    reference = cbc(qgl_limit)
+
+    assert result.objective <= reference.objective + 1e-6
+    assert result.best_bound >= reference.objective - 1e-6
+    assert result.status == result.bound_status()
+    assert (result.status == "Optimal") == (result.gap <= 1e-9)
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_repair_never_loses_production(field, qgl_limit):
+    allocator = DynamicProgrammingAllocator(field.q_gl, field.q_oil, 1.0, field.caps, gas_resolution=37.0)
+    selection = allocator.solve(qgl_limit)
+    repaired = allocator.repair(selection, qgl_limit)
+
+    production = lambda chosen: sum(rates[j] for rates, j in zip(field.q_oil, chosen))
+    assert production(repaired) >= production(selection)
+    assert field.gas(repaired) <= qgl_limit + 1e-9
+
+
+def test_upper_bounds_hold_the_optimum(field, cbc):
+    allocator = DynamicProgrammingAllocator(field.q_gl, field.q_oil, 1.0, field.caps, gas_resolution=37.0)
+    bounds = allocator.upper_bounds()
+    for qgl_limit in BINDING_LIMITS:
+        unit = min(allocator.budget_units(qgl_limit), bounds.size - 1)
+        assert bounds[unit] >= cbc(qgl_limit).objective - 1e-6
+
+
+def test_dp_respects_qgl_min(field, cbc):
+    qgl_min, qgl_limit = 200.0, 1200.0
+    result = field.solve("dp", qgl_limit, qgl_min).solve_result
+
+    assert all(field.q_gl[j] >= qgl_min for j in result.selection)
+    assert result.objective <= cbc(qgl_limit, qgl_min).objective + 1e-6
+    assert field.solve("dp", qgl_min * field.wells - 1.0, qgl_min).solve_result.status == "Infeasible"
+
+
+@pytest.mark.parametrize("qgl_limit", RUGGED_LIMITS)
+def test_rugged_field_keeps_the_lattice_gap_honest(rugged, rugged_cbc, qgl_limit):
+    result = rugged.solve("dp", qgl_limit).solve_result
+    reference = rugged_cbc(qgl_limit)
+
+    assert rugged.gas(result.selection) <= qgl_limit + 1e-9
+    assert result.objective <= reference.objective + 1e-6
+    assert result.best_bound >= reference.objective - 1e-6
+    # Rounded off-lattice gas leaves a gap the DP cannot close, so it must not claim the optimum
+    assert result.status == result.bound_status() == "Feasible"
+
+
+def test_rugged_field_dp_falls_short_of_cbc(rugged, rugged_cbc):
+    # At 5000 Mscf the lattice misses CBC's allocation by more than a barrel
+    assert rugged.solve("dp", 5000.0).solve_result.objective < rugged_cbc(5000.0).objective - 1.0
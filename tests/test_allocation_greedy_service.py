@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from backend.services.allocation_greedy_service import GreedyAllocator
+from conftest import BINDING_LIMITS, RUGGED_LIMITS
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_greedy_against_cbc(field, cbc, qgl_limit):
+    result = field.solve("greedy", qgl_limit).solve_result
+    optimum = cbc(qgl_limit).objective
+
+    assert field.gas(result.selection) <= qgl_limit + 1e-9
+    assert result.objective <= optimum + 1e-6
+    # The LP-relaxation bound holds the optimum; the status follows the gap to it
+    assert result.best_bound >= optimum - 1e-6
+    assert result.status == result.bound_status()
+
+
+def test_greedy_respects_qgl_min(field, cbc):
+    qgl_min = 200.0
+    result = field.solve("greedy", 1200.0, qgl_min).solve_result
+
+    assert all(field.q_gl[j] >= qgl_min for j in result.selection)
+    assert result.objective <= cbc(1200.0, qgl_min).objective + 1e-6
+    assert result.best_bound >= cbc(1200.0, qgl_min).objective - 1e-6
+    assert field.solve("greedy", qgl_min * field.wells - 1.0, qgl_min).solve_result.status == "Infeasible"
+
+
+@pytest.mark.parametrize("qgl_limit", RUGGED_LIMITS)
+def test_greedy_bound_holds_on_the_rugged_field(rugged, rugged_cbc, qgl_limit):
+    result = rugged.solve("greedy", qgl_limit).solve_result
+    optimum = rugged_cbc(qgl_limit).objective
+
+    assert rugged.gas(result.selection) <= qgl_limit + 1e-9
+    assert optimum - 1e-6 <= result.best_bound
+    assert result.objective <= optimum + 1e-6
+
+
+# Two wells on a 10 Mscf grid: A gains 10 then 5 bbl per Mscf, B gains 8 on both steps
+STEP_GRID = np.array([0.0, 10.0, 20.0])
+STEP_RATES = [np.array([0.0, 100.0, 150.0]), np.array([0.0, 80.0, 160.0])]
+
+
+@pytest.mark.parametrize("budget, selection, objective, upper_bound", [
+    (15.0, [1, 0], 100.0, 140.0),  # A's steeper step goes first; B's half step only enters the bound
+    (25.0, [1, 1], 180.0, 220.0),
+    (30.0, [1, 2], 260.0, 260.0),  # Both of B's steps outrank A's second
+    (40.0, [2, 2], 310.0, 310.0),
+])
+def test_greedy_takes_the_steepest_step_first(budget, selection, objective, upper_bound):
+    allocator = GreedyAllocator(STEP_GRID, STEP_RATES, 0.0, [20.0, 20.0])
+
+    assert allocator.solve(budget) == selection
+    assert allocator.objective == pytest.approx(objective)
+    assert allocator.upper_bound == pytest.approx(upper_bound)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from backend.services.allocation_index_service import AllocationIndex, AllocationIndexStore
+from conftest import BINDING_LIMITS
+
+
+@pytest.fixture(scope="module")
+def index(field):
+    return AllocationIndex.build(field.q_gl, field.q_oil, 1.0, field.caps)
+
+
+def test_frontier_is_increasing(index):
+    assert index.breakpoints > 2
+    assert np.all(np.diff(index.total_qgl) > 0)
+    assert np.all(np.diff(index.total_production) > 0)
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_answers_against_cbc(field, cbc, index, qgl_limit):
+    selection = index.query(qgl_limit)
+    optimum = cbc(qgl_limit).objective
+    production = sum(rates[j] for rates, j in zip(field.q_oil, selection))
+
+    assert field.gas(selection) <= qgl_limit + 1e-9
+    assert production <= optimum + 1e-6
+    assert index.bound(qgl_limit) >= optimum - 1e-6
+    assert production == pytest.approx(optimum, rel=1e-2)
+
+
+def test_qgl_min(field):
+    qgl_min = 200.0
+    index = AllocationIndex.build(field.q_gl, field.q_oil, qgl_min, field.caps)
+
+    assert index.query(qgl_min * field.wells - 1.0) is None
+    assert all(field.q_gl[j] >= qgl_min for j in index.query(1200.0))
+
+
+def test_store_round_trips_through_disk(field, tmp_path, capsys):
+    store = AllocationIndexStore(cache_dir=tmp_path)
+    built = store.get_or_build(field.q_gl, field.q_oil, 1.0, field.caps, "exact")
+    reopened = AllocationIndexStore(cache_dir=tmp_path)
+    loaded = reopened.get_or_build(field.q_gl, field.q_oil, 1.0, field.caps, "exact")
+
+    assert store.stats["misses"] == 1
+    assert reopened.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
+    np.testing.assert_array_equal(loaded.selection, built.selection)
+    np.testing.assert_array_equal(loaded.bound_table, built.bound_table)
+    assert loaded.bound(700.0) == built.bound(700.0)
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from backend.services.allocation_separable_service import SEPARABLE_SOLVER, saturated_allocation
+
+
+def test_slack_limit_is_every_well_at_its_best_point(field, cbc):
+    qgl_limit = 10000.0
+    saturated = saturated_allocation(field.q_gl, field.q_oil, 1.0, field.caps)
+    result = field.solve(SEPARABLE_SOLVER, qgl_limit).solve_result
+
+    assert saturated.fits(qgl_limit)
+    assert result.status == "Optimal"
+    assert result.selection == [int(np.argmax(rates)) for rates in field.q_oil]
+    assert result.objective == pytest.approx(cbc(qgl_limit).objective, rel=1e-9)
+
+
+def test_binding_limit_does_not_fit(field):
+    saturated = saturated_allocation(field.q_gl, field.q_oil, 1.0, field.caps)
+
+    assert not saturated.fits(700.0)
+
+
+def test_caps_and_qgl_min(field):
+    qgl_min, caps = 200.0, [300.0, 400.0, 500.0, 600.0]
+    saturated = saturated_allocation(field.q_gl, field.q_oil, qgl_min, caps)
+    gas = [field.q_gl[j] for j in saturated.selection]
+
+    assert all(qgl_min <= qgl <= cap for qgl, cap in zip(gas, caps))
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pytest
+
+from backend.services.cache_service import DiskBackedCache, FittingCache, OptimizationResultCache
+from backend.services.fitting_service import FittingService
+from backend.services.optimization_global_pipeline_service import OptimizationGlobalPipelineService
+from conftest import WCT
+
+
+def run_global(field, cache, **settings):
+    settings = dict(dict(qgl_min=1.0, p_qoil=70.0, p_qgl=1.0, solver="dp", max_iterations=8), **settings)
+    return OptimizationGlobalPipelineService(field.q_gl, field.q_oil, result_cache=cache, **settings).run()
+
+
+def test_repeated_run_is_served_from_cache(field, capsys):
+    cache = OptimizationResultCache()
+    first = run_global(field, cache)
+    second = run_global(field, cache)
+
+    assert not first["instrumentation"]["cache_hit"]
+    assert second["instrumentation"]["cache_hit"]
+    assert second["total_production"] == first["total_production"]
+    assert cache.stats == {"hits": 1, "misses": 1}
+    # A hit is reported through instrumentation only
+    assert capsys.readouterr().out == ""
+
+
+def test_changed_setting_misses(field):
+    cache = OptimizationResultCache()
+    run_global(field, cache)
+    changed = run_global(field, cache, qgl_min=100.0)
+
+    assert not changed["instrumentation"]["cache_hit"]
+    assert min(changed["total_qgl"]) >= 100.0 * field.wells - 1e-9
+
+
+def test_worker_count_does_not_change_the_key(field):
+    # Pooled and serial sweeps give the same result, so either may serve the other
+    cache = OptimizationResultCache()
+    serial = run_global(field, cache, solver="highs", max_iterations=4, workers=1)
+    pooled = run_global(field, cache, solver="highs", max_iterations=4, workers=2)
+
+    assert pooled["instrumentation"]["cache_hit"]
+    assert pooled["total_production"] == serial["total_production"]
+
+
+def fitting_service(wct=WCT, model_name: str = "namdar") -> FittingService:
+    """Four wells tested at eight rates each"""
+    q_gl = np.linspace(50.0, 1500.0, 8)
+    q_fluid = [400.0 * (1 - np.exp(-q_gl / scale)) for scale in (200.0, 300.0, 400.0, 500.0)]
+    return FittingService([q_gl] * 4, q_fluid, list(wct), model_name=model_name, grid_points=100)
+
+
+def test_fit_is_served_from_memory_then_disk(tmp_path):
+    cache = FittingCache(cache_dir=tmp_path)
+    first = cache.get_or_fit(fitting_service())
+    again = cache.get_or_fit(fitting_service())
+    reopened = FittingCache(cache_dir=tmp_path)
+    from_disk = reopened.get_or_fit(fitting_service())
+
+    assert again is first
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+    assert reopened.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
+    for params, cached in zip(first["params_list"], from_disk["params_list"]):
+        np.testing.assert_array_equal(params, cached)
+
+
+@pytest.mark.parametrize("changed", [
+    dict(wct=[0.2, 0.5, 0.3, 0.5]),
+    dict(model_name="dan"),
+])
+def test_changed_wct_or_model_misses(tmp_path, changed):
+    cache = FittingCache(cache_dir=tmp_path)
+    cache.get_or_fit(fitting_service())
+    cache.get_or_fit(fitting_service(**changed))
+
+    assert cache.key(fitting_service()) != cache.key(fitting_service(**changed))
+    assert cache.stats["misses"] == 2
+    assert len(list(tmp_path.glob("*.pkl"))) == 2
+
+
+def test_format_version_bump_ignores_old_entries(tmp_path, monkeypatch):
+    FittingCache(cache_dir=tmp_path).get_or_fit(fitting_service())
+    monkeypatch.setattr(FittingCache, "FORMAT_VERSION", FittingCache.FORMAT_VERSION + 1)
+    cache = FittingCache(cache_dir=tmp_path)
+    cache.get_or_fit(fitting_service())
+
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 0, "misses": 1}
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = DiskBackedCache(cache_dir=tmp_path, max_disk_bytes=2500)
+    payload = bytes(1000)  # About 1 kB per pickle, so two entries fit
+    for age, key in enumerate(("a", "b")):
+        cache.put(key, payload)
+        os.utime(tmp_path / f"{key}.pkl", (1000.0 + age, 1000.0 + age))
+    # Reading "a" from disk marks it as used, which leaves "b" the oldest
+    assert DiskBackedCache(cache_dir=tmp_path).get("a") == payload
+    cache.put("c", payload)
+
+    assert sorted(path.stem for path in tmp_path.glob("*.pkl")) == ["a", "c"]
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.pkl")) <= cache.max_disk_bytes
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from backend.services.continuous_allocation_service import CURVE_MODELS, LagrangianAllocator
+from backend.services.optimization_model_service import OptimizationModel
+from conftest import BINDING_LIMITS, GRID, PARAMS, WCT
+
+# Shifted down, every curve starts at zero production: the oil-vs-gas envelope jumps
+SHIFTED_PARAMS = PARAMS + np.array([-400.0, 0, 0, 0, 0])
+
+
+def grid_optimum(params, qgl_limit: float, qgl_min: float = 1.0) -> float:
+    """CBC on the grid of the same curves: every grid allocation is a continuous one too"""
+    curve = CURVE_MODELS["namdar"][0]
+    rates = [(1 - wct) * np.maximum(curve(GRID, p), 0) for p, wct in zip(params, WCT)]
+    model = OptimizationModel(GRID, rates, qgl_limit, qgl_min, [GRID[-1]] * len(rates))
+    model.define_optimisation_problem()
+    model.build_objective_function()
+    model.add_constraints()
+    model.solve_prob()
+    return model.solve_result.objective
+
+
+def check(allocation, qgl_limit: float, optimum: float, qgl_min: float = 1.0):
+    assert allocation.total_qgl <= qgl_limit * (1 + 1e-9)
+    assert min(allocation.q_gl) >= qgl_min - 1e-9
+    assert allocation.best_bound >= allocation.total_production
+    # The continuous optimum is at least the grid one, so a valid bound is too
+    assert allocation.best_bound >= optimum - 1e-6
+    if allocation.status == "Optimal":
+        assert allocation.gap <= LagrangianAllocator.GAP_TOLERANCE
+        assert allocation.total_production >= optimum - 1e-6
+    else:
+        assert allocation.status == "Feasible"
+        assert allocation.gap > LagrangianAllocator.GAP_TOLERANCE
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_concave_field_is_optimal(field, cbc, qgl_limit):
+    allocation = LagrangianAllocator(PARAMS, WCT, 1.0, field.caps).solve(qgl_limit)
+
+    check(allocation, qgl_limit, cbc(qgl_limit).objective)
+    assert allocation.status == "Optimal"
+
+
+@pytest.mark.parametrize("qgl_limit", (100.0, 300.0, 600.0, 900.0, 1500.0))
+def test_jumps_are_bounded(qgl_limit):
+    allocation = LagrangianAllocator(SHIFTED_PARAMS, WCT, 1.0, [GRID[-1]] * len(WCT)).solve(qgl_limit)
+
+    check(allocation, qgl_limit, grid_optimum(SHIFTED_PARAMS, qgl_limit))
+
+
+def test_jump_is_reported_feasible():
+    allocation = LagrangianAllocator(SHIFTED_PARAMS, WCT, 1.0, [GRID[-1]] * len(WCT)).solve(300.0)
+
+    assert allocation.status == "Feasible"
+
+
+def test_qgl_min(field, cbc):
+    qgl_min = 200.0
+    allocator = LagrangianAllocator(PARAMS, WCT, qgl_min, field.caps)
+
+    check(allocator.solve(1200.0), 1200.0, cbc(1200.0, qgl_min).objective, qgl_min)
+    assert allocator.solve(qgl_min * len(WCT) - 1.0).status == "Infeasible"
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from backend.services.data_loader_service import DataLoader
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.mark.parametrize("path", sorted(DATA_DIR.glob("data_field*.csv")), ids=lambda path: path.name)
+def test_bundled_fields_load(path):
+    q_gl_list, q_fluid_list, wct_list, names = DataLoader(str(path)).load_data()
+
+    assert len(q_gl_list) == len(q_fluid_list) == len(wct_list) == len(names) - 1 > 0
+    assert [len(q_gl) for q_gl in q_gl_list] == [len(q_fluid) for q_fluid in q_fluid_list]
+    assert all(0.0 <= wct < 1.0 for wct in wct_list)
+
+
+def test_missing_wct_row_reads_as_oil(tmp_path):
+    path = tmp_path / "field.csv"
+    path.write_text("description,,,,\n"
+                    "field,w1,w2,,\n"
+                    "Field001,w1,w2,,\n"
+                    "index,q_gl,q_liquid,q_gl,q_liquid\n"
+                    "1,100,50,200,80\n"
+                    "2,300,90,,\n")
+    q_gl_list, q_fluid_list, wct_list, names = DataLoader(str(path)).load_data()
+
+    assert q_gl_list == [[100.0, 300.0], [200.0]]
+    assert q_fluid_list == [[50.0, 90.0], [80.0]]
+    assert wct_list == [0.0, 0.0]
+    assert names == ["Field001", "w1", "w2"]
+
+
+def test_wct_and_header_rows(tmp_path):
+    path = tmp_path / "field.csv"
+    path.write_text("description,,,,\n"
+                    "field,w1,w2,,\n"
+                    "Field001,w1,w2,,\n"
+                    "wct,0.5,0.25,,\n"
+                    "header,A,B,,\n"
+                    "index,q_gl,q_liquid,q_gl,q_liquid\n"
+                    "1,100,50,200,80\n")
+    loader = DataLoader(str(path))
+
+    assert loader.load_data()[2] == [0.5, 0.25]
+    assert loader.load_well_headers() == ["A", "B"]
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from backend.services.fitting_service import PARALLEL_MIN_WELLS, FittingService
+from conftest import PARAMS, WCT
+
+CURVE_QGL = np.linspace(50.0, 1500.0, 12)
+
+
+def namdar(q_gl, a, b, c, d, e):
+    return a + b * q_gl + c * q_gl ** 0.7 + d * np.log(q_gl) + e * np.exp(-(q_gl ** 0.6))
+
+
+def dan(q_gl, a, b, c, d, e):
+    return a + b * q_gl + c * q_gl ** 0.5 + d * np.log(q_gl) + e * np.exp(-q_gl)
+
+
+def sampled_wells(params_list, noise: float = 5.0, seed: int = 0):
+    """Well tests sampled from known curves, with Gaussian noise on the rates"""
+    rng = np.random.default_rng(seed)
+    q_gl_list = [CURVE_QGL.copy() for _ in params_list]
+    q_fluid_list = [namdar(CURVE_QGL, *params) + rng.normal(0.0, noise, CURVE_QGL.size) for params in params_list]
+    return q_gl_list, q_fluid_list
+
+
+def test_pool_matches_serial_in_well_order():
+    q_gl_list, q_fluid_list = sampled_wells(list(PARAMS) + list(PARAMS[::-1]))
+    # No valid test left after cleaning: the fit raises and this well falls back inside its worker
+    q_gl_list.insert(2, np.array([np.nan, 300.0]))
+    q_fluid_list.insert(2, np.array([500.0, np.inf]))
+    wct_list = [0.5] * len(q_gl_list)
+
+    serial_service = FittingService(q_gl_list, q_fluid_list, wct_list, fitting_method="curve_fit")
+    pooled_service = FittingService(q_gl_list, q_fluid_list, wct_list, fitting_method="curve_fit")
+    serial = serial_service.perform_fitting_group()
+    pooled = pooled_service.perform_fitting_group(parallel=True, max_workers=2)
+
+    assert pooled_service.uses_pool(len(q_gl_list), parallel=True, max_workers=2)
+    for serial_params, pooled_params in zip(serial["params_list"], pooled["params_list"]):
+        np.testing.assert_array_equal(serial_params, pooled_params)
+    assert np.all(pooled["params_list"][2][1:] == 0)
+    for serial_rates, pooled_rates in zip(serial["q_oil_rates_list"], pooled["q_oil_rates_list"]):
+        np.testing.assert_array_equal(serial_rates, pooled_rates)
+
+
+@pytest.mark.parametrize("fitting_method, wells, max_workers, expected", [
+    ("curve_fit", PARALLEL_MIN_WELLS, 2, True),
+    ("curve_fit", PARALLEL_MIN_WELLS - 1, 2, False),
+    ("curve_fit", PARALLEL_MIN_WELLS, 1, False),
+    # The linear fit is always quicker in process
+    ("auto", 50, 8, False),
+])
+def test_pool_only_where_it_pays_off(fitting_method, wells, max_workers, expected):
+    service = FittingService([CURVE_QGL], [CURVE_QGL], [0.0], fitting_method=fitting_method)
+
+    assert service.uses_pool(wells, parallel=True, max_workers=max_workers) is expected
+    assert not service.uses_pool(wells, parallel=False, max_workers=max_workers)
+
+
+# Log-spaced tests reach the low rates where the exponential term of both models matters
+LINEAR_QGL = np.geomspace(1.0, 1500.0, 40)
+
+
+@pytest.mark.parametrize("model_name, curve, params_list", [
+    ("namdar", namdar, [[100.0, -1.5, 25.0, 30.0, 50.0], [20.0, -0.8, 12.0, 60.0, 100.0]]),
+    ("dan", dan, [[80.0, -1.0, 30.0, 20.0, 40.0], [10.0, -0.5, 15.0, 50.0, 120.0]]),
+])
+def test_linear_fit_recovers_known_curves(model_name, curve, params_list):
+    rng = np.random.default_rng(0)
+    q_gl_list = [LINEAR_QGL.copy() for _ in params_list]
+    q_fluid_list = [curve(LINEAR_QGL, *params) + rng.normal(0.0, 2.0, LINEAR_QGL.size) for params in params_list]
+    wct_list = [0.0] * len(params_list)
+    linear = FittingService(q_gl_list, q_fluid_list, wct_list, model_name=model_name).perform_fitting_group()
+    nonlinear = FittingService(q_gl_list, q_fluid_list, wct_list, model_name=model_name,
+                               fitting_method="curve_fit").perform_fitting_group()
+    lower, upper = linear["params_bounds"]
+    sse = lambda params, q_fluid: float(np.sum((curve(LINEAR_QGL, *params) - q_fluid) ** 2))
+
+    for true, params, covariance, curve_fit_params, q_fluid in zip(
+            params_list, linear["params_list"], linear["covariance_list"], nonlinear["params_list"], q_fluid_list):
+        assert np.all((params >= lower) & (params <= upper))
+        # Every parameter within three standard errors of the curve the tests were drawn from
+        assert np.all(np.abs(params - true) <= 3.0 * np.sqrt(np.diag(covariance)))
+        # The bounded linear problem is convex: its solution is at least as good as curve_fit's
+        assert sse(params, q_fluid) <= sse(curve_fit_params, q_fluid) * (1 + 1e-9)
+        assert covariance.shape == (5, 5)
+        np.testing.assert_allclose(covariance, covariance.T)
+        assert np.linalg.eigvalsh(covariance).min() >= -1e-9 * np.abs(covariance).max()
+
+
+def test_linear_fit_holds_parameters_at_their_bound():
+    # A rising linear term is outside b <= 0, so the fit holds b at that bound
+    rng = np.random.default_rng(0)
+    q_fluid = namdar(LINEAR_QGL, 50.0, 0.3, 5.0, 40.0, 30.0) + rng.normal(0.0, 2.0, LINEAR_QGL.size)
+    fit = FittingService([LINEAR_QGL], [q_fluid], [0.0]).perform_fitting_group()
+    params, covariance = fit["params_list"][0], fit["covariance_list"][0]
+
+    active = np.isclose(params, fit["params_bounds"][0]) | np.isclose(params, fit["params_bounds"][1])
+    assert active[1]
+    assert np.all(covariance[active] == 0) and np.all(covariance[:, active] == 0)
+    assert np.all(np.diag(covariance)[~active] > 0)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from conftest import BINDING_LIMITS, FittedField
+
+SOLVERS = ("milp", "highs", "dp", "greedy", "sos2")
+
+
+def test_per_well_grids_end_at_the_last_test(per_well):
+    for grid, top in zip(per_well.q_gl, per_well.tested_max):
+        assert grid[-1] == pytest.approx(top)
+    assert len({grid.size for grid in per_well.q_gl}) == per_well.wells
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS + (4000.0,))
+def test_no_well_gets_more_gas_than_it_was_tested_at(per_well, solver, qgl_limit):
+    model = per_well.solve(solver, qgl_limit)
+    rates = model.get_optimal_injection_rates()
+
+    assert all(qgl <= top + 1e-9 for qgl, top in zip(rates, per_well.tested_max))
+    assert sum(rates) <= qgl_limit + 1e-9
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_coinciding_per_well_grids_match_the_shared_grid(solver):
+    shared = FittedField([1500.0] * 4, grid_mode="common")
+    per_well = FittedField([1500.0] * 4, grid_mode="per_well")
+    for grid in per_well.q_gl:
+        np.testing.assert_array_equal(grid, shared.q_gl)
+
+    for qgl_limit in BINDING_LIMITS:
+        expected = shared.solve(solver, qgl_limit).solve_result
+        result = per_well.solve(solver, qgl_limit).solve_result
+        assert result.status == expected.status
+        assert result.objective == pytest.approx(expected.objective, rel=1e-9)
+        assert list(result.selection) == list(expected.selection)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from backend.services.cache_service import LRUCache
+from backend.services.grid_service import as_well_grids
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+
+# From a cheap gas that leaves every well at its peak to one no well can pay for
+PRICE_PAIRS = ((70.0, 1.0), (50.0, 2.0), (70.0, 20.0), (100.0, 5.0), (1.0, 1000.0))
+
+
+def baseline_caps(q_gl, q_oil_rates_list, p_qoil, p_qgl):
+    """The per-well loop the pipelines ran before the marginal analysis was vectorized"""
+    p_qgl_optim_list, p_qoil_optim_list, cap_indices = [], [], []
+    for well, grid in enumerate(as_well_grids(q_gl, len(q_oil_rates_list))):
+        mrp = p_qoil * (np.diff(q_oil_rates_list[well]) / np.diff(grid))
+        optimal_idx = np.where(mrp >= p_qgl)[0][-1] if any(mrp >= p_qgl) else len(mrp) - 1
+        p_qgl_optim_list.append(grid[:-1][optimal_idx])
+        p_qoil_optim_list.append(q_oil_rates_list[well][optimal_idx])
+        cap_indices.append(optimal_idx)
+    return p_qgl_optim_list, p_qoil_optim_list, cap_indices
+
+
+@pytest.mark.parametrize("p_qoil, p_qgl", PRICE_PAIRS)
+@pytest.mark.parametrize("grids", ("field", "per_well", "rugged"))
+def test_caps_match_the_per_well_loop(request, grids, p_qoil, p_qgl):
+    field = request.getfixturevalue(grids)
+    analysis = calculate_marginal_analysis(field.q_gl, field.q_oil, p_qoil, p_qgl)
+    p_qgl_optim_list, p_qoil_optim_list, cap_indices = baseline_caps(field.q_gl, field.q_oil, p_qoil, p_qgl)
+
+    assert analysis.cap_indices.tolist() == cap_indices
+    assert analysis.p_qgl_optim_list == p_qgl_optim_list
+    assert analysis.p_qoil_optim_list == p_qoil_optim_list
+
+
+def test_ragged_mrp_is_nan_padded(per_well):
+    mrp = calculate_marginal_analysis(per_well.q_gl, per_well.q_oil, 70.0, 1.0).mrp
+
+    assert mrp.shape == (per_well.wells, max(grid.size for grid in per_well.q_gl) - 1)
+    for row, grid in zip(mrp, per_well.q_gl):
+        assert np.all(np.isfinite(row[:grid.size - 1]))
+        assert np.all(np.isnan(row[grid.size - 1:]))
+
+
+def test_cached_analysis_is_reused(field):
+    cache = LRUCache()
+    first = calculate_marginal_analysis(field.q_gl, field.q_oil, 70.0, 1.0, cache)
+
+    assert calculate_marginal_analysis(field.q_gl, field.q_oil, 70.0, 1.0, cache) is first
+    assert calculate_marginal_analysis(field.q_gl, field.q_oil, 70.0, 2.0, cache) is not first
@@ -0,0 +1,75 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from backend.services.multi_header_service import MultiHeaderAllocator
+from conftest import BINDING_LIMITS
+
+HEADERS = ["A", "A", "B", "B"]
+
+
+def header_gas(field, allocation, header: str) -> float:
+    return sum(field.q_gl[j] for j, name in zip(allocation.selection, HEADERS) if name == header)
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_slack_headers_match_cbc(field, cbc, qgl_limit):
+    allocation = MultiHeaderAllocator(field.q_gl, field.q_oil, 1.0, field.caps, HEADERS, {}).solve(qgl_limit)
+    optimum = cbc(qgl_limit).objective
+
+    assert field.gas(allocation.selection) <= qgl_limit + 1e-9
+    assert allocation.best_bound >= optimum - 1e-6
+    assert allocation.objective <= optimum + 1e-6
+    assert allocation.status == "Optimal"
+    assert allocation.objective == pytest.approx(optimum, rel=1e-6)
+
+
+@pytest.mark.parametrize("header_limits", ({"A": 300.0, "B": 500.0}, {"A": 300.0, "B": None}))
+def test_headers_stay_within_their_limits(field, cbc, header_limits):
+    allocation = MultiHeaderAllocator(field.q_gl, field.q_oil, 1.0, field.caps, HEADERS,
+                                      header_limits).solve(700.0)
+
+    for header, limit in header_limits.items():
+        assert header_gas(field, allocation, header) <= (limit or np.inf) + 1e-9
+        assert allocation.headers[header]["total_qgl"] == pytest.approx(header_gas(field, allocation, header))
+    assert field.gas(allocation.selection) <= 700.0 + 1e-9
+    assert allocation.objective <= cbc(700.0).objective + 1e-6
+    assert allocation.best_bound >= allocation.objective
+
+
+def test_bound_and_status_against_enumeration():
+    rng = np.random.default_rng(2)
+    statuses = set()
+    for _ in range(40):
+        grids = [np.sort(rng.uniform(0, 100, 6)) for _ in HEADERS]
+        rates = [np.sort(rng.uniform(0, 50, 6)) for _ in HEADERS]
+        # Limits met exactly by some allocation: lattice rounding decides whether it is found
+        chosen = rng.integers(0, 6, len(HEADERS))
+        gas = [grid[j] for grid, j in zip(grids, chosen)]
+        limits = {name: sum(g for g, header in zip(gas, HEADERS) if header == name) for name in "AB"}
+        allocation = MultiHeaderAllocator(grids, rates, 0.0, [np.inf] * len(HEADERS), HEADERS,
+                                          limits).solve(sum(gas))
+
+        best = -np.inf
+        for selection in itertools.product(range(6), repeat=len(HEADERS)):
+            used = [grid[j] for grid, j in zip(grids, selection)]
+            if all(sum(g for g, header in zip(used, HEADERS) if header == name) <= limit
+                   for name, limit in limits.items()):
+                best = max(best, sum(rate[j] for rate, j in zip(rates, selection)))
+        statuses.add(allocation.status)
+        assert allocation.objective <= best + 1e-9
+        assert allocation.best_bound >= best - 1e-9
+        if allocation.status == "Optimal":
+            assert allocation.objective == pytest.approx(best, rel=1e-9)
+    assert statuses == {"Optimal", "Feasible"}
+
+
+def test_qgl_min(field):
+    qgl_min = 200.0
+    allocator = MultiHeaderAllocator(field.q_gl, field.q_oil, qgl_min, field.caps, HEADERS, {"A": 600.0})
+
+    assert all(field.q_gl[j] >= qgl_min for j in allocator.solve(1200.0).selection)
+    assert allocator.solve(qgl_min * len(HEADERS) - 1.0).status == "Infeasible"
+    assert MultiHeaderAllocator(field.q_gl, field.q_oil, qgl_min, field.caps, HEADERS,
+                                {"A": 2 * qgl_min - 1.0}).solve().status == "Infeasible"
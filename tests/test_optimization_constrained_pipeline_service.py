@@ -0,0 +1,83 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+
+def stand_in(name: str, **attributes) -> None:
+    """Register an empty module for a database dependency that is not installed"""
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+
+# The pipeline imports the Snowflake layer to save its runs; the tests record the saves instead
+stand_in("snowflake")
+stand_in("snowflake.connector")
+stand_in("dotenv", load_dotenv=lambda *args, **kwargs: False)
+
+from backend.services.allocation_index_service import INDEX_SOLVER, AllocationIndexStore
+from backend.services.cache_service import OptimizationResultCache
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.optimization_constrained_pipeline_service import OptimizationConstrainedPipelineService
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    """Record the runs the pipeline saves instead of writing them to the database"""
+    saved = []
+
+    def save(pipeline, results):
+        saved.append(results)
+        return len(saved)
+    monkeypatch.setattr(OptimizationConstrainedPipelineService, "_save_results", save)
+    return saved
+
+
+def make_pipeline(field, **kwargs) -> OptimizationConstrainedPipelineService:
+    kwargs = dict(dict(qgl_limit=700.0, qgl_min=1.0, p_qoil=70.0, p_qgl=1.0, solver="dp"), **kwargs)
+    list_info = ["field"] + [f"well {i + 1}" for i in range(field.wells)]
+    return OptimizationConstrainedPipelineService(field.q_gl, field.q_oil, [], list_info, **kwargs)
+
+
+def test_cache_hit_is_not_saved_again(field, saves):
+    cache = OptimizationResultCache()
+    first = make_pipeline(field, result_cache=cache).run()
+    second = make_pipeline(field, result_cache=cache).run()
+
+    assert len(saves) == 1
+    assert second["instrumentation"]["cache_hit"]
+    assert second["optimization_id"] == first["optimization_id"] == 1
+
+
+def test_second_run_does_not_reuse_the_previous_model(field, saves):
+    pipeline = make_pipeline(field, solver="milp", p_qgl=1.0)
+    pipeline.run()
+    pipeline.update_economic_parameters(p_qgl=20.0)
+    second = pipeline.run()
+
+    # New prices, new MRP caps: the model must be built on them, not on the first run's
+    assert list(pipeline.model.p_qgl_list) == list(second["p_qgl_optim_list"])
+    assert all(qgl <= cap + 1e-9 for (_, qgl), cap in zip(second["results"], second["p_qgl_optim_list"]))
+
+
+@pytest.mark.parametrize("qgl_limit", (150.0, 700.0, 2000.0))
+def test_index_answers_are_bounded(field, saves, tmp_path, capsys, qgl_limit):
+    results = make_pipeline(field, qgl_limit=qgl_limit,
+                            allocation_index=AllocationIndexStore(cache_dir=tmp_path)).run()
+    caps = calculate_marginal_analysis(field.q_gl, field.q_oil, 70.0, 1.0).p_qgl_optim_list
+    optimum = field.solve("milp", qgl_limit, caps=caps).solve_result.objective
+    solver = results["solver"]
+
+    assert solver["name"] == INDEX_SOLVER
+    assert solver["objective"] <= optimum + 1e-6
+    assert solver["best_bound"] >= optimum - 1e-6
+    if solver["status"] == "Optimal":
+        assert solver["objective"] == pytest.approx(optimum, rel=1e-6)
+    else:
+        assert solver["status"] == "Feasible" and solver["gap"] > 0
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.optimization_global_pipeline_service import OptimizationGlobalPipelineService
+
+P_QOIL, P_QGL = 70.0, 1.0
+
+
+def run_pipeline(field, **kwargs) -> dict:
+    kwargs = dict(dict(qgl_min=1.0, p_qoil=P_QOIL, p_qgl=P_QGL), **kwargs)
+    return OptimizationGlobalPipelineService(field.q_gl, field.q_oil, **kwargs).run()
+
+
+@pytest.fixture(scope="module")
+def caps(field):
+    return calculate_marginal_analysis(field.q_gl, field.q_oil, P_QOIL, P_QGL).p_qgl_optim_list
+
+
+def test_frontier_is_thinned(field):
+    results = run_pipeline(field, mode="frontier")
+    production = np.array(results["total_production"])
+
+    # The DP lattice has thousands of breakpoints up to saturation
+    assert 2 < len(results["qgl_limit"]) < 200
+    assert np.all(np.diff(results["qgl_limit"]) > 0)
+    assert np.all(np.diff(production) > 0)
+    assert results["summary"]["total_production"] == production[-1]
+
+
+def test_frontier_points_against_cbc(field, caps):
+    results = run_pipeline(field, mode="frontier")
+    rows = list(zip(results["qgl_limit"], results["total_production"], results["best_bound"],
+                    results["solver_status"]))
+    for qgl_limit, production, best_bound, status in rows[::max(len(rows) // 6, 1)]:
+        optimum = field.solve("milp", qgl_limit, caps=caps).solve_result.objective
+        assert production <= optimum + 1e-6
+        assert best_bound >= optimum - 1e-6
+        if status == "Optimal":
+            assert production == pytest.approx(optimum, rel=1e-6)
+        else:
+            assert status == "Feasible"
+
+
+def test_frontier_respects_qgl_min(field):
+    qgl_min = 100.0
+    results = run_pipeline(field, mode="frontier", qgl_min=qgl_min)
+
+    assert min(results["total_qgl"]) >= qgl_min * field.wells - 1e-9
+    assert all(min(well_gas) >= qgl_min for well_gas in results["well_gas_injection_rates"])
+
+
+@pytest.mark.parametrize("solver", ("milp", "dp"))
+def test_sweep_points_against_cbc(field, caps, solver):
+    results = run_pipeline(field, solver=solver, max_iterations=8)
+
+    for qgl_limit, production, status in zip(results["qgl_limit"], results["total_production"],
+                                             results["solver_status"]):
+        optimum = field.solve("milp", qgl_limit, caps=caps).solve_result.objective
+        assert production <= optimum + 1e-6
+        if status == "Optimal":
+            assert production == pytest.approx(optimum, rel=1e-6)
+
+
+def test_sweep_starts_at_qgl_min_per_well(field):
+    qgl_min = 100.0
+    results = run_pipeline(field, solver="dp", qgl_min=qgl_min, max_iterations=8)
+
+    assert results["qgl_limit"][0] >= qgl_min * field.wells - 1e-9
+    assert all(status in ("Optimal", "Feasible") for status in results["solver_status"])
+
+
+@pytest.mark.parametrize("solver", ("dp", "greedy"))
+def test_fast_solvers_run_in_process(field, solver):
+    pipeline = OptimizationGlobalPipelineService(field.q_gl, field.q_oil, qgl_min=1.0, solver=solver, workers=8)
+
+    assert pipeline.workers == 1
+
+
+def test_pool_defaults_to_the_cpu_count(field, monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 3)
+    pipeline = OptimizationGlobalPipelineService(field.q_gl, field.q_oil, qgl_min=1.0, solver="milp")
+
+    assert pipeline.workers == 3
+
+
+def test_pooled_sweep_matches_serial(field):
+    serial = run_pipeline(field, solver="highs", max_iterations=6, workers=1)
+    pooled = run_pipeline(field, solver="highs", max_iterations=6, workers=2)
+
+    assert pooled["qgl_limit"] == serial["qgl_limit"]
+    assert pooled["total_production"] == pytest.approx(serial["total_production"], rel=1e-9)
@@ -0,0 +1,16 @@
+import pytest
+
+from conftest import BINDING_LIMITS
+
+
+@pytest.mark.parametrize("solver", ("milp", "highs", "dp"))
+def test_resolve_after_limit_change_matches_fresh_solve(field, cbc, solver):
+    model = field.solve(solver, BINDING_LIMITS[0])
+    for qgl_limit in BINDING_LIMITS[1:] + BINDING_LIMITS[:1]:
+        model.update_available_qgl_total(qgl_limit)
+        model.solve_prob()
+        fresh = field.solve(solver, qgl_limit).solve_result
+
+        assert model.solve_result.objective == pytest.approx(fresh.objective, rel=1e-6)
+        assert model.solve_result.objective <= cbc(qgl_limit).objective + 1e-6
+        assert sum(model.get_optimal_injection_rates()) <= qgl_limit + 1e-9
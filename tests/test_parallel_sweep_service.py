@@ -0,0 +1,26 @@
+from multiprocessing import resource_tracker
+
+import numpy as np
+
+from backend.services.parallel_sweep_service import SharedCurves
+
+
+def test_attach_leaves_the_blocks_to_their_creator(field, monkeypatch):
+    registered, unregistered = [], []
+    monkeypatch.setattr(resource_tracker, "register", lambda name, rtype: registered.append(name))
+    monkeypatch.setattr(resource_tracker, "unregister", lambda name, rtype: unregistered.append(name))
+    grids = [field.q_gl[:size] for size in (151, 120, 90, 151)]
+    rates = [q_oil[:grid.size] for q_oil, grid in zip(field.q_oil, grids)]
+    shared = SharedCurves(grids, rates)
+    try:
+        blocks, attached_grids, attached_rates = SharedCurves.attach(shared.spec)
+        for grid, attached in zip(grids + rates, attached_grids + attached_rates):
+            np.testing.assert_array_equal(grid, attached)
+        del attached_grids, attached_rates
+        for block in blocks:
+            block.close()
+        # Only the creating process hands the blocks to the resource tracker
+        assert len(registered) == 2 and not unregistered
+    finally:
+        shared.close()
+    assert sorted(unregistered) == sorted(registered)
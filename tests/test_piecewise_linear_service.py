@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from backend.services.piecewise_linear_service import select_breakpoints
+from backend.services.solver_backend_service import SolverOptions
+from conftest import BINDING_LIMITS
+
+
+@pytest.mark.parametrize("breakpoints", (4, 8))
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_sos2_against_cbc(field, cbc, qgl_limit, breakpoints):
+    result = field.solve("sos2", qgl_limit, solver_options=SolverOptions(breakpoints=breakpoints)).solve_result
+    optimum = cbc(qgl_limit).objective
+
+    assert field.gas(result.selection) <= qgl_limit + 1e-9
+    assert result.objective <= optimum + 1e-6
+    # CBC's bound on the breakpoint model plus the interpolation error holds the grid optimum
+    assert result.best_bound >= optimum - 1e-6
+    if result.status == "Optimal":
+        assert result.objective == pytest.approx(optimum, rel=1e-9)
+    else:
+        assert result.status == "Feasible"
+
+
+def test_sos2_interpolation_error_is_not_optimal(field, cbc):
+    result = field.solve("sos2", 700.0, solver_options=SolverOptions(breakpoints=4)).solve_result
+
+    assert result.objective < cbc(700.0).objective
+    assert result.status == "Feasible"
+
+
+def test_sos2_respects_qgl_min(field):
+    qgl_min = 200.0
+    result = field.solve("sos2", 1200.0, qgl_min).solve_result
+
+    assert all(field.q_gl[j] >= qgl_min for j in result.selection)
+    assert field.gas(result.selection) <= 1200.0 + 1e-9
+
+
+# A piecewise-linear curve sampled every Mscf, with its knots at 0, 3, 7 and 10
+KNOT_GAS = np.arange(11.0)
+KNOT_PRODUCTION = np.interp(KNOT_GAS, [0.0, 3.0, 7.0, 10.0], [0.0, 9.0, 11.0, 4.0])
+
+
+@pytest.mark.parametrize("max_points, tolerance, kept, error", [
+    (None, None, [0, 3, 7, 10], 0.0),  # The knots interpolate the curve exactly, so nothing else is added
+    (3, None, [0, 7, 10], 9.0 - 3.0 * 11.0 / 7.0),  # 7 is missed by 8.2 bbl, 3 by 7.8 on the end-to-end chord
+    (None, 5.0, [0, 7, 10], 9.0 - 3.0 * 11.0 / 7.0),
+    (2, None, [0, 10], 11.0 - 2.8),
+])
+def test_breakpoints_insert_the_worst_missed_point(max_points, tolerance, kept, error):
+    positions, remaining = select_breakpoints(KNOT_GAS, KNOT_PRODUCTION, max_points, tolerance)
+
+    assert positions.tolist() == kept
+    assert remaining == pytest.approx(error)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from backend.services.presolve_service import presolve_candidates
+from conftest import BINDING_LIMITS
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_exact_presolve_keeps_the_optimum(field, cbc, qgl_limit):
+    presolve = presolve_candidates(field.q_gl, field.q_oil, 1.0, field.caps, "exact")
+    result = field.solve("milp", qgl_limit, candidates=presolve.candidates).solve_result
+
+    assert presolve.eliminated_variables > 0
+    assert result.objective == pytest.approx(cbc(qgl_limit).objective, rel=1e-9)
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_envelope_presolve_never_beats_exact(field, cbc, qgl_limit):
+    presolve = presolve_candidates(field.q_gl, field.q_oil, 1.0, field.caps, "envelope")
+    result = field.solve("milp", qgl_limit, candidates=presolve.candidates).solve_result
+
+    assert result.objective <= cbc(qgl_limit).objective + 1e-6
+
+
+def test_candidates_respect_qgl_min_and_caps(field):
+    qgl_min, caps = 200.0, [800.0, 900.0, 1000.0, 1100.0]
+    presolve = presolve_candidates(field.q_gl, field.q_oil, qgl_min, caps, "exact")
+
+    for indices, rates, cap in zip(presolve.candidates, field.q_oil, caps):
+        gas = field.q_gl[indices]
+        assert np.all((gas >= qgl_min) & (gas <= cap))
+        # Kept points are not dominated: each produces more than every cheaper one
+        assert np.all(np.diff(rates[indices]) > 0)
+    assert presolve.to_dict()["eliminated_by_reason"]["below_min"] > 0
+
+
+# Two wells on a 10 Mscf grid, qgl_min 5 and caps of 40 and 30 Mscf
+SMALL_GRID = np.array([0.0, 10.0, 20.0, 30.0, 40.0, 50.0])
+SMALL_RATES = [np.array([0.0, 50.0, 60.0, 60.0, 55.0, 70.0]),  # 30 and 40 Mscf add nothing over 20
+               np.array([0.0, 10.0, 15.0, 50.0, 80.0, 90.0])]  # 20 Mscf sits below the 10-30 chord
+
+
+@pytest.mark.parametrize("mode, candidates, eliminated", [
+    ("exact", [[1, 2], [1, 2, 3]], {"above_cap": 3, "below_min": 2, "dominated": 2}),
+    ("envelope", [[1, 2], [1, 3]], {"above_cap": 3, "below_min": 2, "dominated": 2, "below_envelope": 1}),
+])
+def test_elimination_counts_by_reason(mode, candidates, eliminated):
+    presolve = presolve_candidates(SMALL_GRID, SMALL_RATES, 5.0, [40.0, 30.0], mode)
+
+    assert [indices.tolist() for indices in presolve.candidates] == candidates
+    assert presolve.eliminated == eliminated
+    assert presolve.eliminated_variables == sum(eliminated.values())
+    assert presolve.original_variables == presolve.kept_variables + presolve.eliminated_variables == 12
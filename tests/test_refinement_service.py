@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from backend.services.optimization_model_service import OptimizationModel
+from backend.services.presolve_service import presolve_candidates
+from backend.services.refinement_service import RefinementOptions, refine_allocation
+from backend.services.solver_backend_service import SolveResult
+from conftest import BINDING_LIMITS
+
+
+def refine(field, qgl_limit: float, qgl_min: float = 1.0):
+    def build_model(candidates):
+        model = OptimizationModel(field.q_gl, field.q_oil, qgl_limit, qgl_min, field.caps, solver="milp",
+                                  candidates=candidates)
+        model.define_optimisation_problem()
+        model.build_objective_function()
+        model.add_constraints()
+        return model
+    candidates = presolve_candidates(field.q_gl, field.q_oil, qgl_min, field.caps).candidates
+    return refine_allocation(build_model, candidates, RefinementOptions(coarse_points=10))
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_refinement_against_cbc(field, cbc, qgl_limit):
+    model, report = refine(field, qgl_limit)
+    optimum = cbc(qgl_limit).objective
+
+    assert model.solve_result.objective <= optimum + 1e-6
+    assert model.solve_result.objective == pytest.approx(optimum, rel=1e-3)
+    assert np.all(np.diff(report.objectives) >= -1e-9)
+    assert report.variables[0] < sum(len(rates) for rates in field.q_oil)
+
+
+def test_refinement_respects_qgl_min(field):
+    qgl_min = 200.0
+    model, _ = refine(field, 1200.0, qgl_min)
+
+    assert all(qgl >= qgl_min for qgl in model.get_optimal_injection_rates())
+    assert sum(model.get_optimal_injection_rates()) <= 1200.0 + 1e-9
+
+
+class NearestPoint:
+    """Stand-in model of one well that picks the offered grid index nearest a target"""
+
+    def __init__(self, candidates, target: int, grid: np.ndarray):
+        self.offered = candidates[0]
+        self.target = target
+        self.q_gl_wells = [grid]
+        self.selection = None
+        self.solve_result = None
+
+    def solve_prob(self):
+        chosen = int(self.offered[np.argmin(np.abs(self.offered - self.target))])
+        self.selection = [chosen]
+        self.solve_result = SolveResult("Optimal", -abs(chosen - self.target), None, self.selection, 0.0)
+
+
+def test_refinement_narrows_the_band_around_the_choice():
+    # 100 candidates on every other point of a 5 Mscf grid; the best point is candidate 37
+    grid, candidates = 5.0 * np.arange(200), np.arange(0, 200, 2)
+    offered = []
+
+    def build_model(chosen):
+        offered.append(chosen[0] // 2)  # Back to candidate positions
+        return NearestPoint(chosen, 74, grid)
+
+    model, report = refine_allocation(build_model, [candidates], RefinementOptions(coarse_points=10))
+
+    # Stride 10 with both ends, then +-2 strides around the choice at stride 10 // 4 and 2 // 4
+    assert offered[0].tolist() == list(range(0, 100, 10)) + [99]
+    assert offered[1].tolist() == list(range(20, 61, 2))
+    assert offered[2].tolist() == list(range(32, 41))
+    assert model.selection == [74]
+    assert report.variables == [11, 21, 9]
+    assert report.final_stride == [1]
+    assert report.converged
+
+
+@pytest.mark.parametrize("options, stride", [
+    (RefinementOptions(coarse_points=10), 1),  # Refined down to every candidate
+    (RefinementOptions(coarse_points=50, max_rounds=1), 2),  # Stopped on the coarse grid
+])
+def test_effective_spacing_steps_over_candidates(options, stride):
+    # Candidates are every other point of a 5 Mscf grid, so one candidate step is 10 Mscf
+    grid, candidates = 5.0 * np.arange(200), np.arange(0, 200, 2)
+    _, report = refine_allocation(lambda chosen: NearestPoint(chosen, 74, grid), [candidates], options)
+
+    assert report.final_stride == [stride]
+    assert report.effective_spacing == [pytest.approx(10.0 * stride)]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from backend.services.rolling_horizon_service import RollingHorizonAllocator
+
+LIMITS = (700.0, 150.0, 2000.0, 700.0)
+
+
+@pytest.mark.parametrize("solver", ("milp", "dp", "highs"))
+def test_independent_periods_match_cbc(field, cbc, solver):
+    results = RollingHorizonAllocator(field.q_gl, field.q_oil, 1.0, field.caps, solver).run(LIMITS)
+
+    assert results["rebuilt"] == [True, False, False, False]
+    for qgl_limit, production, total_qgl, status in zip(LIMITS, results["total_production"],
+                                                        results["total_qgl"], results["solver_status"]):
+        optimum = cbc(qgl_limit).objective
+        assert total_qgl <= qgl_limit + 1e-9
+        assert production <= optimum + 1e-6
+        if status == "Optimal":
+            assert production == pytest.approx(optimum, rel=1e-6)
+        else:
+            assert status == "Feasible"
+
+
+@pytest.mark.parametrize("solver", ("milp", "dp"))
+def test_changes_stay_within_max_change(field, cbc, solver):
+    max_change = 120.0
+    initial_qgl = [150.0] * field.wells
+    results = RollingHorizonAllocator(field.q_gl, field.q_oil, 1.0, field.caps, solver, max_change=max_change,
+                                      initial_qgl=initial_qgl).run(LIMITS)
+
+    rates = np.array([initial_qgl] + results["well_gas_injection_rates"])
+    assert np.all(np.abs(np.diff(rates, axis=0)) <= max_change + 1e-9)
+    for qgl_limit, production, total_qgl, status in zip(LIMITS, results["total_production"],
+                                                        results["total_qgl"], results["solver_status"]):
+        if status != "Infeasible":
+            assert total_qgl <= qgl_limit + 1e-9
+            assert production <= cbc(qgl_limit).objective + 1e-6
+
+
+def test_limit_out_of_reach_is_infeasible(field):
+    max_change = 50.0
+    allocator = RollingHorizonAllocator(field.q_gl, field.q_oil, 1.0, field.caps, "dp", max_change=max_change,
+                                        initial_qgl=[400.0] * field.wells)
+    period = allocator.solve_period(150.0)
+
+    assert period.status == "Infeasible"
+    # Every well as low as its window allows
+    assert all(qgl <= 400.0 - max_change + 10.0 for qgl in period.well_qgl)
+    assert all(qgl >= 400.0 - max_change - 1e-9 for qgl in period.well_qgl)
+
+
+def test_qgl_min(field):
+    qgl_min = 200.0
+    results = RollingHorizonAllocator(field.q_gl, field.q_oil, qgl_min, field.caps, "dp").run((1200.0, 900.0))
+
+    assert all(min(rates) >= qgl_min for rates in results["well_gas_injection_rates"])
+    assert results["solver_status"][1] != "Infeasible"
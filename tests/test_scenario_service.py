@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.scenario_service import SCENARIO_COLUMNS, ScenarioEngine
+from conftest import BINDING_LIMITS
+
+P_QOIL_VALUES, P_QGL_VALUES = (50.0, 70.0), (1.0, 2.0)
+
+
+def run(field, solver: str, qgl_limits=BINDING_LIMITS, qgl_min: float = 1.0):
+    return ScenarioEngine(field.q_gl, field.q_oil, qgl_min, solver).run(P_QOIL_VALUES, P_QGL_VALUES, qgl_limits)
+
+
+def test_table_layout(field):
+    table = run(field, "dp")
+
+    assert list(table.columns) == SCENARIO_COLUMNS
+    assert len(table) == len(P_QOIL_VALUES) * len(P_QGL_VALUES) * len(BINDING_LIMITS)
+    assert np.allclose(table["net_revenue"], table["oil_revenue"] - table["gas_cost"])
+
+
+@pytest.mark.parametrize("solver", ("milp", "dp"))
+def test_scenarios_against_cbc(field, solver):
+    table = run(field, solver)
+
+    for row in table.itertuples():
+        caps = calculate_marginal_analysis(field.q_gl, field.q_oil, row.p_qoil, row.p_qgl).p_qgl_optim_list
+        optimum = field.solve("milp", row.qgl_limit, caps=caps).solve_result.objective
+        assert row.total_qgl <= row.qgl_limit + 1e-9
+        assert row.total_production <= optimum + 1e-6
+        if row.solver_status == "Optimal":
+            assert row.total_production == pytest.approx(optimum, rel=1e-6)
+        else:
+            assert row.solver_status == "Feasible"
+
+
+def test_infeasible_limits_are_nan(field):
+    qgl_min = 200.0
+    table = run(field, "dp", qgl_limits=(qgl_min * field.wells - 1.0, 2000.0), qgl_min=qgl_min)
+    short = table[table["qgl_limit"] < qgl_min * field.wells]
+
+    assert (short["solver_status"] == "Infeasible").all()
+    assert short["total_production"].isna().all()
+    assert table.loc[table["qgl_limit"] == 2000.0, "total_production"].notna().all()
+
+
+def test_price_pairs_with_the_same_ratio_share_a_case(field):
+    engine = ScenarioEngine(field.q_gl, field.q_oil, 1.0, "dp")
+    table = engine.run((50.0, 100.0), (1.0, 2.0), BINDING_LIMITS)
+
+    # 50/1 and 100/2 give the same caps; 50/2 and 100/1 each need their own
+    assert engine.instrumentation["price_cases"] == 3
+    cheap = table[(table["p_qoil"] == 50.0) & (table["p_qgl"] == 1.0)].reset_index(drop=True)
+    dear = table[(table["p_qoil"] == 100.0) & (table["p_qgl"] == 2.0)].reset_index(drop=True)
+    allocation = ["qgl_limit", "total_production", "total_qgl", "solver_status"]
+    assert cheap[allocation].equals(dear[allocation])
+    assert np.allclose(dear["net_revenue"], 2.0 * cheap["net_revenue"])
@@ -0,0 +1,68 @@
+import pytest
+
+from backend.services.allocation_index_service import AllocationIndex
+from backend.services.sensitivity_service import gas_sensitivity
+
+DELTA_QGL = 50.0
+
+
+@pytest.fixture(scope="module")
+def index(field):
+    return AllocationIndex.build(field.q_gl, field.q_oil, 1.0, field.caps)
+
+
+def sensitivity(field, cbc, qgl_limit: float, **kwargs):
+    well_qgl = [field.q_gl[j] for j in cbc(qgl_limit).selection]
+    return gas_sensitivity(field.q_gl, field.q_oil, well_qgl, qgl_limit, 1.0, field.caps, DELTA_QGL, **kwargs)
+
+
+def cbc_changes(cbc, qgl_limit: float):
+    optimum = cbc(qgl_limit).objective
+    return cbc(qgl_limit + DELTA_QGL).objective - optimum, cbc(qgl_limit - DELTA_QGL).objective - optimum
+
+
+@pytest.mark.parametrize("qgl_limit", (150.0, 700.0, 1200.0))
+def test_frontier_changes_against_cbc(field, cbc, index, qgl_limit):
+    result = sensitivity(field, cbc, qgl_limit, index=index)
+    up, down = cbc_changes(cbc, qgl_limit)
+
+    assert result.method == "frontier"
+    assert result.lattice_resolution == index.gas_resolution
+    assert result.production_change_up >= 0
+    # Accurate to the lattice: at most the production of a few lattice units off
+    tolerance = 5 * index.gas_resolution * result.shadow_price
+    assert result.production_change_up == pytest.approx(up, abs=tolerance)
+    assert result.production_change_down == pytest.approx(down, abs=tolerance)
+
+
+@pytest.mark.parametrize("qgl_limit", (150.0, 700.0, 1200.0))
+def test_envelope_changes_against_cbc(field, cbc, qgl_limit):
+    result = sensitivity(field, cbc, qgl_limit)
+    up, down = cbc_changes(cbc, qgl_limit)
+
+    assert result.method == "envelope"
+    assert result.lattice_resolution is None
+    assert result.production_change_up == pytest.approx(up, rel=5e-2)
+    assert result.production_change_down <= 0
+    assert result.production_change_down == pytest.approx(down, rel=0.2)
+    # The shadow price is the slope of the optimum around the limit
+    assert result.shadow_price == pytest.approx((up - down) / (2 * DELTA_QGL), rel=0.1)
+
+
+def test_cut_below_the_minimum_is_infeasible(field, cbc):
+    qgl_limit, qgl_min = 150.0, 30.0
+    well_qgl = [field.q_gl[j] for j in cbc(qgl_limit, qgl_min).selection]
+    index = AllocationIndex.build(field.q_gl, field.q_oil, qgl_min, field.caps)
+    cut = qgl_limit - qgl_min * field.wells + 1.0
+
+    for kwargs in ({}, {"index": index}):
+        result = gas_sensitivity(field.q_gl, field.q_oil, well_qgl, qgl_limit, qgl_min, field.caps, cut, **kwargs)
+        assert result.production_change_down is None
+        assert result.production_change_up > 0
+
+
+def test_solver_dual_takes_precedence(field, cbc, index):
+    result = sensitivity(field, cbc, 700.0, index=index, shadow_price=1.25)
+
+    assert result.shadow_price == 1.25
+    assert result.to_dict(p_qoil=70.0)["shadow_value"] == pytest.approx(87.5)
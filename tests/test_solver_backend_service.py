@@ -0,0 +1,41 @@
+import pytest
+
+from backend.services.solver_backend_service import SolveResult
+from conftest import BINDING_LIMITS, RUGGED_LIMITS
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_highs_matches_cbc(field, cbc, qgl_limit):
+    result = field.solve("highs", qgl_limit).solve_result
+    reference = cbc(qgl_limit)
+
+    assert reference.status == result.status == "Optimal"
+    assert result.objective == pytest.approx(reference.objective, rel=1e-6)
+    assert result.best_bound >= result.objective - 1e-6
+    assert field.gas(result.selection) <= qgl_limit + 1e-9
+
+
+@pytest.mark.parametrize("qgl_limit", RUGGED_LIMITS)
+def test_highs_matches_cbc_on_the_rugged_field(rugged, rugged_cbc, qgl_limit):
+    result = rugged.solve("highs", qgl_limit).solve_result
+
+    assert result.status == "Optimal"
+    assert result.objective == pytest.approx(rugged_cbc(qgl_limit).objective, rel=1e-6)
+    assert rugged.gas(result.selection) <= qgl_limit + 1e-9
+
+
+@pytest.mark.parametrize("solver", ("milp", "highs"))
+def test_mip_backends_respect_qgl_min(field, solver):
+    qgl_min = 200.0
+    result = field.solve(solver, 1200.0, qgl_min).solve_result
+
+    assert result.status == "Optimal"
+    assert all(field.q_gl[j] >= qgl_min for j in result.selection)
+    assert field.solve(solver, qgl_min * field.wells - 1.0, qgl_min).solve_result.status == "Infeasible"
+
+
+def test_bound_status():
+    assert SolveResult(objective=100.0, best_bound=100.0).bound_status() == "Optimal"
+    assert SolveResult(objective=99.0, best_bound=100.0).bound_status() == "Feasible"
+    assert SolveResult(objective=99.0, best_bound=100.0).bound_status(tolerance=0.05) == "Optimal"
+    assert SolveResult(objective=99.0).bound_status() == "Feasible"
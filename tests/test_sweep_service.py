@@ -0,0 +1,43 @@
+import numpy as np
+
+from backend.services.sweep_service import SweepOptions, adaptive_sweep, solve_inline, thin_curve
+
+
+def test_thin_curve_keeps_the_ends_and_the_kinks():
+    gas = np.linspace(0.0, 100.0, 1001)
+    production = np.minimum(gas, 50.0)
+
+    kept = thin_curve(gas, production, tolerance=1e-3)
+
+    assert kept[0] == 0 and kept[-1] == gas.size - 1
+    assert 500 in kept
+    assert kept.size <= 5
+
+
+def test_thin_curve_stays_within_tolerance():
+    gas = np.linspace(1.0, 1000.0, 5000)
+    production = np.log(gas)
+    tolerance = 2e-3
+
+    kept = thin_curve(gas, production, tolerance)
+
+    chord = np.interp(gas, gas[kept], production[kept])
+    assert np.max(np.abs(production - chord)) <= tolerance * np.ptp(production) + 1e-12
+    assert kept.size < gas.size // 20
+
+
+def test_adaptive_sweep_samples_where_the_curve_bends():
+    curve = lambda qgl_limit: float(np.log(qgl_limit))
+    rows = adaptive_sweep(solve_inline(curve), 1.0, 1000.0, max_points=40, options=SweepOptions(tolerance=1e-3))
+    limits = [limit for limit, _ in rows]
+
+    assert limits == sorted(limits)
+    assert limits[0] == 1.0 and limits[-1] == 1000.0
+    assert len(limits) <= 40
+    assert all(value == curve(limit) for limit, value in rows)
+
+
+def test_adaptive_sweep_single_point_when_bounds_meet():
+    rows = adaptive_sweep(solve_inline(lambda qgl_limit: qgl_limit), 5.0, 5.0)
+
+    assert rows == [(5.0, 5.0)]
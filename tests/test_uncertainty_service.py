@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from backend.services.marginal_analysis_service import calculate_marginal_analysis
+from backend.services.optimization_model_service import OptimizationModel
+from backend.services.uncertainty_service import MonteCarloAllocator, MonteCarloOptions
+from conftest import BINDING_LIMITS, GRID, PARAMS, WCT
+
+P_QOIL, P_QGL = 70.0, 1.0
+
+
+def allocator(covariance_scale: float = 0.0, qgl_min: float = 1.0, **options) -> MonteCarloAllocator:
+    covariances = [np.diag(np.abs(params) * covariance_scale) ** 2 for params in PARAMS]
+    options = MonteCarloOptions(**dict(dict(samples=40, seed=7, batch_size=16), **options))
+    return MonteCarloAllocator(GRID, PARAMS, covariances, WCT, qgl_min, P_QOIL, P_QGL, options=options)
+
+
+def grid_optimum(sampler: MonteCarloAllocator, qgl_limit: float) -> float:
+    """CBC on the sampling grid of the unperturbed field"""
+    grids = list(sampler.gas)
+    rates = list(sampler.sample_curves(np.random.default_rng(0), 1)[0])
+    caps = calculate_marginal_analysis(grids, rates, P_QOIL, P_QGL).p_qgl_optim_list
+    model = OptimizationModel(grids, rates, qgl_limit, sampler.qgl_min, caps)
+    model.define_optimisation_problem()
+    model.build_objective_function()
+    model.add_constraints()
+    model.solve_prob()
+    return model.solve_result.objective
+
+
+@pytest.mark.parametrize("qgl_limit", BINDING_LIMITS)
+def test_unperturbed_field_against_cbc(qgl_limit):
+    sampler = allocator(samples=4)
+    result = sampler.run(qgl_limit)
+    optimum = grid_optimum(sampler, qgl_limit)
+
+    assert np.all(result.total_qgl <= qgl_limit + 1e-9)
+    assert np.all(result.total_production <= optimum + 1e-6)
+    assert np.all(result.upper_bound >= optimum - 1e-6)
+    assert result.total_production == pytest.approx(optimum, rel=2e-2)
+
+
+def test_sampled_fields_are_bounded():
+    result = allocator(covariance_scale=0.02).run(700.0)
+
+    assert np.all(result.feasible)
+    assert np.all(result.upper_bound >= result.total_production - 1e-6)
+    assert np.all(result.total_qgl <= 700.0 + 1e-9)
+    assert np.ptp(result.total_production) > 0
+
+
+def test_seeded_runs_repeat_across_workers():
+    serial = allocator(covariance_scale=0.02).run(700.0)
+    pooled = allocator(covariance_scale=0.02, workers=2).run(700.0)
+
+    np.testing.assert_array_equal(serial.total_production, pooled.total_production)
+    np.testing.assert_array_equal(serial.well_qgl, pooled.well_qgl)
+
+
+def test_qgl_min():
+    qgl_min = 200.0
+    sampler = allocator(qgl_min=qgl_min, samples=4)
+
+    assert np.all(sampler.run(1200.0).well_qgl >= qgl_min)
+    short = sampler.run(qgl_min * len(WCT) - 1.0)
+    assert not short.feasible.any()
+    assert short.to_dict()["feasible_samples"] == 0